@@ -1,24 +1,126 @@
 # 📄 Fichier : app.py
 
+# Seuls les modules légers sont importés ici : la page de connexion s'affiche sans numpy,
+# matplotlib, ezdxf ni fpdf. Les dépendances lourdes sont importées dans l'onglet qui les
+# utilise, une seule fois par processus (sys.modules), puis partagées par toutes les sessions.
 try:
-    import numpy as np
     import streamlit as st
-    import tempfile
+    import time
     import os
     import io
-    import matplotlib.pyplot as plt
-    from utils.dxf_reader import load_dxf, get_dxf_perimeter_and_holes, plot_dxf, modify_dxf
-    from streamlit_drawable_canvas import st_canvas
+    from utils.uploads import UploadStore
+    from utils.database import PAGE_SIZE, Database
+    import utils.instrumentation as instrumentation
     import math
     import base64
     import json
-    from fpdf import FPDF
 
 except ModuleNotFoundError as e:
     raise ImportError("Ce script nécessite les bibliothèques `streamlit` et `streamlit-drawable-canvas`. Veuillez les installer avec 'pip install streamlit streamlit-drawable-canvas'") from e
 
 st.set_page_config(page_title="PartLab – DXF Lab Creator", layout="wide")
 
+@st.cache_resource
+def get_job_queue():
+    from utils.jobs import JobQueue
+    return JobQueue()
+
+
+@st.cache_resource
+def get_upload_store():
+    return UploadStore()
+
+
+@st.cache_resource
+def get_database():
+    return Database()
+
+
+def pagination(total, key):
+    # Numéro de page -> décalage SQL ; seule la page affichée est lue en base
+    pages = max(1, math.ceil(total / PAGE_SIZE))
+    page = st.number_input(f"Page (sur {pages})", min_value=1, max_value=pages, value=1, key=key)
+    st.caption(f"{total} résultat(s)")
+    return (page - 1) * PAGE_SIZE
+
+
+@st.fragment(run_every=0.5)
+def attendre_rendu(cle, message="⏳ Génération du PDF en cours..."):
+    st.info(message)
+    if st.session_state[cle].done():
+        st.rerun()
+
+
+@st.fragment(run_every=0.5)
+def suivre_analyse(job_id):
+    # Avancement lu à chaque tick ; la page entière n'est relancée qu'à la fin du travail
+    travaux = get_job_queue()
+    etat = travaux.status(job_id)
+    st.progress(etat["progress"], text=f"⏳ {etat['name']} · {etat['label']} ({etat['seconds']:.0f} s)")
+    if st.button("⏹️ Annuler l'analyse"):
+        travaux.cancel(job_id, st.session_state.session_id)
+        st.rerun()
+    if etat["done"]:
+        st.rerun()
+
+
+@st.fragment(run_every=0.5)
+def suivre_nomenclature(travaux_bom):
+    # Avancement global des analyses d'une nomenclature (un travail par DXF distinct)
+    travaux = get_job_queue()
+    etats = {nom: travaux.status(job_id) for nom, job_id in travaux_bom.items()}
+    termines = sum(1 for e in etats.values() if e is None or e["done"])
+    st.progress(termines / max(len(etats), 1), text=f"⏳ {termines} / {len(etats)} DXF analysés")
+    if st.button("⏹️ Annuler le chiffrage"):
+        for nom, job_id in travaux_bom.items():
+            travaux.cancel(job_id, f"{st.session_state.session_id}:bom:{nom}")
+        del st.session_state["nomenclature"]
+        st.rerun()
+    if termines == len(etats):
+        st.rerun()
+
+
+@st.fragment
+def explorateur(analyse):
+    # Vue zoomable par tuiles : seules les tuiles visibles sont rendues, puis gardées en cache
+    from utils.tiles import MAX_ZOOM, VIEW_HEIGHT_PX, VIEW_WIDTH_PX, TileGrid, spatial_index
+    grille = TileGrid(spatial_index(analyse["geometry"], analyse["digest"]), analyse["digest"])
+    vue = st.session_state.get("vue_dxf")
+    if vue is None or vue["digest"] != analyse["digest"]:
+        vue = st.session_state.vue_dxf = {"digest": analyse["digest"], "zoom": 0, "centre": grille.center()}
+    pas_x = VIEW_WIDTH_PX / 4 * grille.pixel(vue["zoom"])
+    pas_y = VIEW_HEIGHT_PX / 4 * grille.pixel(vue["zoom"])
+    cx, cy = vue["centre"]
+    boutons = st.columns(7)
+    if boutons[0].button("➕", help="Zoomer", disabled=vue["zoom"] >= MAX_ZOOM):
+        vue["zoom"] += 1
+    if boutons[1].button("➖", help="Dézoomer", disabled=vue["zoom"] <= 0):
+        vue["zoom"] -= 1
+    if boutons[2].button("⬅️"):
+        vue["centre"] = (cx - pas_x, cy)
+    if boutons[3].button("➡️"):
+        vue["centre"] = (cx + pas_x, cy)
+    if boutons[4].button("⬆️"):
+        vue["centre"] = (cx, cy + pas_y)
+    if boutons[5].button("⬇️"):
+        vue["centre"] = (cx, cy - pas_y)
+    if boutons[6].button("🎯", help="Vue d'ensemble"):
+        vue.update(zoom=0, centre=grille.center())
+    st.image(grille.view(vue["zoom"], vue["centre"]), caption=f"Zoom ×{2 ** vue['zoom']}")
+
+
+def afficher_rendu(cle, libelle, nom_fichier):
+    # Rendu soumis au pool (Future en session) : attente sans bloquer le script
+    rendu = st.session_state.get(cle)
+    if rendu is None:
+        return
+    if not rendu.done():
+        attendre_rendu(cle)
+    elif rendu.exception() is not None:
+        st.error(f"❌ Échec de la génération du PDF : {rendu.exception()}")
+    else:
+        st.download_button(libelle, rendu.result(), file_name=nom_fichier, mime="application/pdf")
+
 # 🔒 Masquer menu/partage Streamlit
 st.markdown("""
     <style>
@@ -193,8 +295,13 @@ onglet_selectionne = st.sidebar.radio("📁 Navigation", [
     "📅 Devis",
     "👥 Clients"
 ])
+# Chaque mesure de performance de ce rerun porte l'utilisateur et l'onglet ; pic mémoire et profilage
+# selon les cases du panneau admin de cette session uniquement
+instrumentation.set_context(utilisateur=st.session_state.username, onglet=onglet_selectionne)
+instrumentation.set_options(memory=st.session_state.get("perf_memoire"), profile=st.session_state.get("perf_profil"))
 
 if onglet_selectionne == "🖌️ Dessiner ✏️":
+    from streamlit_drawable_canvas import st_canvas
     st.header("🎨 Zone de dessin interactive")
  
 
@@ -225,37 +332,25 @@ if onglet_selectionne == "🖌️ Dessiner ✏️":
         export_format = st.selectbox("📂 Exporter en format", ("json", "pdf", "dxf"))
 
         if export_format == "pdf":
-            pdf = FPDF()
-            pdf.add_page()
-            pdf.set_font("Arial", size=12)
-            pdf.cell(200, 10, txt="Dessin exporté – formes non visibles", ln=True, align="C")
-            pdf.output("dessin_export.pdf")
-            with open("dessin_export.pdf", "rb") as f:
-                st.download_button("📄 Télécharger PDF", f, file_name="dessin_export.pdf")
+            from utils.reports import drawing_pdf, submit_render
+            if st.button("🖨️ Générer le PDF"):
+                st.session_state.dessin_pdf = submit_render(drawing_pdf, canvas_result.image_data)
+            afficher_rendu("dessin_pdf", "📄 Télécharger PDF", "dessin_export.pdf")
 
         elif export_format == "json":
             json_str = json.dumps(canvas_result.json_data)
             st.download_button("📄 Télécharger JSON", json_str, file_name="dessin.json")
 
         elif export_format == "dxf":
-            doc = ezdxf.new()
-            msp = doc.modelspace()
-            for obj in canvas_result.json_data["objects"]:
-                if obj["type"] == "line":
-                    x1, y1 = obj["x1"], obj["y1"]
-                    x2, y2 = obj["x2"], obj["y2"]
-                    msp.add_line((x1, y1), (x2, y2))
-                elif obj["type"] == "rect":
-                    x, y = obj["left"], obj["top"]
-                    w, h = obj["width"], obj["height"]
-                    msp.add_lwpolyline([(x, y), (x+w, y), (x+w, y+h), (x, y+h), (x, y)], close=True)
-                elif obj["type"] == "circle":
-                    x, y = obj["left"] + obj["radius"], obj["top"] + obj["radius"]
-                    r = obj["radius"]
-                    msp.add_circle((x, y), r)
-            buffer = io.BytesIO()
-            doc.write(buffer)
-            st.download_button("📐 Télécharger DXF", buffer.getvalue(), file_name="dessin_export.dxf")
+            from utils.sketch import SIMPLIFY_TOLERANCE, CanvasConverter
+            tolerance = st.number_input("🪶 Tolérance de simplification (mm)", min_value=0.01,
+                                        value=SIMPLIFY_TOLERANCE, step=0.1)
+            # Convertisseur conservé en session : seuls les objets nouveaux ou modifiés sont reconvertis
+            convertisseur = st.session_state.get("convertisseur_dxf")
+            if convertisseur is None or convertisseur.tolerance != tolerance:
+                convertisseur = st.session_state.convertisseur_dxf = CanvasConverter(500, tolerance)
+            dxf_bytes = convertisseur.convert(canvas_result.json_data)
+            st.download_button("📐 Télécharger DXF", dxf_bytes, file_name="dessin_export.dxf")
 
 
 # Onglet 2 : Ajouter DXF
@@ -263,24 +358,90 @@ if onglet_selectionne == "➕ Ajouter DXF ✨":
     st.header("📂 Ajouter DXF")
     st.subheader("📤 Importer un fichier DXF")
 
+    depot = get_upload_store()
     uploaded_file = st.file_uploader("Dépose ton fichier DXF ici :", type=["dxf"])
-    if uploaded_file is not None:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".dxf") as tmp_file:
-            tmp_file.write(uploaded_file.read())
-            dxf_path = tmp_file.name
+    # Le fichier reste dans l'uploader à chaque rerun : il n'est déposé qu'une fois
+    if uploaded_file is not None and st.session_state.get("upload_file_id") != uploaded_file.file_id:
+        envoi = depot.put(uploaded_file, st.session_state.username, uploaded_file.name)
+        st.session_state.upload_file_id = uploaded_file.file_id
+        st.session_state.dxf_digest = envoi["digest"]
+        st.session_state.dxf_path = depot.path(envoi["digest"])
         st.success("✅ Fichier DXF chargé avec succès")
 
+    envois = depot.uploads(st.session_state.username)
+    if envois:
+        st.subheader("🗃️ Mes fichiers")
+        st.dataframe([{
+            "Fichier": e["name"],
+            "Taille (Ko)": round(e["size"] / 1024, 1),
+            "Envoyé le": time.strftime("%d/%m/%Y %H:%M", time.localtime(e["uploaded"])),
+        } for e in envois])
+        choix = st.selectbox("📄 Fichier à analyser", range(len(envois)), format_func=lambda i: envois[i]["name"])
+        col_a, col_b = st.columns(2)
+        if col_a.button("📂 Utiliser ce fichier"):
+            st.session_state.dxf_digest = envois[choix]["digest"]
+            st.session_state.dxf_path = depot.path(envois[choix]["digest"])
+            st.success(f"✅ {envois[choix]['name']} sélectionné")
+        if col_b.button("🗑️ Supprimer ce fichier"):
+            depot.remove(st.session_state.username, envois[choix]["digest"])
+            if st.session_state.get("dxf_digest") == envois[choix]["digest"]:
+                del st.session_state["dxf_digest"]
+                del st.session_state["dxf_path"]
+            st.rerun()
+
 
 if onglet_selectionne == "📂 Analyser DXF 🔎":
     st.header("📏 Analyse du fichier DXF")
-    try:
-        doc = load_dxf(dxf_path)
-        perimeter, holes, _ = get_dxf_perimeter_and_holes(doc)
-        st.metric("📐 Périmètre estimé", f"{perimeter:.2f} mm")
-        st.metric("🕳️ Nombre de trous", holes)
-        st.pyplot(plot_dxf(doc))
-    except Exception as e:
-        st.warning("⚠️ Aucun fichier DXF valide à analyser ou une erreur est survenue.")
+    from utils.cleanup import report_lines
+    from utils.topology import report_lines as topology_lines
+    travaux = get_job_queue()
+    st.session_state.setdefault("session_id", os.urandom(8).hex())
+    # Analyse en arrière-plan : les reruns se rattachent au travail en cours au lieu de le relancer
+    source = (st.session_state.get("dxf_path"), st.session_state.get("dxf_digest"))
+    if source[0] is not None and (st.session_state.get("analyse_source") != source
+                                  or travaux.get(st.session_state.get("analyse_job")) is None):
+        try:
+            travail = travaux.submit(source[0], source[1], owner=st.session_state.session_id)
+            st.session_state.analyse_job = travail.id
+            st.session_state.analyse_source = source
+        except OSError:
+            st.session_state.pop("analyse_job", None)
+    etat = travaux.status(st.session_state.get("analyse_job"))
+    if etat is not None and etat["state"] == "cancelled":
+        st.info("⏹️ Analyse annulée.")
+        if st.button("🔁 Relancer l'analyse"):
+            del st.session_state["analyse_source"]
+            st.rerun()
+    elif etat is not None and not etat["done"]:
+        suivre_analyse(st.session_state.analyse_job)
+    else:
+        try:
+            if etat is None or etat["state"] == "error":
+                raise ValueError(etat and etat["error"])
+            analyse = travaux.result(st.session_state.analyse_job)
+            st.session_state.analyse_dxf = analyse
+            st.metric("📐 Périmètre estimé", f"{analyse['perimeter']:.2f} mm")
+            st.metric("🕳️ Nombre de trous", analyse["holes"])
+            st.metric("📐 Aire nette", f"{analyse['area']:.2f} mm²")
+            for ligne in topology_lines(analyse.get("topologie", {})):
+                st.warning(f"⚠️ {ligne}")
+            corrections = report_lines(analyse["cleanup"])
+            if corrections:
+                with st.expander("🧹 Géométrie nettoyée avant calcul"):
+                    for ligne in corrections:
+                        st.write(f"- {ligne}")
+            if analyse["contours"]:
+                st.dataframe([{
+                    "Contour": c["type"],
+                    "Périmètre (mm)": round(c["perimetre"], 2),
+                    "Aire (mm²)": round(c["aire"], 2),
+                    "Boîte (mm)": " × ".join(f"{v:.1f}" for v in (c["bbox"][2] - c["bbox"][0], c["bbox"][3] - c["bbox"][1])),
+                } for c in analyse["contours"]])
+            st.image(analyse["preview"])
+            st.subheader("🔍 Exploration du dessin")
+            explorateur(analyse)
+        except Exception as e:
+            st.warning("⚠️ Aucun fichier DXF valide à analyser ou une erreur est survenue.")
 
 # Onglet 4 : Options utilisateur
 if onglet_selectionne == "⚙️ Options ✨":
@@ -291,19 +452,14 @@ if onglet_selectionne == "⚙️ Options ✨":
     st.info(f"Matière : **{matiere}** | Épaisseur : **{epaisseur}mm** | Quantité : **{quantite}**")
 
     if st.button("💾 Sauvegarder la configuration"):
-        if "configurations" not in st.session_state:
-            st.session_state.configurations = []
-        st.session_state.configurations.append({
-            "matiere": matiere,
-            "epaisseur": epaisseur,
-            "quantite": quantite
-        })
+        get_database().add_configuration(st.session_state.username, matiere, epaisseur, quantite)
         st.success("✅ Configuration enregistrée")
 
-    if "configurations" in st.session_state and st.session_state.configurations:
+    configurations = get_database().list_configurations(st.session_state.username)
+    if configurations:
         st.markdown("---")
         st.subheader("📁 Configurations enregistrées")
-        for idx, config in enumerate(st.session_state.configurations):
+        for idx, config in enumerate(configurations):
             st.markdown(f"🔹 **#{idx+1}** : {config['matiere']}, {config['epaisseur']}mm, {config['quantite']} pièce(s)")
 
 if onglet_selectionne == "👤 Mon Profil 💼":
@@ -322,93 +478,270 @@ if onglet_selectionne == "⚙️ Demandes 📂":
 if onglet_selectionne == "🏪 Test matériaux ⚖️":
     st.header("🏪 Base de test des matériaux")
     st.markdown("Voici un aperçu comparatif de matériaux utilisés en découpe.")
+    from utils.pricing import MATERIAL_PROPERTIES
     st.dataframe({
-        "Matière": ["Acier", "Alu", "Inox"],
-        "Densité (g/cm³)": [7.85, 2.7, 8.0],
-        "Résistance (MPa)": [250, 150, 200],
-        "Prix/kg (€)": [0.80, 1.50, 2.00]
+        "Matière": list(MATERIAL_PROPERTIES),
+        "Densité (g/cm³)": [p["densite"] for p in MATERIAL_PROPERTIES.values()],
+        "Résistance (MPa)": [p["resistance"] for p in MATERIAL_PROPERTIES.values()],
+        "Prix/kg (€)": [p["prix_kg"] for p in MATERIAL_PROPERTIES.values()]
     })
 
 # Onglet Devis
-if onglet_selectionne == "📅 Devis":
-    st.header("🧾 Générateur de devis complet")
+# Chaque section est un fragment : une modification ne relance que la section concernée
+TARIFS_POSTES = {
+    "Pliage": 0.50, "Ébavurage": 0.40, "Inserts": 0.60,
+    "Gravure": 0.30, "Reprise mécanique": 0.70
+}
 
-    # Initialisation des machines si pas encore définies
-    if "machines_config" not in st.session_state:
-        st.session_state.machines_config = {
-            "Machine A": {"Acier": 20.0, "Alu": 40.0, "Inox": 15.0},
-            "Machine B": {"Acier": 25.0, "Alu": 35.0, "Inox": 20.0},
-            "Machine C": {"Acier": 18.0, "Alu": 30.0, "Inox": 12.0}
-        }
 
-    # Admin peut modifier les vitesses
-    if st.session_state.role == "admin":
-        st.subheader("⚙️ Configuration machines (admin)")
-        for machine in st.session_state.machines_config:
-            st.markdown(f"### 🛠️ {machine}")
-            for mat in st.session_state.machines_config[machine]:
-                key = f"{machine}_{mat}"
-                valeur = float(st.session_state.machines_config[machine][mat])
-                st.session_state.machines_config[machine][mat] = st.number_input(
-                    f"{mat} – {machine} (mm/s)", value=valeur,
-                    min_value=0.001, step=0.001, format="%.3f", key=key
-                )
-
-    st.markdown("## 📐 Données techniques de la pièce")
-    ref = st.text_input("📝 Référence de la pièce")
-    designation = st.text_input("📄 Désignation")
-    quantite = st.number_input("📉 Quantité (max 500)", min_value=1, max_value=500, step=1)
-    matiere = st.selectbox("🪨 Matière", ["Acier", "Alu", "Inox"])
-    epaisseur = st.number_input("📏 Épaisseur (mm)", min_value=0.1, step=0.1)
-    longueur = st.number_input("📐 Longueur (mm)", min_value=0.0)
-    largeur = st.number_input("📐 Largeur (mm)", min_value=0.0)
-    machine = st.selectbox("🛠️ Machine de découpe", list(st.session_state.machines_config.keys()))
-    vitesse_coupe = float(st.session_state.machines_config[machine].get(matiere, 1.0))  # Valeur de secours
+@st.cache_data
+def durees_postes():
+    return [round(x, 2) for x in np.arange(0.25, 200.25, 0.25)]
+
+
+@st.fragment
+def section_machines():
+    st.subheader("⚙️ Configuration machines (admin)")
+    # Tables de départ figées : l'éditeur applique ses modifications dessus à chaque exécution
+    if "machines_tables" not in st.session_state:
+        st.session_state.machines_tables = {}
+        st.session_state.machines_dynamique = {}
+        for machine, tables in st.session_state.machines_config.items():
+            matieres = machine_materials(tables)
+            points = sorted({float(t) for mat in matieres if isinstance(tables[mat], dict) for t in tables[mat]}
+                            or {3.0})
+            vitesses = speed_grid(st.session_state.machines_config, [machine], matieres, points)[0]
+            table = {"Épaisseur (mm)": points}
+            table.update({mat: [round(float(v), 3) for v in vitesses[j]] for j, mat in enumerate(matieres)})
+            st.session_state.machines_tables[machine] = table
+            dynamique = machine_dynamics(st.session_state.machines_config, machine)
+            st.session_state.machines_dynamique[machine] = {
+                "percage": {"Épaisseur (mm)": list(dynamique["percage"]),
+                            "Amorçage (s)": list(dynamique["percage"].values())},
+                "vitesse_rayon": {"Rayon (mm)": list(dynamique["vitesse_rayon"]),
+                                  "Fraction de la vitesse": list(dynamique["vitesse_rayon"].values())},
+            }
+    modifie = False
+    for machine, tables in st.session_state.machines_config.items():
+        st.markdown(f"### 🛠️ {machine}")
+        table = st.data_editor(st.session_state.machines_tables[machine], num_rows="dynamic",
+                               key=f"vitesses_{machine}")
+        for mat in machine_materials(tables):
+            nouvelle = {float(t): float(v) for t, v in zip(table["Épaisseur (mm)"], table[mat])
+                        if t is not None and v is not None and v > 0}
+            if not nouvelle:
+                st.warning(f"⚠️ {mat} : aucune vitesse saisie, valeurs précédentes conservées.")
+            elif nouvelle != tables[mat]:
+                tables[mat] = nouvelle
+                modifie = True
+
+        # Dynamique : alimente le temps de coupe segment par segment (amorçages, angles, petits rayons)
+        with st.expander(f"🏎️ Dynamique de {machine}"):
+            dynamique = machine_dynamics(st.session_state.machines_config, machine)
+            acceleration = st.number_input("Accélération (mm/s²)", min_value=1.0,
+                                           value=float(dynamique["acceleration"]), key=f"acceleration_{machine}")
+            col_p, col_r = st.columns(2)
+            with col_p:
+                percage = st.data_editor(st.session_state.machines_dynamique[machine]["percage"],
+                                         num_rows="dynamic", key=f"percage_{machine}")
+            with col_r:
+                rayons = st.data_editor(st.session_state.machines_dynamique[machine]["vitesse_rayon"],
+                                        num_rows="dynamic", key=f"rayons_{machine}")
+            nouvelle = {
+                "percage": {float(t): float(v) for t, v in zip(percage["Épaisseur (mm)"], percage["Amorçage (s)"])
+                            if t is not None and v is not None and v >= 0},
+                "acceleration": float(acceleration),
+                "vitesse_rayon": {float(r): min(float(v), 1.0)
+                                  for r, v in zip(rayons["Rayon (mm)"], rayons["Fraction de la vitesse"])
+                                  if r is not None and v is not None and v > 0},
+            }
+            if not nouvelle["percage"] or not nouvelle["vitesse_rayon"]:
+                st.warning("⚠️ Tables vides : valeurs précédentes conservées.")
+            elif nouvelle != dynamique:
+                tables[DYNAMICS] = nouvelle
+                modifie = True
+    if modifie:
+        # Partagées entre utilisateurs ; les vitesses alimentent le chiffrage : toute la page est relancée
+        get_database().save_machines(st.session_state.machines_config)
+        st.rerun()
+
+
+@st.fragment
+def section_piece():
+    with st.form("devis_piece"):
+        st.markdown("## 📐 Données techniques de la pièce")
+        ref = st.text_input("📝 Référence de la pièce")
+        designation = st.text_input("📄 Désignation")
+        quantite = st.number_input("📉 Quantité (max 500)", min_value=1, max_value=500, step=1)
+        matiere = st.selectbox("🪨 Matière", MATERIALS)
+        epaisseur = st.number_input("📏 Épaisseur (mm)", min_value=0.1, step=0.1)
+        longueur = st.number_input("📐 Longueur (mm)", min_value=0.0)
+        largeur = st.number_input("📐 Largeur (mm)", min_value=0.0)
+        machine = st.selectbox("🛠️ Machine de découpe", list(st.session_state.machines_config.keys()))
+
+        st.markdown("### 🔩 Détails supplémentaires")
+        trous = [st.number_input(f"Trous · Diamètre {i+1} (mm)", min_value=0.0, step=0.1) for i in range(4)]
+        contours = [st.number_input(f"Contour supplémentaire {i+1} (mm)", min_value=0.0, step=0.1) for i in range(4)]
+        utiliser_dxf = "analyse_dxf" in st.session_state and st.checkbox(
+            "📐 Utiliser la géométrie du DXF analysé", value=True)
+        vitesse_rapide = st.number_input("🚀 Vitesse des déplacements rapides (mm/s)", min_value=1.0, value=RAPID_SPEED)
+
+        st.markdown("## 💸 Coûts de matière et temps de coupe")
+        prix_saisi = st.number_input("💰 Prix matière unitaire (€) · vide = calculé (aire × épaisseur × densité)",
+                                     min_value=0.0, value=None)
+        tarif_horaire = st.number_input("⏱️ Tarif de coupe à la seconde (€)", value=TARIF_SECONDE, step=0.001)
+
+        st.subheader("🚚 Sous-traitance & transport")
+        sous_traitance = st.number_input("🔧 Coût de sous-traitance (€)", min_value=0.0, step=0.5)
+        transport = st.number_input("🚛 Coût de transport (€)", min_value=0.0, step=0.5)
+        st.form_submit_button("🧮 Calculer le devis")
 
     perimetre_base = 2 * (longueur + largeur)
     st.metric("🔄 Périmètre de base", f"{perimetre_base:.2f} mm")
-
-    st.markdown("### 🔩 Détails supplémentaires")
-    trous = [st.number_input(f"Trous · Diamètre {i+1} (mm)", min_value=0.0, step=0.1) for i in range(4)]
-    contours = [st.number_input(f"Contour supplémentaire {i+1} (mm)", min_value=0.0, step=0.1) for i in range(4)]
     perimetre_total = perimetre_base + sum(trous) + sum(contours)
-    st.metric("📊 Périmètre total estimé", f"{perimetre_total:.2f} mm")
 
-    st.markdown("## 💸 Coûts de matière et temps de coupe")
-    prix_matiere = st.number_input("💰 Prix matière unitaire (€)", min_value=0.0)
-    tarif_horaire = st.number_input("⏱️ Tarif de coupe à la seconde (€)", value=0.068, step=0.001)
-    temps_coupe_sec = perimetre_total / vitesse_coupe
-    cout_coupe = temps_coupe_sec * tarif_horaire
-    total_unitaire = cout_coupe + prix_matiere
-    prix_total = total_unitaire * quantite
-
-    st.success(f"🧾 Prix total estimé : **{prix_total:.2f} €**")
-
-    st.markdown("---")
-    st.subheader("🚚 Sous-traitance & transport")
-    sous_traitance = st.number_input("🔧 Coût de sous-traitance (€)", min_value=0.0, step=0.5)
-    transport = st.number_input("🚛 Coût de transport (€)", min_value=0.0, step=0.5)
-    prix_total_final = prix_total + sous_traitance + transport
+    # Géométrie réelle du DXF analysé : périmètre exact et ordre de découpe optimisé
+    parcours = None
+    if utiliser_dxf:
+        analyse = st.session_state.analyse_dxf
+        if st.session_state.get("parcours_digest") != analyse["digest"]:
+            topologie = build_topology(analyse["geometry"])
+            st.session_state.parcours = plan_toolpath(topologie)
+            st.session_state.profil_coupe = cut_profile(topologie)
+            st.session_state.parcours_digest = analyse["digest"]
+        parcours = st.session_state.parcours
+        profil = st.session_state.profil_coupe
+        perimetre_total = parcours.cut_length
+    else:
+        # Saisie manuelle : un contour rectangulaire à angles vifs, un amorçage par trou ou contour
+        amorcages = 1 + sum(1 for d in trous + contours if d > 0)
+        profil = CutProfile.simple(perimetre_total, amorcages, 4 if longueur and largeur else 0)
+    st.metric("📊 Périmètre total estimé", f"{perimetre_total:.2f} mm")
+    if parcours is not None:
+        st.metric("🧭 Déplacements à vide", f"{parcours.rapid_distance:.2f} mm")
+
+    # Matière : aire nette du DXF (contours moins trous) ou rectangle moins les trous saisis
+    if utiliser_dxf:
+        aire = st.session_state.analyse_dxf["area"]
+    else:
+        aire = max(longueur * largeur - sum(math.pi * d * d / 4 for d in trous), 0.0)
+    couts_matiere = material_grid([aire], MATERIALS, [epaisseur])
+    indice = MATERIALS.index(matiere)
+    masse = float(couts_matiere["mass"][0, indice, 0])
+    prix_matiere = prix_saisi if prix_saisi is not None else float(couts_matiere["cost"][0, indice, 0])
+    col_a, col_m, col_p = st.columns(3)
+    col_a.metric("📐 Aire nette", f"{aire:.0f} mm²")
+    col_m.metric("⚖️ Masse", f"{masse:.3f} kg")
+    col_p.metric("🧱 Prix matière" + (" (saisi)" if prix_saisi is not None else ""), f"{prix_matiere:.2f} €")
+    if utiliser_dxf and aire <= 0 and prix_saisi is None:
+        st.warning(f"⚠️ {ZERO_AREA_WARNING.capitalize()}. Fermer les contours du DXF ou saisir le prix matière.")
+
+    options_prix = {
+        "rapid_distance": parcours.rapid_distance if parcours is not None else 0.0,
+        "rapid_speed": vitesse_rapide,
+        "material_cost": prix_matiere,
+        "tarif_seconde": tarif_horaire,
+        "cycle_time": cycle_time_model(profil, st.session_state.machines_config),
+    }
+    devis = quote(st.session_state.machines_config, machine, matiere, epaisseur, quantite, perimetre_total,
+                  **options_prix)
+    if not math.isfinite(devis["vitesse"]):
+        st.warning(f"⚠️ {machine} n'a pas de vitesse pour {matiere} : valeur de secours 1 mm/s.")
+        devis = quote({machine: {matiere: 1.0}}, machine, matiere, epaisseur, quantite, perimetre_total,
+                      **options_prix)
+    detail = cycle_time_breakdown(profil, st.session_state.machines_config, machine, devis["vitesse"], epaisseur)
+    st.caption(f"⏱️ {devis['temps_coupe_sec']:.1f} s/pièce : coupe {detail['coupe']:.1f} s · "
+               f"angles {detail['angles']:.1f} s · mises en vitesse {detail['departs']:.1f} s · "
+               f"{profil.pierces} amorçage(s) {detail['percages']:.1f} s"
+               + (f" · déplacements {options_prix['rapid_distance'] / vitesse_rapide:.1f} s"
+                  if options_prix["rapid_distance"] else ""))
+    prix_total_final = devis["prix_total"] + sous_traitance + transport
+    st.success(f"🧾 Prix total estimé : **{devis['prix_total']:.2f} €**")
     st.metric("💵 Total final", f"{prix_total_final:.2f} €")
 
     st.markdown("---")
-    st.subheader("🔩 Coûts supplémentaires par poste")
-    tarifs_postes = {
-        "Pliage": 0.50, "Ébavurage": 0.40, "Inserts": 0.60,
-        "Gravure": 0.30, "Reprise mécanique": 0.70
+    st.subheader("📊 Comparatif machines")
+    quantites = sorted(set(QUANTITY_BREAKS) | {int(quantite)})
+    # Comparatif : chaque matière chiffrée à son propre prix (sauf prix saisi à la main)
+    options_grille = dict(options_prix)
+    if prix_saisi is None:
+        options_grille["material_cost"] = couts_matiere["cost"][0]
+    grille = quote_grid(st.session_state.machines_config, perimetre_total, quantites, materials=MATERIALS,
+                        thicknesses=[epaisseur], fixed_costs=sous_traitance + transport, **options_grille)
+    comparatif = ranked_table(grille, material=matiere, quantity=quantite)
+    meilleure_option = comparatif[0] if comparatif else None
+    if meilleure_option is not None:
+        plus_rapide = next(row for row in comparatif if row["Plus rapide"])
+        st.info(f"💡 Moins cher : **{meilleure_option['Machine']}** ({meilleure_option['Prix total (€)']:.2f} €) · "
+                f"plus rapide : **{plus_rapide['Machine']}** ({plus_rapide['Temps/pièce (s)']:.2f} s/pièce)")
+        st.dataframe(comparatif)
+    with st.expander("🗂️ Grille complète (matières × quantités)"):
+        if prix_saisi is not None:
+            st.caption("Le prix matière saisi est appliqué à toutes les matières.")
+        st.dataframe(ranked_table(grille))
+
+    # Lu par les autres sections (imbrication, export PDF) sans les relancer
+    st.session_state.devis = {
+        "ref": ref, "designation": designation, "quantite": quantite, "matiere": matiere,
+        "epaisseur": epaisseur, "longueur": longueur, "largeur": largeur, "machine": machine,
+        "aire": aire, "masse": masse,
+        "vitesse_coupe": round(devis["vitesse"], 3), "perimetre_total": perimetre_total,
+        "deplacements": parcours.rapid_distance if parcours is not None else None,
+        "temps_coupe_sec": devis["temps_coupe_sec"], "amorcages": profil.pierces, "prix_matiere": prix_matiere,
+        "cout_coupe": devis["cout_coupe"], "total_unitaire": devis["total_unitaire"],
+        "sous_traitance": sous_traitance, "transport": transport, "prix_total_final": prix_total_final,
+        "meilleure_option": meilleure_option,
+        "apercu": st.session_state.analyse_dxf["preview"] if utiliser_dxf else None,
     }
 
-    postes_selectionnes = st.multiselect("🛠️ Activer les postes supplémentaires", list(tarifs_postes.keys()))
+
+@st.fragment
+def section_imbrication():
+    st.markdown("## 🧩 Imbrication sur tôle")
+    if "analyse_dxf" not in st.session_state:
+        st.info("ℹ️ Analyse un DXF dans l'onglet « 📂 Analyser DXF 🔎 » pour calculer l'imbrication.")
+        return
+    col_l, col_h, col_e, col_t = st.columns(4)
+    tole_longueur = col_l.number_input("📏 Longueur tôle (mm)", min_value=1.0, value=3000.0)
+    tole_largeur = col_h.number_input("📏 Largeur tôle (mm)", min_value=1.0, value=1500.0)
+    espacement = col_e.number_input("↔️ Espacement pièces (mm)", min_value=0.0, value=5.0)
+    budget = col_t.number_input("⏱️ Budget de calcul (s)", min_value=0.5, max_value=120.0, value=5.0)
+    if st.button("🧩 Calculer l'imbrication"):
+        formes = part_shapes(build_topology(st.session_state.analyse_dxf["geometry"]))
+        if formes:
+            # Recherche dans le pool de rendu : le script Streamlit n'attend pas la fin du budget
+            st.session_state.imbrication = submit_render(nest_parts, formes, st.session_state.devis["quantite"],
+                                                         tole_longueur, tole_largeur, espacement, budget)
+        else:
+            st.warning("⚠️ Aucun contour fermé trouvé dans le DXF analysé.")
+    calcul = st.session_state.get("imbrication")
+    if calcul is not None and not calcul.done():
+        attendre_rendu("imbrication", "⏳ Recherche du meilleur placement...")
+    elif calcul is not None and calcul.exception() is not None:
+        st.error(f"❌ Échec de l'imbrication : {calcul.exception()}")
+    elif calcul is not None:
+        imbrication = calcul.result()
+        st.metric("🗂️ Nombre de tôles", imbrication.sheets)
+        st.metric("📈 Rendement matière", f"{imbrication.yield_pct:.1f} %")
+        st.caption(f"Méthode : {imbrication.method} · {imbrication.evaluations} évaluations · "
+                   f"{imbrication.solve_time:.2f} s · borne basse {imbrication.lower_bound} tôle(s)")
+        st.image(render_layout(imbrication))
+
+
+@st.fragment
+def section_postes():
+    st.subheader("🔩 Coûts supplémentaires par poste")
+    postes_selectionnes = st.multiselect("🛠️ Activer les postes supplémentaires", list(TARIFS_POSTES.keys()))
     donnees_postes = []
     total_postes = 0.0
 
     for poste in postes_selectionnes:
         duree = st.selectbox(
             f"⏱️ Durée estimée pour {poste} (min)",
-            options=[round(x, 2) for x in np.arange(0.25, 200.25, 0.25)],
+            options=durees_postes(),
             key=f"duree_{poste}"
         )
-        tarif = tarifs_postes[poste]
+        tarif = TARIFS_POSTES[poste]
         cout = round(duree * tarif, 2)
         total_postes += cout
         donnees_postes.append({
@@ -421,69 +754,215 @@ if onglet_selectionne == "📅 Devis":
     if donnees_postes:
         st.dataframe(donnees_postes)
         st.success(f"🧾 Total coûts supplémentaires : **{total_postes:.2f} €**")
-
+    st.session_state.devis_postes = donnees_postes
+
+
+@st.fragment
+def section_nomenclature():
+    st.subheader("📦 Devis groupé depuis une nomenclature")
+    st.caption("CSV ou XLSX avec les colonnes Réf, Désignation, Quantité, Matière, Épaisseur et Fichier (nom du DXF). "
+               "Les DXF déjà déposés dans « ➕ Ajouter DXF » sont retrouvés par leur nom.")
+    fichier_bom = st.file_uploader("📋 Nomenclature", type=["csv", "xlsx"], key="bom_fichier")
+    fichiers_dxf = st.file_uploader("📐 DXF référencés", type=["dxf"], accept_multiple_files=True, key="bom_dxf")
+    if fichier_bom is not None and st.button("🚀 Chiffrer la nomenclature"):
+        try:
+            lignes = read_bom(fichier_bom.getvalue(), fichier_bom.name)
+        except ValueError as e:
+            st.error(f"❌ {e}")
+            return
+        st.session_state.setdefault("session_id", os.urandom(8).hex())
+        depot = get_upload_store()
+        # Envois précédents de l'utilisateur (le plus récent l'emporte), puis fichiers joints
+        connus = {e["name"].lower(): e["digest"] for e in reversed(depot.uploads(st.session_state.username))}
+        for f in fichiers_dxf:
+            connus[f.name.lower()] = depot.put(f, st.session_state.username, f.name)["digest"]
+        travaux = get_job_queue()
+        travaux_bom = {}
+        for nom in {l["fichier"] for l in lignes if l["fichier"]}:
+            digest = connus.get(nom.lower())
+            if digest is not None:
+                travaux_bom[nom] = travaux.submit(depot.path(digest), digest, nom,
+                                                  owner=f"{st.session_state.session_id}:bom:{nom}").id
+        st.session_state.nomenclature = {"lignes": lignes, "travaux": travaux_bom, "chiffrage": None}
+        st.session_state.pop("nomenclature_pdf", None)
+
+    nomenclature = st.session_state.get("nomenclature")
+    if nomenclature is None:
+        return
+    if nomenclature["chiffrage"] is None:
+        travaux = get_job_queue()
+        etats = {nom: travaux.status(job_id) for nom, job_id in nomenclature["travaux"].items()}
+        if any(e is not None and not e["done"] for e in etats.values()):
+            suivre_nomenclature(nomenclature["travaux"])
+            return
+        analyses = {}
+        for nom, etat in etats.items():
+            if etat is None:
+                analyses[nom] = "analyse expirée, relancer le chiffrage"
+            elif etat["state"] == "done":
+                analyses[nom] = travaux.result(nomenclature["travaux"][nom])
+            else:
+                analyses[nom] = etat["error"] or STATE_LABELS[etat["state"]]
+        chiffrage = price_bom(nomenclature["lignes"], analyses, st.session_state.machines_config)
+        apercus = {nom: a["preview"] for nom, a in analyses.items() if isinstance(a, dict)}
+        nomenclature["chiffrage"] = (chiffrage, bom_summary(chiffrage), apercus)
+
+    chiffrage, synthese, apercus = nomenclature["chiffrage"]
+    col_l, col_p, col_m, col_t = st.columns(4)
+    col_l.metric("📋 Lignes chiffrées", f"{synthese['chiffrees']} / {synthese['lignes']}")
+    col_p.metric("🔩 Pièces", synthese["pieces"])
+    col_m.metric("⚖️ Masse totale", f"{synthese['masse']:.2f} kg")
+    col_t.metric("💵 Total nomenclature", f"{synthese['total']:.2f} €")
+    if synthese["erreurs"]:
+        st.warning(f"⚠️ {synthese['erreurs']} ligne(s) non chiffrée(s) : voir la colonne Erreur.")
+    if synthese["alertes"]:
+        st.warning(f"⚠️ {synthese['alertes']} ligne(s) chiffrée(s) avec alerte : voir la colonne Erreur.")
+    st.dataframe(totals_table(chiffrage))
+    st.download_button("📊 Télécharger les totaux (CSV)", totals_csv(chiffrage).encode("utf-8-sig"),
+                       file_name="devis_nomenclature.csv", mime="text/csv")
+    avec_apercus = st.checkbox("🖼️ Inclure l'aperçu de chaque pièce", value=True)
+    if st.button("🖨️ Générer le devis PDF groupé"):
+        st.session_state.nomenclature_pdf = submit_render(bom_pdf, chiffrage, synthese,
+                                                          apercus if avec_apercus else None)
+    afficher_rendu("nomenclature_pdf", "📄 Télécharger le devis groupé PDF", "devis_nomenclature.pdf")
+
+
+@st.fragment
+def section_export():
     if st.button("📤 Exporter le devis en PDF"):
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font("Arial", size=12)
-        pdf.cell(200, 10, txt=f"Devis – Réf : {ref}", ln=True)
-        pdf.cell(200, 10, txt=f"Désignation : {designation}", ln=True)
-        pdf.cell(200, 10, txt=f"Quantité : {quantite}", ln=True)
-        pdf.cell(200, 10, txt=f"Matière : {matiere} | Épaisseur : {epaisseur} mm", ln=True)
-        pdf.cell(200, 10, txt=f"Dim : {longueur} x {largeur} mm", ln=True)
-        pdf.cell(200, 10, txt=f"Machine : {machine} (vitesse : {vitesse_coupe} mm/s)", ln=True)
-        pdf.cell(200, 10, txt=f"Périmètre total : {perimetre_total:.2f} mm", ln=True)
-        pdf.cell(200, 10, txt=f"Temps découpe estimé : {temps_coupe_sec:.2f} sec", ln=True)
-        pdf.cell(200, 10, txt=f"Prix matière : {prix_matiere:.2f} €", ln=True)
-        pdf.cell(200, 10, txt=f"Coût découpe : {cout_coupe:.2f} €", ln=True)
-        pdf.cell(200, 10, txt=f"Total unitaire : {total_unitaire:.2f} €", ln=True)
-        pdf.cell(200, 10, txt=f"Sous-traitance : {sous_traitance:.2f} €", ln=True)
-        pdf.cell(200, 10, txt=f"Transport : {transport:.2f} €", ln=True)
-        pdf.cell(200, 10, txt=f"✅ Total devis : {prix_total_final:.2f} €", ln=True)
-        pdf.output("devis_export.pdf")
-        with open("devis_export.pdf", "rb") as f:
-            st.download_button("📄 Télécharger le devis PDF", f, file_name="devis_export.pdf")
+        # Rendu dans le pool : le PDF reste en mémoire, propre à la session
+        devis = st.session_state.devis
+        st.session_state.devis_pdf = submit_render(quote_pdf, devis, st.session_state.get("devis_postes", []),
+                                                   devis["apercu"])
+    afficher_rendu("devis_pdf", "📄 Télécharger le devis PDF", "devis_export.pdf")
+
+    recherche = st.text_input("🔎 Client du devis (entreprise, nom ou email)", key="devis_client_recherche")
+    clients = get_database().list_clients(recherche, limit=20) if recherche else []
+    client = st.selectbox("👥 Client", [None] + clients,
+                          format_func=lambda c: "— Aucun —" if c is None else f"{c['entreprise']} · {c['nom']}")
+    if st.button("💾 Enregistrer dans l'historique"):
+        get_database().add_quote(st.session_state.username, st.session_state.devis,
+                                 client["id"] if client else None)
+        st.success("✅ Devis enregistré")
+
+
+@st.fragment
+def section_historique():
+    st.subheader("🕘 Historique des devis")
+    col_r, col_m = st.columns(2)
+    ref = col_r.text_input("🔎 Référence commençant par", key="historique_ref")
+    filtres = {"ref": ref.strip()}
+    if col_m.checkbox("👤 Mes devis uniquement", value=st.session_state.role != "admin"):
+        filtres["utilisateur"] = st.session_state.username
+    base = get_database()
+    decalage = pagination(base.count_quotes(**filtres), "historique_page")
+    devis = base.list_quotes(offset=decalage, **filtres)
+    if devis:
+        st.dataframe([{
+            "Date": time.strftime("%d/%m/%Y %H:%M", time.localtime(d["cree"])),
+            "Réf": d["ref"], "Désignation": d["designation"], "Matière": d["matiere"],
+            "Épaisseur (mm)": d["epaisseur"], "Quantité": d["quantite"], "Machine": d["machine"],
+            "Total (€)": round(d["total"], 2), "Utilisateur": d["utilisateur"],
+        } for d in devis])
+
+
+if onglet_selectionne == "📅 Devis":
+    # Globals du script : les fragments ci-dessus les retrouvent lors de leurs relances partielles
+    import numpy as np
+    from utils.topology import build_topology
+    from utils.nesting import part_shapes, nest_parts, render_layout
+    from utils.toolpath import RAPID_SPEED, plan_toolpath
+    from utils.cut_time import CutProfile, cut_profile, cycle_time_breakdown, cycle_time_model
+    from utils.reports import bom_pdf, quote_pdf, submit_render
+    from utils.bom import bom_summary, price_bom, read_bom, totals_csv, totals_table
+    from utils.jobs import STATE_LABELS
+    from utils.pricing import DYNAMICS, MATERIALS, QUANTITY_BREAKS, TARIF_SECONDE, ZERO_AREA_WARNING, default_machines, machine_dynamics, machine_materials, material_grid, quote, quote_grid, ranked_table, speed_grid
+    st.header("🧾 Générateur de devis complet")
+
+    # Initialisation des machines si pas encore définies (vitesses par épaisseur, partagées en base)
+    if "machines_config" not in st.session_state:
+        st.session_state.machines_config = get_database().load_machines() or default_machines()
+
+    # Admin peut modifier les tables de vitesses (une ligne par épaisseur)
+    if st.session_state.role == "admin":
+        section_machines()
+    section_piece()
+    section_imbrication()
+    st.markdown("---")
+    section_postes()
+    section_export()
+    st.markdown("---")
+    section_nomenclature()
+    st.markdown("---")
+    section_historique()
 
 
 if onglet_selectionne == "👥 Clients":
 
     st.header("👥 Gestion des clients")
-
-    if "clients" not in st.session_state:
-        st.session_state.clients = []
+    base = get_database()
 
     st.subheader("➕ Ajouter un client")
-    nom_entreprise = st.text_input("🏢 Nom de l'entreprise")
-    nom_client = st.text_input("👤 Nom du client")
-    email = st.text_input("📧 Adresse email")
-    telephone = st.text_input("📞 Numéro de téléphone")
-    notes = st.text_area("📝 Notes")
-
-    if st.button("📥 Ajouter le client"):
+    with st.form("ajout_client", clear_on_submit=True):
+        nom_entreprise = st.text_input("🏢 Nom de l'entreprise")
+        nom_client = st.text_input("👤 Nom du client")
+        email = st.text_input("📧 Adresse email")
+        telephone = st.text_input("📞 Numéro de téléphone")
+        notes = st.text_area("📝 Notes")
+        ajout = st.form_submit_button("📥 Ajouter le client")
+
+    if ajout:
         if nom_entreprise and nom_client:
-            st.session_state.clients.append({
-                "Entreprise": nom_entreprise,
-                "Nom": nom_client,
-                "Email": email,
-                "Téléphone": telephone,
-                "Notes": notes
-            })
+            base.add_client(nom_entreprise, nom_client, email, telephone, notes)
             st.success("✅ Client ajouté")
         else:
             st.warning("⚠️ Veuillez remplir au minimum l'entreprise et le nom du client.")
 
-    if st.session_state.clients:
-        st.subheader("📋 Liste des clients enregistrés")
-        for i, client in enumerate(st.session_state.clients):
-            st.markdown(f"""
-            **{client['Nom']}**  
-            🏢 {client['Entreprise']}  
-            📧 {client['Email']}  
-            📞 {client['Téléphone']}  
-            📝 {client['Notes']}  
-            """)
-            if st.session_state.role == "admin":
-                if st.button(f"🗑️ Supprimer le client {client['Nom']}", key=f"suppr_{i}"):
-                    st.session_state.clients.pop(i)
-                    st.success("🗑️ Client supprimé")
-                    st.experimental_rerun()
+    st.subheader("📋 Liste des clients enregistrés")
+    recherche = st.text_input("🔎 Rechercher (début de mot : entreprise, nom, email, notes)")
+    decalage = pagination(base.count_clients(recherche), "clients_page")
+    clients = base.list_clients(recherche, offset=decalage)
+    if clients:
+        st.dataframe([{
+            "Entreprise": c["entreprise"],
+            "Nom": c["nom"],
+            "Email": c["email"],
+            "Téléphone": c["telephone"],
+            "Notes": c["notes"],
+        } for c in clients])
+        if st.session_state.role == "admin":
+            a_supprimer = st.multiselect("🗑️ Clients à supprimer", clients,
+                                         format_func=lambda c: f"{c['entreprise']} · {c['nom']} ({c['email']})")
+            if a_supprimer and st.button("🗑️ Supprimer la sélection"):
+                base.delete_clients([c["id"] for c in a_supprimer])
+                st.success("🗑️ Client(s) supprimé(s)")
+                st.rerun()
+
+
+# 📈 Panneau de performances (admin) : en fin de script pour inclure les mesures de ce rerun
+if st.session_state.role == "admin":
+    with st.sidebar.expander("📈 Performances"):
+        st.checkbox("🧠 Pic mémoire du processus (tracemalloc)", value=instrumentation.TRACE_MEMORY,
+                    key="perf_memoire", help="Mesures de cette session ; le pic inclut les autres sessions actives.")
+        st.checkbox("🔬 Profilage (cProfile)", value=instrumentation.PROFILE, key="perf_profil",
+                    help="Requêtes de cette session uniquement.")
+        statistiques = instrumentation.stage_stats()
+        if statistiques:
+            st.dataframe(statistiques, hide_index=True)
+            lentes = instrumentation.slowest(10)
+            st.markdown("**🐢 Requêtes les plus lentes**")
+            st.dataframe([{
+                "Étape": r["stage"],
+                "Durée (ms)": round(r["seconds"] * 1000, 1),
+                "Utilisateur": r.get("utilisateur", ""),
+                "Onglet": r.get("onglet", ""),
+                "Pic processus (Mo)": r.get("peak_mb"),
+                "Heure": time.strftime("%H:%M:%S", time.localtime(r["at"])),
+            } for r in lentes], hide_index=True)
+            profils = [r for r in lentes if "profile" in r]
+            if profils:
+                choix = st.selectbox("Profil", range(len(profils)),
+                                     format_func=lambda i: f"{profils[i]['stage']} · {profils[i]['seconds'] * 1000:.0f} ms")
+                st.code(profils[choix]["profile"])
+        else:
+            st.caption("Aucune mesure pour l'instant.")
@@ -0,0 +1,95 @@
+import argparse
+import os
+
+import numpy as np
+
+from utils.dxf_reader import modify_dxf
+
+# Répartition des entités d'un dessin synthétique
+MIX = {"lines": 0.3, "arcs": 0.2, "circles": 0.2, "polylines": 0.2, "inserts": 0.1}
+CELL = 100.0  # pas de la grille de pièces (mm)
+
+
+def synthetic_drawing(output_path, n, seed=0):
+    # n entités réparties sur une grille de pièces : polylignes à bulges fermées (contours
+    # à coins arrondis), cercles (trous), lignes et arcs isolés, insertions d'un bloc
+    rng = np.random.default_rng(seed)
+    counts = {kind: int(round(n * share)) for kind, share in MIX.items()}
+    side = int(np.ceil(np.sqrt(max(counts["polylines"], 1))))
+
+    def cells(k):
+        idx = rng.integers(0, side * side, k)
+        return np.column_stack((idx % side, idx // side)) * CELL
+
+    origin = cells(counts["lines"])
+    ends = origin + rng.uniform(5, 95, (len(origin), 2))
+    lines = [(tuple(a), tuple(b)) for a, b in zip(origin.tolist(), ends.tolist())]
+
+    centers = cells(counts["arcs"]) + rng.uniform(20, 80, (counts["arcs"], 2))
+    radii = rng.uniform(2, 15, counts["arcs"])
+    starts = rng.uniform(0, 360, counts["arcs"])
+    sweeps = rng.uniform(10, 350, counts["arcs"])
+    arcs = [(tuple(c), r, s, s + w) for c, r, s, w in zip(centers.tolist(), radii, starts, sweeps)]
+
+    centers = cells(counts["circles"]) + rng.uniform(30, 70, (counts["circles"], 2))
+    circles = [(tuple(c), r) for c, r in zip(centers.tolist(), rng.uniform(1, 10, counts["circles"]))]
+
+    # Rectangles 80 x 80 à coins arrondis (bulge 0.414 = quart de cercle)
+    polylines = []
+    bulge = np.tan(np.pi / 8)
+    for x, y in (np.column_stack((np.arange(counts["polylines"]) % side,
+                                  np.arange(counts["polylines"]) // side)) * CELL + 10).tolist():
+        r = 8.0
+        points = [(x + r, y, 0), (x + 80 - r, y, bulge), (x + 80, y + r, 0), (x + 80, y + 80 - r, bulge),
+                  (x + 80 - r, y + 80, 0), (x + r, y + 80, bulge), (x, y + 80 - r, 0), (x, y + r, bulge)]
+        polylines.append((points, True))
+
+    blocks = {"TROU_M6": [("circle", ((0, 0), 3.0)), ("line", ((-5, 0), (5, 0))), ("line", ((0, -5), (0, 5)))]}
+    anchors = cells(counts["inserts"]) + rng.uniform(10, 90, (counts["inserts"], 2))
+    inserts = [("TROU_M6", tuple(p), float(s), float(a))
+               for p, s, a in zip(anchors.tolist(), rng.uniform(0.5, 2, counts["inserts"]),
+                                  rng.uniform(0, 360, counts["inserts"]))]
+
+    modify_dxf(output_path, add_lines=lines, add_arcs=arcs, add_circles=circles, add_polylines=polylines,
+               add_blocks=blocks, add_inserts=inserts)
+    return output_path
+
+
+def synthetic_canvas(n, seed=0):
+    # JSON fabric.js équivalent à un croquis : rectangles, cercles et tracés à main levée
+    rng = np.random.default_rng(seed)
+    objects = []
+    for i in range(n):
+        left, top = rng.uniform(0, 800, 2).tolist()
+        kind = i % 3
+        if kind == 0:
+            objects.append({"type": "rect", "left": left, "top": top, "width": 40.0, "height": 25.0,
+                            "scaleX": 1.0, "scaleY": 1.0, "angle": float(rng.uniform(0, 90))})
+        elif kind == 1:
+            objects.append({"type": "circle", "left": left, "top": top, "width": 20.0, "height": 20.0,
+                            "radius": 10.0, "scaleX": 1.5, "scaleY": 1.0, "angle": 0.0})
+        else:
+            xs = np.linspace(left, left + 60, 120)
+            ys = top + 10 * np.sin(xs / 7)
+            path = [["M", xs[0], ys[0]]] + [["Q", x0, y0, x1, y1]
+                                            for x0, y0, x1, y1 in zip(xs[:-1], ys[:-1], xs[1:], ys[1:])]
+            objects.append({"type": "path", "left": left, "top": top - 10, "width": 60.0, "height": 20.0,
+                            "pathOffset": {"x": left + 30, "y": top}, "path": path,
+                            "scaleX": 1.0, "scaleY": 1.0, "angle": 0.0})
+    return {"objects": objects}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.generate",
+                                     description="Génère des DXF synthétiques")
+    parser.add_argument("directory")
+    parser.add_argument("--sizes", default="1000,10000", help="nombres d'entités, séparés par des virgules")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    os.makedirs(args.directory, exist_ok=True)
+    for n in (int(s) for s in args.sizes.split(",")):
+        print(synthetic_drawing(os.path.join(args.directory, f"synthetique_{n}.dxf"), n, args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import matplotlib
+
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+from benchmarks.generate import synthetic_canvas, synthetic_drawing
+from benchmarks.startup import measure_login, startup_regressions
+from utils.cut_time import cut_profile, cycle_time_model
+from utils.dxf_reader import get_dxf_perimeter_and_holes, load_dxf, plot_dxf
+from utils.geometry import extract_geometry
+from utils.pricing import MATERIALS, QUANTITY_BREAKS, default_machines, quote, quote_grid, ranked_table
+from utils.render import render_geometry
+from utils.reports import quote_pdf
+from utils.sketch import CanvasConverter
+from utils.topology import build_topology
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE = os.path.join(HERE, "baseline.json")
+RESULTS = os.path.join(HERE, "results", "latest.json")
+# Marge tolérée avant de considérer une mesure comme une régression
+TIME_TOLERANCE = 0.5
+MEMORY_TOLERANCE = 0.25
+# En dessous, les écarts relèvent du bruit de mesure
+MIN_SECONDS = 0.05
+MIN_PEAK_MB = 1.0
+
+
+def _plot(doc):
+    plt.close(plot_dxf(doc))
+
+
+def _quote_and_pdf(geometry, preview):
+    perimeter = geometry.perimeter
+    grid = quote_grid(default_machines(), perimeter, QUANTITY_BREAKS, materials=MATERIALS,
+                      thicknesses=[1.0, 2.0, 3.0, 5.0, 8.0, 10.0])
+    table = ranked_table(grid)
+    single = quote(default_machines(), "Machine A", "Acier", 3.0, 10, perimeter)
+    devis = {
+        "ref": "BENCH", "designation": "Pièce synthétique", "quantite": 10, "matiere": "Acier", "epaisseur": 3.0,
+        "longueur": 0.0, "largeur": 0.0, "machine": "Machine A", "vitesse_coupe": single["vitesse"],
+        "perimetre_total": perimeter, "deplacements": None, "temps_coupe_sec": single["temps_coupe_sec"],
+        "prix_matiere": 0.0, "cout_coupe": single["cout_coupe"], "total_unitaire": single["total_unitaire"],
+        "sous_traitance": 0.0, "transport": 0.0, "prix_total_final": single["prix_total"],
+        "meilleure_option": table[0] if table else None,
+    }
+    return quote_pdf(devis, preview=preview)
+
+
+def _cut_time(topology):
+    # Profil segment par segment puis grille complète avec le modèle de temps dynamique
+    machines = default_machines()
+    return quote_grid(machines, topology.geometry.perimeter, QUANTITY_BREAKS, materials=MATERIALS,
+                      thicknesses=[1.0, 2.0, 3.0, 5.0, 8.0, 10.0],
+                      cycle_time=cycle_time_model(cut_profile(topology), machines))
+
+
+def scenarios(path, n):
+    # (nom, préparation -> arguments, fonction mesurée) ; la préparation n'est pas chronométrée
+    doc = load_dxf(path)
+    geometry = extract_geometry(doc.modelspace())
+    preview = render_geometry(geometry)
+    canvas = synthetic_canvas(max(n // 10, 1))
+    topology = build_topology(geometry)
+    return [
+        ("load_dxf", lambda: (path,), load_dxf),
+        ("get_dxf_perimeter_and_holes", lambda: (doc,), get_dxf_perimeter_and_holes),
+        ("plot_dxf", lambda: (doc,), _plot),
+        ("canvas_export", lambda: (canvas,), lambda data: CanvasConverter(500).convert(data)),
+        ("quote_pdf", lambda: (geometry, preview), _quote_and_pdf),
+        ("cut_time", lambda: (topology,), _cut_time),
+    ]
+
+
+def measure(setup, fn, repeat):
+    # Temps : meilleur de `repeat` exécutions ; mémoire : pic tracemalloc d'une exécution à part
+    times = []
+    for _ in range(repeat):
+        args = setup()
+        gc.collect()
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+    args = setup()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": round(min(times), 6), "peak_mb": round(peak / 2 ** 20, 3)}
+
+
+def run(sizes, repeat, only=None, workdir=None):
+    results = {}
+    # Démarrage à froid de la page de connexion, indépendant de la taille des dessins
+    if not only or "login_page" in only:
+        results["login_page"] = measure_login(repeat)
+        print(f"{'login_page':40s} {results['login_page']['seconds'] * 1000:10.1f} ms "
+              f"(imports {results['login_page']['import_seconds'] * 1000:.1f} ms)", file=sys.stderr)
+    with tempfile.TemporaryDirectory(prefix="partlab-bench-") as tmp:
+        workdir = workdir or tmp
+        for n in sizes:
+            path = os.path.join(workdir, f"synthetique_{n}.dxf")
+            if not os.path.exists(path):
+                synthetic_drawing(path, n)
+            for name, setup, fn in scenarios(path, n):
+                if only and name not in only:
+                    continue
+                key = f"{name}/{n}"
+                results[key] = measure(setup, fn, repeat)
+                print(f"{key:40s} {results[key]['seconds'] * 1000:10.1f} ms {results[key]['peak_mb']:10.1f} Mo",
+                      file=sys.stderr)
+    return results
+
+
+def compare(results, baseline, time_tolerance=TIME_TOLERANCE, memory_tolerance=MEMORY_TOLERANCE):
+    regressions = startup_regressions(results.get("login_page", {}))
+    for key, metrics in results.items():
+        reference = baseline.get(key)
+        if reference is None:
+            continue
+        for metric, tolerance, floor in (("seconds", time_tolerance, MIN_SECONDS),
+                                         ("peak_mb", memory_tolerance, MIN_PEAK_MB)):
+            if metric not in reference or metric not in metrics:
+                continue
+            old, new = reference[metric], metrics[metric]
+            if new > max(old, floor) * (1 + tolerance):
+                regressions.append(f"{key} {metric} : {old} -> {new} (+{(new / max(old, floor) - 1) * 100:.0f} %)")
+    return regressions
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run",
+                                     description="Mesure les temps et pics mémoire des traitements DXF")
+    parser.add_argument("--sizes", default="1000,10000", help="nombres d'entités, séparés par des virgules")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", nargs="*", help="scénarios à exécuter (tous par défaut)")
+    parser.add_argument("--workdir", help="dossier où conserver les DXF générés entre deux exécutions")
+    parser.add_argument("-o", "--output", default=RESULTS, help="fichier JSON des résultats")
+    parser.add_argument("--baseline", default=BASELINE, help="référence à comparer")
+    parser.add_argument("--update-baseline", action="store_true", help="enregistrer les résultats comme référence")
+    parser.add_argument("--time-tolerance", type=float, default=TIME_TOLERANCE)
+    parser.add_argument("--memory-tolerance", type=float, default=MEMORY_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    results = run([int(s) for s in args.sizes.split(",")], args.repeat, args.only, args.workdir)
+    _write_json(args.output, {"python": platform.python_version(), "machine": platform.machine(),
+                              "created": time.time(), "results": results})
+
+    if args.update_baseline:
+        _write_json(args.baseline, results)
+        print(f"Référence enregistrée : {args.baseline}", file=sys.stderr)
+        return 0
+    if not os.path.exists(args.baseline):
+        print("Aucune référence : relancer avec --update-baseline pour en créer une", file=sys.stderr)
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.time_tolerance, args.memory_tolerance)
+    for line in regressions:
+        print(f"RÉGRESSION {line}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,89 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Modules qui ne doivent pas être chargés pour afficher la page de connexion
+HEAVY_MODULES = ("numpy", "matplotlib", "ezdxf", "fpdf", "PIL", "pandas", "streamlit_drawable_canvas")
+MARK = "partlab-startup-mark"
+
+# Exécuté dans un interpréteur neuf lancé avec -X importtime : seuls les imports qui suivent
+# le marqueur (ceux du script app.py et de son premier rendu) sont comptés
+PROBE = f"""
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+before = set(sys.modules)
+print({MARK!r}, file=sys.stderr, flush=True)
+start = time.perf_counter()
+at = AppTest.from_file("app.py", default_timeout=60)
+at.run()
+seconds = time.perf_counter() - start
+print(json.dumps({{
+    "seconds": seconds,
+    "modules": sorted(set(sys.modules) - before),
+    "exceptions": [e.value for e in at.exception],
+}}))
+"""
+
+
+def parse_importtime(stderr):
+    # Lignes "import time: self [us] | cumulative | module" ; les imports de premier niveau
+    # (nom non indenté) portent le coût cumulé de leurs dépendances
+    imports = []
+    for line in stderr.split(MARK, 1)[-1].splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit() and not name.startswith("  "):
+            imports.append((name.strip(), int(cumulative) / 1e6))
+    return imports
+
+
+def probe_login():
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", PROBE], cwd=ROOT, env=env,
+                               capture_output=True, text=True, check=True)
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["imports"] = parse_importtime(completed.stderr)
+    return result
+
+
+def measure_login(repeat=3):
+    # Meilleur de `repeat` démarrages à froid (un processus par mesure)
+    runs = [probe_login() for _ in range(repeat)]
+    best = min(runs, key=lambda r: r["seconds"])
+    if best["exceptions"]:
+        raise RuntimeError(f"page de connexion en erreur : {best['exceptions']}")
+    loaded = {m.split(".")[0] for m in best["modules"]}
+    return {
+        "seconds": round(best["seconds"], 6),
+        "import_seconds": round(sum(s for _, s in best["imports"]), 6),
+        "heavy_modules": sorted(m for m in HEAVY_MODULES if m in loaded),
+        "slowest_imports": sorted(best["imports"], key=lambda i: i[1], reverse=True)[:10],
+    }
+
+
+def startup_regressions(result):
+    return [f"login_page : {module} importé avant la connexion" for module in result.get("heavy_modules", [])]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup",
+                                     description="Mesure le premier rendu de la page de connexion")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+    result = measure_login(args.repeat)
+    print(f"Premier rendu : {result['seconds'] * 1000:.0f} ms, "
+          f"dont imports : {result['import_seconds'] * 1000:.0f} ms")
+    for name, seconds in result["slowest_imports"]:
+        print(f"  {name:50s} {seconds * 1000:8.1f} ms")
+    regressions = startup_regressions(result)
+    for line in regressions:
+        print(f"RÉGRESSION {line}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,62 @@
+import os
+
+import ezdxf
+import pytest
+
+from utils import analysis_cache
+from utils.analysis_cache import AnalysisCache, analyse_dxf_file, file_digest
+
+
+def _plate(path, size=10):
+    doc = ezdxf.new()
+    msp = doc.modelspace()
+    msp.add_lwpolyline([(0, 0), (size, 0), (size, size), (0, size)], close=True)
+    msp.add_circle((size / 2, size / 2), 1)
+    doc.saveas(path)
+    return str(path)
+
+
+def test_second_analysis_is_served_from_cache(tmp_path, monkeypatch):
+    path = _plate(tmp_path / "plaque.dxf")
+    cache = AnalysisCache(str(tmp_path / "cache"))
+    first = analyse_dxf_file(path, cache)
+    # Succès du cache : ezdxf n'est plus appelé
+    monkeypatch.setattr(analysis_cache, "load_dxf", lambda p: pytest.fail("DXF relu malgré le cache"))
+    second = analyse_dxf_file(path, cache)
+    assert (second["perimeter"], second["holes"], second["area"]) == (first["perimeter"], first["holes"],
+                                                                      first["area"])
+    assert second["digest"] == file_digest(path)
+    assert second["preview"] == first["preview"]
+    assert (second["geometry"].segments == first["geometry"].segments).all()
+
+
+def test_version_bump_ignores_old_entries(tmp_path, monkeypatch):
+    path = _plate(tmp_path / "plaque.dxf")
+    cache = AnalysisCache(str(tmp_path / "cache"))
+    analyse_dxf_file(path, cache)
+    digest = file_digest(path)
+    assert cache.get(digest) is not None
+    monkeypatch.setattr(analysis_cache, "CACHE_VERSION", analysis_cache.CACHE_VERSION + 1)
+    assert cache.get(digest) is None
+    analyse_dxf_file(path, cache)
+    assert cache.get(digest) is not None
+    assert len(os.listdir(cache.root)) == 2
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    root = str(tmp_path / "cache")
+    digests = []
+    for i in range(3):
+        path = _plate(tmp_path / f"plaque{i}.dxf", size=10 + i)
+        analyse_dxf_file(path, AnalysisCache(root))
+        digests.append(file_digest(path))
+    cache = AnalysisCache(root)
+    sizes = {os.path.basename(path): size for _, size, path in cache.entries()}
+    # Horodatages explicites : 0 le plus ancien ; la lecture de 0 le rend le plus récent
+    for age, digest in enumerate(digests):
+        os.utime(cache._entry(digest), (1000 + age, 1000 + age))
+    assert cache.get(digests[0]) is not None
+    cache.max_bytes = sum(sizes.values()) - 1
+    cache.evict()
+    assert cache.get(digests[1]) is None
+    assert cache.get(digests[0]) is not None and cache.get(digests[2]) is not None
@@ -0,0 +1,72 @@
+import json
+import os
+import time
+
+import ezdxf
+
+from utils import batch
+from utils.batch import FIELDS, ResultWriter, analyse_path, main, run_batch
+
+
+def _plate(path):
+    doc = ezdxf.new()
+    msp = doc.modelspace()
+    msp.add_lwpolyline([(0, 0), (10, 0), (10, 10), (0, 10)], close=True)
+    msp.add_circle((5, 5), 1)
+    doc.saveas(path)
+    return str(path)
+
+
+class _Collect:
+
+    def __init__(self):
+        self.results = []
+
+    def write(self, result):
+        self.results.append(result)
+
+
+def _crash_on_marker(file_path, timeout=None):
+    # Processus du pool tué net (crash natif simulé)
+    if "crash" in os.path.basename(file_path):
+        os._exit(1)
+    return analyse_path(file_path, timeout)
+
+
+def test_corrupt_file_is_isolated_and_stdout_stays_jsonl(tmp_path, capfd):
+    _plate(tmp_path / "plaque.dxf")
+    (tmp_path / "corrompu.dxf").write_text("pas un DXF")
+    assert main(["analyze", str(tmp_path), "-j", "2"]) == 1
+    out, err = capfd.readouterr()
+    results = {os.path.basename(r["file"]): r for r in map(json.loads, out.splitlines())}
+    assert set(results) == {"plaque.dxf", "corrompu.dxf"}
+    assert (results["plaque.dxf"]["status"], results["plaque.dxf"]["holes"]) == ("ok", 1)
+    assert results["corrompu.dxf"]["status"] == "error"
+    # Messages d'erreur et synthèse hors du flux de résultats
+    assert "Erreur de lecture DXF" in err and "2 fichiers (1 ok, 1 erreurs, 0 hors délai)" in err
+
+
+def test_slow_file_times_out(tmp_path, monkeypatch):
+    monkeypatch.setattr(batch, "load_dxf", lambda path: time.sleep(5))
+    start = time.perf_counter()
+    result = analyse_path(_plate(tmp_path / "lent.dxf"), timeout=0.2)
+    assert time.perf_counter() - start < 2
+    assert result["status"] == "timeout" and result["perimeter"] is None
+
+
+def test_crashed_worker_is_reported_as_error(tmp_path, monkeypatch):
+    monkeypatch.setattr(batch, "analyse_path", _crash_on_marker)
+    writer = _Collect()
+    summary = run_batch([_plate(tmp_path / "crash.dxf")], writer, jobs=1)
+    assert summary["errors"] == 1 and summary["ok"] == 0
+    [result] = writer.results
+    assert set(result) == set(FIELDS)
+    assert result["status"] == "error" and "BrokenProcessPool" in result["error"]
+
+
+def test_csv_writer_streams_header_then_rows(tmp_path):
+    with open(tmp_path / "out.csv", "w", newline="", encoding="utf-8") as stream:
+        writer = ResultWriter(stream, "csv")
+        writer.write(analyse_path(_plate(tmp_path / "plaque.dxf")))
+    lines = (tmp_path / "out.csv").read_text(encoding="utf-8").splitlines()
+    assert lines[0].split(",") == FIELDS and len(lines) == 2
@@ -0,0 +1,65 @@
+import csv
+import io
+
+import pytest
+
+from utils.bom import bom_summary, price_bom, read_bom, totals_csv
+from utils.cut_time import CutProfile, cycle_time_model
+from utils.pricing import ZERO_AREA_WARNING, default_machines, material_cost, quote
+from utils.toolpath import RAPID_SPEED
+
+
+def _line(number, fichier, quantite):
+    return {"ligne": number, "ref": "", "designation": "", "fichier": fichier, "matiere": "Acier",
+            "epaisseur": 3.0, "quantite": quantite, "erreur": ""}
+
+
+def _analysis(area, perimeter=400.0):
+    return {"area": area, "perimeter": perimeter, "contours": [], "profil": CutProfile.simple(perimeter)}
+
+
+def test_open_contours_are_flagged():
+    analyses = {"plaque.dxf": _analysis(10000.0), "ouvert.dxf": _analysis(0.0)}
+    priced = price_bom([_line(2, "plaque.dxf", 1), _line(3, "ouvert.dxf", 1)], analyses, default_machines())
+    assert priced[0]["erreur"] == ""
+    # Chiffrée (coupe seule) mais signalée : elle reste au total
+    assert priced[1]["devis"] is not None and priced[1]["devis"]["prix_matiere"] == 0.0
+    assert priced[1]["erreur"] == ZERO_AREA_WARNING
+    summary = bom_summary(priced)
+    assert (summary["chiffrees"], summary["erreurs"], summary["alertes"]) == (2, 0, 1)
+
+
+def test_total_row_time_is_machine_time():
+    priced = price_bom([_line(2, "plaque.dxf", 3)], {"plaque.dxf": _analysis(10000.0)}, default_machines())
+    rows = list(csv.DictReader(io.StringIO(totals_csv(priced)), delimiter=";"))
+    piece = float(rows[0]["Temps/pièce (s)"])
+    assert float(rows[0]["Temps total (s)"]) == round(piece * 3, 1)
+    assert rows[-1]["Ligne"] == "Total"
+    assert rows[-1]["Temps/pièce (s)"] == ""
+    assert float(rows[-1]["Temps total (s)"]) == round(bom_summary(priced)["temps"], 1)
+
+
+def test_bom_line_matches_single_part_quote():
+    # Même pièce, même machine : temps et prix identiques à ceux de l'onglet Devis (déplacements compris)
+    config = default_machines()
+    analysis = _analysis(10000.0)
+    analysis["deplacements"] = 600.0
+    devis = price_bom([_line(2, "plaque.dxf", 5)], {"plaque.dxf": analysis}, config)[0]["devis"]
+    cout = material_cost(10000.0, "Acier", 3.0)["cout_matiere"]
+    single = quote(config, devis["machine"], "Acier", 3.0, 5, 400.0, rapid_distance=600.0, rapid_speed=RAPID_SPEED,
+                   material_cost=cout, cycle_time=cycle_time_model(analysis["profil"], config))
+    assert devis["deplacements"] == 600.0
+    assert devis["temps_coupe_sec"] == pytest.approx(single["temps_coupe_sec"])
+    assert devis["prix_total_final"] == pytest.approx(single["prix_total"])
+
+
+def test_read_xlsx_bom():
+    openpyxl = pytest.importorskip("openpyxl")
+    book = openpyxl.Workbook()
+    book.active.append(["Réf", "Qté", "Matière", "Épaisseur", "Fichier"])
+    book.active.append(["P1", 4, "acier", 2.5, "plaque.dxf"])
+    stream = io.BytesIO()
+    book.save(stream)
+    lines = read_bom(stream.getvalue(), "nomenclature.xlsx")
+    assert [(l["ref"], l["quantite"], l["matiere"], l["epaisseur"], l["erreur"]) for l in lines] == \
+        [("P1", 4, "Acier", 2.5, "")]
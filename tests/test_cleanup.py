@@ -0,0 +1,77 @@
+import ezdxf
+import numpy as np
+import pytest
+
+from utils.cleanup import clean_geometry
+from utils.geometry import extract_geometry
+from utils.topology import build_topology
+
+
+def _geometry(*draw):
+    doc = ezdxf.new()
+    msp = doc.modelspace()
+    for add in draw:
+        add(msp)
+    return extract_geometry(msp)
+
+
+def _rectangle(msp, x0, y0, x1, y1):
+    msp.add_lwpolyline([(x0, y0), (x1, y0), (x1, y1), (x0, y1)], close=True)
+
+
+def test_collinear_overlap_keeps_contour_vertices():
+    # Trait de construction posé sur le bord inférieur : le contour et son trou doivent survivre
+    geometry = _geometry(lambda m: _rectangle(m, 0, 0, 100, 50), lambda m: _rectangle(m, 40, 20, 60, 30),
+                         lambda m: m.add_line((50, 0), (120, 0)))
+    cleaned, report = clean_geometry(geometry)
+    topology = build_topology(cleaned)
+    assert topology.n_loops == 2
+    assert topology.num_holes == 1
+    assert topology.net_area == pytest.approx(4800.0)
+    # Seul le recouvrement (50 → 100) n'est plus coupé deux fois
+    assert report["chevauchements"] == 1
+    assert report["longueur_retiree"] == pytest.approx(50.0)
+    assert cleaned.perimeter == pytest.approx(380.0)
+
+
+def test_exact_duplicates_and_zero_length_removed():
+    geometry = _geometry(lambda m: _rectangle(m, 0, 0, 10, 10), lambda m: m.add_line((0, 0), (10, 0)),
+                         lambda m: m.add_line((5, 5), (5, 5)), lambda m: m.add_circle((5, 5), 2),
+                         lambda m: m.add_circle((5, 5), 2))
+    cleaned, report = clean_geometry(geometry)
+    assert report["nuls"] == 1
+    assert report["doublons"] == 2
+    assert len(cleaned.circles) == 1
+    assert cleaned.perimeter == pytest.approx(40.0 + 4.0 * np.pi)
+
+
+def test_overlapping_arc_keeps_slot_closed():
+    # Arc de construction qui recouvre en partie l'extrémité d'une oblongue
+    geometry = _geometry(
+        lambda m: m.add_lwpolyline([(0, 0, 0), (100, 0, 1), (100, 40, 0), (0, 40, 1)], close=True, format="xyb"),
+        lambda m: m.add_arc((100, 20), 20, -45, 135))
+    cleaned, report = clean_geometry(geometry)
+    topology = build_topology(cleaned)
+    assert report["arcs"] == 1
+    assert topology.n_loops == 1
+    assert topology.net_area == pytest.approx(4000.0 + np.pi * 400.0)
+    # Arc de 225° au lieu de 180° + 180°
+    assert cleaned.perimeter == pytest.approx(200.0 + 2.0 * np.pi * 20.0 + np.pi * 20.0 / 4.0)
+
+
+def test_arcs_covering_circle_replace_it():
+    geometry = _geometry(lambda m: _rectangle(m, -50, -50, 50, 50), lambda m: m.add_arc((0, 0), 10, 0, 200),
+                         lambda m: m.add_arc((0, 0), 10, 180, 370), lambda m: m.add_circle((0, 0), 10))
+    cleaned, _ = clean_geometry(geometry)
+    topology = build_topology(cleaned)
+    assert len(cleaned.circles) == 0
+    assert topology.num_holes == 1
+    assert topology.net_area == pytest.approx(10000.0 - np.pi * 100.0)
+    assert cleaned.perimeter == pytest.approx(400.0 + 2.0 * np.pi * 10.0)
+
+
+def test_small_gap_closed():
+    geometry = _geometry(lambda m: m.add_lwpolyline([(0, 0), (10, 0), (10, 10), (0, 10), (0, 0.05)]))
+    cleaned, report = clean_geometry(geometry)
+    assert report["jonctions"] == 1
+    assert build_topology(cleaned).net_area == pytest.approx(100.0, abs=0.5)
@@ -0,0 +1,30 @@
+import pytest
+
+from utils.database import Database
+
+
+def _devis(**extra):
+    devis = {"ref": "R1", "designation": "Pièce", "matiere": "Acier", "epaisseur": 3.0, "quantite": 2,
+             "machine": "Machine A", "prix_total_final": 12.5}
+    devis.update(extra)
+    return devis
+
+
+def test_quote_details_skip_preview(tmp_path):
+    base = Database(str(tmp_path / "partlab.db"), pool_size=1)
+    quote_id = base.add_quote("u", _devis(apercu=b"\x89PNG" * 1000))
+    assert base.get_quote(quote_id) == _devis()
+
+
+def test_quote_details_reject_non_json(tmp_path):
+    base = Database(str(tmp_path / "partlab.db"), pool_size=1)
+    with pytest.raises(TypeError):
+        base.add_quote("u", _devis(postes={1, 2}))
+    assert base.count_quotes() == 0
+
+
+def test_configurations_newest_first(tmp_path):
+    base = Database(str(tmp_path / "partlab.db"), pool_size=1)
+    for epaisseur in (1.0, 2.0, 3.0):
+        base.add_configuration("u", "Acier", epaisseur, 1)
+    assert [c["epaisseur"] for c in base.list_configurations("u", limit=2)] == [3.0, 2.0]
@@ -0,0 +1,31 @@
+import ezdxf
+import pytest
+
+from utils import dxf_reader
+from utils.dxf_reader import STREAMING_HOLES_NOTE, get_dxf_perimeter_and_holes
+
+
+def _plate(path, fmt="asc"):
+    doc = ezdxf.new()
+    msp = doc.modelspace()
+    msp.add_lwpolyline([(0, 0), (10, 0), (10, 10), (0, 10)], close=True)
+    msp.add_lwpolyline([(2, 2), (4, 2), (4, 4)], close=True)
+    doc.saveas(path, fmt=fmt)
+    return str(path)
+
+
+def test_streaming_failure_falls_back_to_full_load(tmp_path, monkeypatch):
+    # iterdxf ne lit pas les DXF binaires : le fichier doit être analysé quand même
+    monkeypatch.setattr(dxf_reader, "STREAMING_THRESHOLD", 0)
+    perimeter, holes, _ = get_dxf_perimeter_and_holes(_plate(tmp_path / "plaque.dxf", fmt="bin"))
+    assert perimeter == pytest.approx(46.83, abs=0.01)
+    assert holes == 1
+
+
+def test_streaming_hole_count_is_flagged(tmp_path, monkeypatch):
+    monkeypatch.setattr(dxf_reader, "STREAMING_THRESHOLD", 0)
+    perimeter, holes, details = get_dxf_perimeter_and_holes(_plate(tmp_path / "plaque.dxf"))
+    assert perimeter == pytest.approx(46.83, abs=0.01)
+    # Triangle fermé non compté : seuls les cercles le sont en flux
+    assert holes == 0
+    assert STREAMING_HOLES_NOTE in list(details)
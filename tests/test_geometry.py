@@ -0,0 +1,66 @@
+import ezdxf
+import numpy as np
+import pytest
+
+from utils.geometry import extract_geometry
+from utils.topology import build_topology
+
+
+def _plate_block(doc):
+    block = doc.blocks.new("PLAQUE")
+    block.add_lwpolyline([(0, 0), (40, 0), (40, 20), (0, 20)], close=True)
+    block.add_circle((10, 10), 4)
+    block.add_arc((30, 10), 5, 0, 180)
+    return block
+
+
+def _reference(msp):
+    # Référence : blocs éclatés par ezdxf
+    entities = []
+    for e in msp:
+        entities.extend(e.virtual_entities() if e.dxftype() == "INSERT" else [e])
+    return extract_geometry(entities)
+
+
+@pytest.mark.parametrize("attribs", [
+    {"insert": (100, 50), "rotation": 30},
+    {"insert": (0, 0), "xscale": 2, "yscale": 2, "rotation": 90},
+    {"insert": (5, 5), "xscale": -1, "yscale": 1},
+])
+def test_insert_matches_exploded_block(attribs):
+    doc = ezdxf.new()
+    _plate_block(doc)
+    msp = doc.modelspace()
+    msp.add_blockref("PLAQUE", attribs.pop("insert"), dxfattribs=attribs)
+    geometry, reference = extract_geometry(msp), _reference(msp)
+    assert geometry.perimeter == pytest.approx(reference.perimeter)
+    assert build_topology(geometry).net_area == pytest.approx(build_topology(reference).net_area)
+    assert len(geometry.circles) == 1
+
+
+def test_non_uniform_scale_flattens_circles():
+    doc = ezdxf.new()
+    _plate_block(doc)
+    msp = doc.modelspace()
+    msp.add_blockref("PLAQUE", (0, 0), dxfattribs={"xscale": 2, "yscale": 1})
+    geometry = extract_geometry(msp)
+    # Le cercle devient une ellipse 16 × 8, discrétisée en cordes
+    assert len(geometry.circles) == 0
+    assert geometry.perimeter == pytest.approx(_reference(msp).perimeter, rel=1e-3)
+    assert build_topology(geometry).net_area == pytest.approx(1600.0 - np.pi * 8 * 4, rel=1e-3)
+
+
+def test_minsert_array():
+    doc = ezdxf.new()
+    _plate_block(doc)
+    msp = doc.modelspace()
+    msp.add_blockref("PLAQUE", (0, 0)).grid(size=(2, 3), spacing=(30, 50))
+    geometry = extract_geometry(msp)
+    assert geometry.perimeter == pytest.approx(6 * _reference_single_perimeter())
+    assert build_topology(geometry).n_loops == 12
+
+
+def _reference_single_perimeter():
+    doc = ezdxf.new()
+    _plate_block(doc)
+    return extract_geometry(doc.blocks.get("PLAQUE")).perimeter
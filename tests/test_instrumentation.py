@@ -0,0 +1,40 @@
+import contextvars
+import threading
+
+from utils import instrumentation
+from utils.instrumentation import set_options, timed
+
+
+def _measure(stage, memory=None):
+    if memory is not None:
+        set_options(memory=memory)
+    with timed(stage) as record:
+        bytearray(1024)
+    return record
+
+
+def test_memory_option_is_per_session():
+    # Chaque session Streamlit tourne dans son propre contexte : l'option ne déborde pas
+    results = {}
+
+    def session(name, memory):
+        results[name] = contextvars.Context().run(_measure, name, memory)
+
+    threads = [threading.Thread(target=session, args=("admin", True)),
+               threading.Thread(target=session, args=("client", None))]
+    for thread in threads:
+        thread.start()
+        thread.join()
+    assert "peak_mb" in results["admin"]
+    assert ("peak_mb" in results["client"]) == instrumentation.TRACE_MEMORY
+
+
+def _measure_without_memory():
+    set_options(memory=True)
+    with timed("sans_memoire", memory=False) as record:
+        pass
+    return record
+
+
+def test_explicit_argument_wins_over_session_option():
+    assert "peak_mb" not in contextvars.Context().run(_measure_without_memory)
@@ -0,0 +1,80 @@
+import multiprocessing
+import time
+
+import ezdxf
+import pytest
+
+from utils import jobs
+from utils.jobs import JobQueue
+
+
+def _plate(path):
+    doc = ezdxf.new()
+    doc.modelspace().add_lwpolyline([(0, 0), (10, 0), (10, 10), (0, 10)], close=True)
+    doc.modelspace().add_circle((5, 5), 1)
+    doc.saveas(path)
+    return str(path)
+
+
+def _slow_load(buffer):
+    # Lecture DXF interminable : seule l'annulation l'arrête
+    time.sleep(60)
+
+
+def _wait(queue, job, timeout=20):
+    limit = time.time() + timeout
+    while not queue.status(job.id)["done"]:
+        assert time.time() < limit, queue.status(job.id)
+        time.sleep(0.05)
+    return queue.status(job.id)
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    if "fork" not in multiprocessing.get_all_start_methods():
+        pytest.skip("les remplacements de fonctions ne suivent les processus qu'avec fork")
+    monkeypatch.setattr(jobs, "START_METHOD", "fork")
+    queue = JobQueue(workers=1, cache_root=str(tmp_path / "cache"))
+    yield queue
+    if queue._pool is not None:
+        queue._pool.shutdown(wait=True, cancel_futures=True)
+        queue._manager.shutdown()
+
+
+def test_same_content_is_analysed_once(queue, tmp_path):
+    path = _plate(tmp_path / "plaque.dxf")
+    first = queue.submit(path, owner="alice")
+    second = queue.submit(path, owner="bob")
+    assert second is first and first.owners == {"alice", "bob"}
+    assert _wait(queue, first)["state"] == "done"
+    assert queue.result(first.id)["holes"] == 1
+    # Résultat en cache disque : pas de nouveau travail dans le pool
+    queue.by_digest.clear()
+    cached = queue.submit(path, owner="carol")
+    assert cached.future is None and queue.status(cached.id)["state"] == "done"
+
+
+def test_running_job_is_cancelled_inside_the_stage(queue, tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "load_dxf_buffer", _slow_load)
+    path = _plate(tmp_path / "lent.dxf")
+    job = queue.submit(path, owner="alice")
+    assert queue.submit(path, owner="bob") is job
+    while queue.status(job.id)["state"] != "running":
+        time.sleep(0.05)
+    # Une autre session attend encore le résultat : pas d'annulation
+    assert not queue.cancel(job.id, "alice")
+    assert queue.cancel(job.id, "bob")
+    start = time.time()
+    assert _wait(queue, job)["state"] == "cancelled"
+    assert time.time() - start < 5
+
+
+def test_finished_jobs_are_purged(queue, tmp_path, monkeypatch):
+    job = queue.submit(_plate(tmp_path / "plaque.dxf"), owner="alice")
+    _wait(queue, job)
+    assert job.id in queue.stages
+    monkeypatch.setattr(jobs, "JOB_TTL", 0)
+    job.finished = time.time() - 1
+    queue.submit(_plate(tmp_path / "autre.dxf"), owner="alice")
+    assert queue.get(job.id) is None and job.digest not in queue.by_digest
+    assert job.id not in queue.stages
@@ -0,0 +1,53 @@
+import time
+
+import numpy as np
+
+from utils.nesting import _dilate, _rotated_size, nest_parts, raster_nest, skyline_nest
+
+
+def _square(size):
+    outline = np.array([[0.0, 0.0], [size, 0.0], [size, size], [0.0, size]])
+    return {"outline": outline, "holes": [], "area": size * size}
+
+
+def test_dilate_is_square():
+    mask = np.zeros((7, 7), dtype=bool)
+    mask[3, 3] = True
+    grown = _dilate(mask, 2)
+    assert grown[1:6, 1:6].all()
+    assert grown.sum() == 25
+
+
+def test_raster_nest_stops_at_deadline():
+    shapes = [_square(10.0)]
+    assert raster_nest(shapes, [0] * 50, 200, 200, 2.0, 1.0, deadline=time.time() - 1) is None
+
+
+def test_nest_parts_respects_time_budget():
+    # Pas de passe raster complète possible : la solution skyline est rendue dans le budget
+    shapes = [_square(40.0)]
+    start = time.time()
+    result = nest_parts(shapes, 300, 3000, 1500, time_budget=0.5, workers=1, resolution=2.0)
+    assert time.time() - start < 3.0
+    assert len(result.placements) == 300
+    assert result.unplaced == 0
+
+
+def test_skyline_past_deadline_places_every_part_without_overlap():
+    shapes = [_square(40.0), {"outline": np.array([[0.0, 0.0], [90.0, 0.0], [90.0, 25.0], [0.0, 25.0]]),
+                               "holes": [], "area": 2250.0}]
+    items = [0, 1] * 10
+    full = skyline_nest(shapes, items[:6], 300, 200, 5.0)
+    placements, sheets, unplaced = skyline_nest(shapes, items, 300, 200, 5.0, deadline=time.time() + 3600)
+    assert placements[:6] == full[0]
+    placements, sheets, unplaced = skyline_nest(shapes, items, 300, 200, 5.0, deadline=time.time() - 1)
+    assert (len(placements), unplaced) == (20, 0)
+    boxes = []
+    for sheet, shape, angle, x, y in placements:
+        w, h = _rotated_size(shapes[shape]["outline"], angle)
+        assert x + w <= 300 + 1e-9 and y + h <= 200 + 1e-9
+        boxes.append((sheet, x, y, x + w, y + h))
+    for i, a in enumerate(boxes):
+        for b in boxes[i + 1:]:
+            assert a[0] != b[0] or a[3] <= b[1] or b[3] <= a[1] or a[4] <= b[2] or b[4] <= a[2]
+    assert sheets == max(b[0] for b in boxes) + 1
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from utils.cut_time import CutProfile, cycle_time_model
+from utils.pricing import QUANTITY_BREAKS, TARIF_SECONDE, default_machines, quote, quote_grid, ranked_table, speed_grid
+
+
+def test_empty_speed_table_means_not_cut():
+    config = {"M": {"Acier": {}, "Alu": {3.0: 10.0}}}
+    speed = speed_grid(config, ["M"], ["Acier", "Alu"], [3.0])
+    assert np.isnan(speed[0, 0, 0])
+    assert speed[0, 1, 0] == 10.0
+    grid = quote_grid(config, 100.0, [1], materials=["Acier", "Alu"])
+    assert np.isnan(grid["total"][0, 0, 0, 0])
+    assert np.isfinite(grid["total"][0, 1, 0, 0])
+
+
+def test_quote_grid_prices():
+    # Acier 3 mm : 20 mm/s (A) et 25 mm/s (B) ; 4,5 mm (interpolé) : 15,5 et 19,5 mm/s
+    config = default_machines()
+    grid = quote_grid(config, 1000.0, [1, 10], machines=["Machine A", "Machine B"], materials=["Acier"],
+                      thicknesses=[3.0, 4.5], material_cost=2.0, fixed_costs=5.0)
+    np.testing.assert_allclose(grid["speed"][:, 0], [[20.0, 15.5], [25.0, 19.5]])
+    assert grid["seconds"][0, 0, 0] == 50.0
+    assert grid["unit"][0, 0, 0] == 50.0 * TARIF_SECONDE + 2.0
+    assert grid["total"][0, 0, 0, 1] == 10 * (50.0 * TARIF_SECONDE + 2.0) + 5.0
+    assert grid["unit_price"][0, 0, 0, 1] == grid["total"][0, 0, 0, 1] / 10
+    assert grid["batch_seconds"][1, 0, 0, 1] == 400.0
+
+
+def test_ranked_table_and_single_quote_agree():
+    config = default_machines()
+    grid = quote_grid(config, 500.0, QUANTITY_BREAKS, thicknesses=[2.0])
+    rows = ranked_table(grid, material="Inox", quantity=10)
+    assert [r["Machine"] for r in rows] == ["Machine B", "Machine A", "Machine C"]
+    assert [r["Rang"] for r in rows] == [1, 2, 3]
+    assert rows[0]["Plus rapide"]
+    single = quote(config, "Machine B", "Inox", 2.0, 10, 500.0)
+    assert single["prix_total"] == pytest.approx(rows[0]["Prix total (€)"], abs=0.005)
+    assert single["vitesse"] == pytest.approx(rows[0]["Vitesse (mm/s)"])
+
+
+def test_cycle_time_adds_pierces_and_corners():
+    config = default_machines()
+    profile = CutProfile.simple(400.0, pierces=2, corners=4)
+    grid = quote_grid(config, 400.0, [1], machines=["Machine A"], materials=["Acier"],
+                      cycle_time=cycle_time_model(profile, config))
+    # 400 / 20 s de coupe, 2 × 0,3 s de perçage, 4 arrêts aux angles et 2 départs (v / a chacun)
+    assert grid["seconds"][0, 0, 0] == pytest.approx(20.0 + 0.6 + 6 * 20.0 / 5000.0)
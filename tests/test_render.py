@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+from matplotlib.figure import Figure
+
+from utils.geometry import DxfGeometry
+from utils.render import clip_pieces, decimate, draw_geometry, render_geometry
+
+
+def _geometry(segments):
+    segments = np.asarray(segments, dtype=np.float64)
+    n = len(segments)
+    return DxfGeometry(segments, np.arange(n), np.zeros((0, 3)), np.zeros(0, dtype=np.int64),
+                       np.zeros(n, dtype=np.int8))
+
+
+def _drawn_pieces(ax):
+    return sum(len(patch.get_path().vertices) // 2 for patch in ax.patches)
+
+
+def test_clip_trims_crossing_pieces_and_drops_outside_ones():
+    pieces = np.array([
+        [[-5.0, 5.0], [15.0, 5.0]],   # traverse la boîte
+        [[2.0, 2.0], [8.0, 3.0]],     # entièrement dedans
+        [[20.0, 0.0], [20.0, 10.0]],  # verticale, dehors
+        [[5.0, -4.0], [5.0, 4.0]],    # verticale, entre par le bas
+        [[-3.0, 12.0], [12.0, 13.0]],  # au-dessus
+    ])
+    clipped, kinds = clip_pieces(pieces, np.arange(5), (0.0, 0.0, 10.0, 10.0))
+    assert list(kinds) == [0, 1, 3]
+    assert clipped[0] == pytest.approx(np.array([[0.0, 5.0], [10.0, 5.0]]))
+    assert clipped[1] == pytest.approx(pieces[1])
+    assert clipped[2] == pytest.approx(np.array([[5.0, 0.0], [5.0, 4.0]]))
+
+
+def test_decimate_merges_pieces_on_the_same_pixels():
+    pieces = np.array([
+        [[0.1, 0.1], [5.2, 0.3]],
+        [[5.4, 0.2], [0.3, 0.4]],  # même couple de pixels, sens inverse
+        [[0.2, 0.2], [5.1, 1.6]],  # extrémité dans un autre pixel
+    ])
+    kept, kinds = decimate(pieces, np.array([0, 0, 1]), 1.0, np.zeros(2))
+    assert len(kept) == 2
+    assert sorted(kinds) == [0, 1]
+
+
+def test_level_of_detail_only_above_threshold():
+    # 2000 segments de 0,01 mm sur une pièce de 100 mm : quelques pixels suffisent
+    x = np.linspace(0.0, 20.0, 2001)
+    segments = np.column_stack((x[:-1], np.zeros(2000), x[1:], np.zeros(2000), np.zeros(2000)))
+    segments = np.vstack((segments, [[0.0, 0.0, 100.0, 100.0, 0.0]]))
+    full, lod = Figure().add_subplot(), Figure().add_subplot()
+    draw_geometry(full, _geometry(segments), width_px=100)
+    draw_geometry(lod, _geometry(segments), width_px=100, lod_threshold=1000)
+    assert _drawn_pieces(full) == 2001
+    assert _drawn_pieces(lod) <= 50
+
+
+def test_render_is_memoised_by_key():
+    geometry = _geometry([[0.0, 0.0, 10.0, 0.0, 0.0], [10.0, 0.0, 10.0, 10.0, 0.5]])
+    png = render_geometry(geometry, key="carre-test")
+    assert png.startswith(b"\x89PNG")
+    assert render_geometry(geometry, key="carre-test") is png
+    assert render_geometry(geometry, fmt="svg", key="carre-test").lstrip().startswith(b"<?xml")
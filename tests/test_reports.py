@@ -0,0 +1,23 @@
+import numpy as np
+
+from utils.reports import ReportPDF, drawing_pdf, image_png, pdf_text
+
+
+def test_text_keeps_winansi_and_drops_emojis():
+    assert pdf_text("🧾 Total – 12 €") == "Total – 12 €"
+
+
+def test_preview_is_embedded_once_in_memory(tmp_path, monkeypatch):
+    # Aucun fichier écrit : le dossier courant et le dossier temporaire restent vides
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("TMPDIR", str(tmp_path))
+    png = image_png(np.random.default_rng(0).random((30, 40, 4)))
+    pdf = ReportPDF()
+    for _ in range(3):
+        pdf.add_page()
+        pdf.png(png, w=100)
+    data = pdf.to_bytes()
+    assert data.startswith(b"%PDF")
+    assert data.count(b"/Subtype /Image") == 1
+    assert drawing_pdf(np.zeros((10, 10, 3))).startswith(b"%PDF")
+    assert list(tmp_path.iterdir()) == []
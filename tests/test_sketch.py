@@ -0,0 +1,58 @@
+import io
+
+import ezdxf
+import numpy as np
+import pytest
+
+from utils.sketch import CanvasConverter, rdp
+
+
+def _rect(left, top, width=30.0, height=10.0, **extra):
+    return {"type": "rect", "left": left, "top": top, "width": width, "height": height, **extra}
+
+
+def _entities(dxf_bytes):
+    doc = ezdxf.read(io.StringIO(dxf_bytes.decode("utf-8")))
+    return list(doc.modelspace())
+
+
+def test_rdp_drops_points_within_tolerance():
+    x = np.linspace(0.0, 100.0, 201)
+    noisy = np.column_stack((x, 0.2 * np.sin(x)))
+    assert len(rdp(noisy, 0.5)) == 2
+    corner = np.array([[0.0, 0.0], [5.0, 0.1], [10.0, 0.0], [10.0, 10.0]])
+    assert rdp(corner, 0.5).tolist() == [[0.0, 0.0], [10.0, 0.0], [10.0, 10.0]]
+    # Tracé fermé : premier et dernier points confondus
+    loop = np.array([[0.0, 0.0], [10.0, 0.0], [10.0, 10.0], [0.0, 0.0]])
+    assert len(rdp(loop, 0.5)) == 4
+
+
+def test_only_new_objects_are_converted():
+    converter = CanvasConverter(height=100)
+    first = converter.convert({"objects": [_rect(10, 20)]})
+    assert (converter.converted, converter.reused) == (1, 0)
+    assert converter.convert({"objects": [_rect(10, 20)]}) is first
+    converter.convert({"objects": [_rect(10, 20), {"type": "circle", "left": 50, "top": 50, "radius": 5}]})
+    assert (converter.converted, converter.reused) == (2, 2)
+    # Objet supprimé : primitives oubliées, DXF réécrit sans lui
+    dxf = converter.convert({"objects": [_rect(10, 20)]})
+    assert len(converter.primitives) == 1
+    assert [e.dxftype() for e in _entities(dxf)] == ["LWPOLYLINE"]
+
+
+def test_rect_is_placed_in_dxf_coordinates():
+    converter = CanvasConverter(height=100)
+    [polyline] = _entities(converter.convert({"objects": [_rect(10, 20)]}))
+    points = [tuple(p[:2]) for p in polyline.get_points()]
+    assert polyline.closed
+    assert sorted(points) == pytest.approx(sorted([(10, 80), (40, 80), (40, 70), (10, 70)]))
+
+
+def test_freehand_path_is_simplified():
+    x = np.linspace(0.0, 50.0, 101)
+    path = [["M", 0.0, 0.0]] + [["L", float(v), 0.1 * float(i % 2)] for i, v in enumerate(x[1:])]
+    converter = CanvasConverter(height=100)
+    [polyline] = _entities(converter.convert({"objects": [
+        {"type": "path", "left": 0, "top": 0, "width": 50, "height": 0.1, "path": path,
+         "pathOffset": {"x": 25.0, "y": 0.05}}]}))
+    assert len(polyline) == 2
@@ -0,0 +1,28 @@
+import numpy as np
+
+from utils.geometry import DxfGeometry
+from utils.render import clip_pieces
+from utils.tiles import TileGrid, spatial_index
+
+
+def _lines(segments):
+    segments = np.asarray(segments, dtype=np.float64)
+    return DxfGeometry(segments, np.zeros(len(segments), dtype=np.int64), np.zeros((0, 3)),
+                       np.zeros(0, dtype=np.int64), np.zeros(1, dtype=np.int8))
+
+
+def test_clip_pieces_to_box():
+    pieces = np.array([[[-10, 5], [20, 5]], [[0, -5], [10, 15]], [[20, 20], [30, 30]]], dtype=np.float64)
+    clipped, kinds = clip_pieces(pieces, np.arange(3), (0, 0, 10, 10))
+    assert list(kinds) == [0, 1]
+    np.testing.assert_allclose(clipped[0], [[0, 5], [10, 5]])
+    np.testing.assert_allclose(clipped[1], [[2.5, 0], [7.5, 10]])
+
+
+def test_deep_zoom_keeps_close_parallel_lines():
+    # Deux diagonales à 0,5 mm (≈ 378 px au zoom 10) qui traversent toute la tuile
+    geometry = _lines([[0, 0, 1000, 1000, 0], [0.5, 0, 1000.5, 1000, 0], [0, 0, 1000, 0, 0], [0, 1000, 0, 0, 0]])
+    grid = TileGrid(spatial_index(geometry, "test-diagonales"), "test-diagonales")
+    image = grid.view(10, (500.25, 500.0))
+    row = image[image.shape[0] // 2].min(axis=1) < 128
+    assert np.count_nonzero(np.diff(row.astype(int)) == 1) == 2
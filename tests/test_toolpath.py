@@ -0,0 +1,61 @@
+import time
+
+import numpy as np
+
+from utils.geometry import DxfGeometry
+from utils.topology import build_topology
+from utils.toolpath import _nearest_neighbour, plan_toolpath
+
+
+def _plate(holes, size=(300.0, 150.0), radius=2.0):
+    # Plaque rectangulaire percée de trous ronds
+    w, h = size
+    corners = np.array([(0, 0), (w, 0), (w, h), (0, h)], dtype=np.float64)
+    segments = np.column_stack((corners, np.roll(corners, -1, axis=0), np.zeros(4)))
+    circles = np.column_stack((np.asarray(holes, dtype=np.float64), np.full(len(holes), radius)))
+    return build_topology(DxfGeometry(segments, np.arange(4), circles, np.arange(len(holes)) + 4,
+                                      np.zeros(len(holes) + 4, dtype=np.int8)))
+
+
+def _brute_force(candidates, owner, n_loops, origin):
+    order, position, alive = [], origin, np.ones(len(candidates), dtype=bool)
+    for _ in range(n_loops):
+        idx = np.nonzero(alive)[0]
+        best = idx[np.argmin(np.hypot(*(candidates[idx] - position).T))]
+        order.append(owner[best])
+        position = candidates[best]
+        alive[owner == owner[best]] = False
+    return order
+
+
+def test_grid_search_matches_brute_force():
+    rng = np.random.default_rng(3)
+    for _ in range(20):
+        n = int(rng.integers(1, 60))
+        owner = np.repeat(np.arange(n), 3)
+        candidates = rng.uniform(0, 100, (n, 1, 2)) + rng.uniform(-1, 1, (n, 3, 2))
+        candidates = candidates.reshape(-1, 2)
+        order, entries = _nearest_neighbour(candidates, owner, np.full(n, -1), n, np.zeros(2), time.time() + 10)
+        assert order.tolist() == _brute_force(candidates, owner, n, np.zeros(2))
+        assert entries.shape == (n, 2)
+
+
+def test_holes_cut_before_outer_contour():
+    rng = np.random.default_rng(0)
+    topology = _plate(rng.uniform(10, 140, (200, 2)))
+    toolpath = plan_toolpath(topology, time_limit=0.5)
+    outer = int(topology.outer_loops[0])
+    assert sorted(toolpath.order.tolist()) == list(range(topology.n_loops))
+    assert toolpath.order[-1] == outer
+
+
+def test_exhausted_budget_falls_back_to_rows():
+    # Trois rangées de trous : sans temps de recherche, ordre par rangée puis par x en serpentin,
+    # contour en dernier
+    holes = [(x, y) for y in (120.0, 30.0, 75.0) for x in (250.0, 50.0, 150.0)]
+    topology = _plate(holes)
+    toolpath = plan_toolpath(topology, time_limit=0.0)
+    centers = np.asarray(topology.geometry.circles)[topology.loop_circle[toolpath.order[:-1]], :2]
+    assert [tuple(c) for c in centers] == sorted(holes, key=lambda c: (c[1], c[0] if c[1] != 75.0 else -c[0]))
+    assert toolpath.order[-1] == int(topology.outer_loops[0])
+    assert len(toolpath.entries) == topology.n_loops
@@ -0,0 +1,90 @@
+import ezdxf
+import numpy as np
+import pytest
+
+from utils.geometry import DxfGeometry, extract_geometry
+from utils.topology import build_topology, report_lines, snap_points
+
+
+def _lines(points):
+    # Polyligne fermée -> segments (x1, y1, x2, y2, bulge)
+    points = np.asarray(points, dtype=np.float64)
+    return np.column_stack((points, np.roll(points, -1, axis=0), np.zeros(len(points))))
+
+
+def _geometry(segments, circles=np.zeros((0, 3))):
+    segments = np.asarray(segments, dtype=np.float64)
+    return DxfGeometry(segments, np.arange(len(segments)), np.asarray(circles, dtype=np.float64),
+                       np.arange(len(circles)) + len(segments), np.zeros(len(segments) + len(circles), dtype=np.int8))
+
+
+def test_snap_across_cell_boundary():
+    # Le premier point de la cellule est loin de la frontière, le second en est tout proche
+    nodes = snap_points(np.array([[0.0001, 0.0001], [0.0099, 0.0], [0.0101, 0.0], [0.5, 0.5]]), 0.01)
+    assert list(nodes) == [0, 0, 0, 1]
+
+
+def test_loop_closed_across_cell_boundary():
+    # Micro-segment d'export FAO dans une cellule de la grille : le premier point de la cellule
+    # est à plus de 0,01 mm du départ du contour (cellule voisine), l'extrémité du micro-segment non
+    square = _lines([(0.0101, 0.0), (10, 0), (10, -10), (0, -10)])
+    square[-1, 2:4] = (0.0001, 0.0001)
+    micro = [[0.0001, 0.0001, 0.0098, 0.0, 0.0]]
+    topology = build_topology(_geometry(np.concatenate((square, micro))))
+    assert topology.n_loops == 1
+    assert topology.net_area == pytest.approx(100.0, abs=0.1)
+
+
+def test_nested_loops_and_circle_holes():
+    # Plaque, fenêtre, îlot dans la fenêtre et un perçage
+    segments = np.concatenate((_lines([(0, 0), (100, 0), (100, 100), (0, 100)]),
+                               _lines([(10, 10), (60, 10), (60, 60), (10, 60)]),
+                               _lines([(20, 20), (30, 20), (30, 30), (20, 30)])))
+    topology = build_topology(_geometry(segments, [[80, 80, 5]]))
+    assert topology.n_loops == 4
+    assert topology.num_holes == 2
+    assert sorted(topology.loop_depth.tolist()) == [0, 1, 1, 2]
+    assert topology.net_area == pytest.approx(10000.0 - 2500.0 + 100.0 - np.pi * 25.0)
+
+
+def test_bulge_loop_area():
+    # Oblong : deux demi-cercles de rayon 20 aux extrémités d'un rectangle 100 × 40
+    doc = ezdxf.new()
+    doc.modelspace().add_lwpolyline([(0, 0, 0), (100, 0, 1), (100, 40, 0), (0, 40, 1)], close=True, format="xyb")
+    topology = build_topology(extract_geometry(doc.modelspace()))
+    assert topology.n_loops == 1
+    assert topology.loop_perimeter[0] == pytest.approx(200.0 + 40.0 * np.pi)
+    assert topology.net_area == pytest.approx(4000.0 + 400.0 * np.pi)
+
+
+def test_spur_does_not_open_loop():
+    # Trait isolé accroché à un coin : la boucle reste fermée, le trait reste un segment ouvert
+    segments = np.concatenate((_lines([(0, 0), (10, 0), (10, 10), (0, 10)]), [[10, 10, 20, 20, 0]]))
+    topology = build_topology(_geometry(segments))
+    assert topology.n_loops == 1
+    assert topology.net_area == pytest.approx(100.0)
+    assert len(topology.open_segments) == 1
+
+
+def test_small_holes_in_large_sheet():
+    # Tôle 3000 × 1500 percée de petits trous : le contour n'est pas inscrit dans la grille
+    rng = np.random.default_rng(1)
+    holes = np.column_stack((rng.uniform(10, 2990, 2000), rng.uniform(10, 1490, 2000), np.full(2000, 0.25)))
+    topology = build_topology(_geometry(_lines([(0, 0), (3000, 0), (3000, 1500), (0, 1500)]), holes))
+    assert topology.num_holes == 2000
+    assert topology.net_area == pytest.approx(3000.0 * 1500.0 - 2000 * np.pi * 0.0625)
+    assert (topology.loop_parent[1:] == 0).all()
+
+
+def test_branched_contours_are_reported():
+    # Deux carrés à bord commun : nœuds de degré 3, aucune boucle mais un contour signalé
+    segments = np.concatenate((_lines([(0, 0), (10, 0), (10, 10), (0, 10)]),
+                               [[10, 0, 20, 0, 0], [20, 0, 20, 10, 0], [20, 10, 10, 10, 0]],
+                               _lines([(40, 0), (50, 0), (50, 10), (40, 10)])))
+    topology = build_topology(_geometry(segments))
+    assert topology.n_loops == 1
+    assert topology.net_area == pytest.approx(100.0)
+    assert topology.branched_components == 1
+    assert topology.report() == {"ramifications": 1, "longueur_ramifiee": 70.0}
+    assert report_lines(topology.report())[0].endswith(": 1")
+    assert report_lines(build_topology(_geometry(segments[-4:])).report()) == []
@@ -0,0 +1,54 @@
+import io
+import os
+
+from utils.uploads import UploadStore
+
+
+def _objects(store):
+    return sorted(n for n in os.listdir(os.path.join(store.root, "objects")) if not n.startswith("."))
+
+
+def test_same_content_is_stored_once_and_kept_while_referenced(tmp_path):
+    store = UploadStore(str(tmp_path))
+    a = store.put(io.BytesIO(b"0\nSECTION\n"), "alice", "piece.dxf")
+    b = store.put(io.BytesIO(b"0\nSECTION\n"), "bob", "copie.dxf")
+    assert a["digest"] == b["digest"] and _objects(store) == [a["digest"] + ".dxf"]
+    store.remove("alice", a["digest"])
+    assert os.path.exists(store.path(a["digest"]))
+    store.remove("bob", a["digest"])
+    assert _objects(store) == []
+
+
+def test_quota_drops_oldest_uploads_first(tmp_path):
+    store = UploadStore(str(tmp_path), quota_bytes=25)
+    first = store.put(io.BytesIO(b"a" * 10), "alice", "1.dxf")
+    second = store.put(io.BytesIO(b"b" * 10), "alice", "2.dxf")
+    third = store.put(io.BytesIO(b"c" * 10), "alice", "3.dxf")
+    assert [r["digest"] for r in store.uploads("alice")] == [third["digest"], second["digest"]]
+    assert not os.path.exists(store.path(first["digest"]))
+    # Un envoi plus gros que le quota est gardé seul
+    big = store.put(io.BytesIO(b"d" * 40), "alice", "gros.dxf")
+    assert [r["digest"] for r in store.uploads("alice")] == [big["digest"]]
+    assert _objects(store) == [big["digest"] + ".dxf"]
+
+
+def test_expired_uploads_are_evicted(tmp_path):
+    store = UploadStore(str(tmp_path), max_age_days=1)
+    old = store.put(io.BytesIO(b"ancien"), "alice", "ancien.dxf")
+    records = store.uploads("alice")
+    records[0]["uploaded"] -= 2 * 86400
+    store._save_uploads("alice", records)
+    recent = store.put(io.BytesIO(b"recent"), "alice", "recent.dxf")
+    assert [r["digest"] for r in store.uploads("alice")] == [recent["digest"]]
+    assert _objects(store) == [recent["digest"] + ".dxf"]
+    assert old["digest"] != recent["digest"]
+
+
+def test_mapped_reads_stored_content(tmp_path):
+    store = UploadStore(str(tmp_path))
+    record = store.put(io.BytesIO(b"0\nEOF\n"), "alice", "piece.dxf")
+    with store.mapped(record["digest"]) as buffer:
+        assert bytes(buffer[:]) == b"0\nEOF\n"
+    empty = store.put(io.BytesIO(b""), "alice", "vide.dxf")
+    with store.mapped(empty["digest"]) as buffer:
+        assert buffer == b""
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from utils.cleanup import clean_geometry
+from utils.dxf_reader import load_dxf, geometry_perimeter_and_holes
+from utils.geometry import DxfGeometry, extract_geometry
+from utils.instrumentation import timed
+from utils.render import render_geometry
+from utils.topology import build_topology
+from utils.toolpath import plan_toolpath
+
+CACHE_DIR = os.environ.get("PARTLAB_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "partlab"))
+CACHE_MAX_BYTES = int(os.environ.get("PARTLAB_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+CHUNK_SIZE = 1024 * 1024
+# À incrémenter quand le contenu des résultats change : les anciennes entrées sont ignorées
+CACHE_VERSION = 9
+
+
+def file_digest(file_path):
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def bytes_digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class AnalysisCache:
+    # Un dossier par empreinte SHA-256 :
+    #   <digest>-v<N>/<tableau>.npy  géométrie, relue en mémoire mappée
+    #   <digest>-v<N>/result.json    périmètre, trous, contours, nombre d'entités
+    #   <digest>-v<N>/preview.png    aperçu rendu
+    # Le mtime du dossier sert d'horodatage LRU, partagé entre sessions et processus.
+
+    def __init__(self, root=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+
+    def _entry(self, digest):
+        return os.path.join(self.root, f"{digest}-v{CACHE_VERSION}")
+
+    def get(self, digest):
+        entry = self._entry(digest)
+        try:
+            with open(os.path.join(entry, "result.json"), encoding="utf-8") as f:
+                result = json.load(f)
+            arrays = {name: np.load(os.path.join(entry, f"{name}.npy"), mmap_mode="r")
+                      for name in DxfGeometry.ARRAYS}
+        except (OSError, ValueError):
+            return None
+        result["geometry"] = DxfGeometry.from_arrays(arrays)
+        preview = os.path.join(entry, "preview.png")
+        if os.path.exists(preview):
+            with open(preview, "rb") as f:
+                result["preview"] = f.read()
+        self._touch(entry)
+        return result
+
+    def put(self, digest, geometry, result, preview=None):
+        entry = self._entry(digest)
+        if os.path.isdir(entry):
+            self._touch(entry)
+            return
+        # Écriture dans un dossier temporaire puis renommage atomique
+        tmp = tempfile.mkdtemp(prefix=".tmp-", dir=self.root)
+        try:
+            for name, array in geometry.arrays().items():
+                np.save(os.path.join(tmp, f"{name}.npy"), np.ascontiguousarray(array))
+            with open(os.path.join(tmp, "result.json"), "w", encoding="utf-8") as f:
+                json.dump(result, f)
+            if preview is not None:
+                with open(os.path.join(tmp, "preview.png"), "wb") as f:
+                    f.write(preview)
+            os.replace(tmp, entry)
+        except OSError:
+            # Une autre session a écrit la même entrée entre-temps
+            shutil.rmtree(tmp, ignore_errors=True)
+        self.evict()
+
+    def _touch(self, entry):
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+
+    def entries(self):
+        result = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.startswith(".") or not os.path.isdir(path):
+                continue
+            try:
+                size = sum(e.stat().st_size for e in os.scandir(path))
+                result.append((os.stat(path).st_mtime, size, path))
+            except OSError:
+                continue
+        return result
+
+    def evict(self):
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+
+def analyse_dxf_file(file_path, cache=None):
+    # Analyse complète d'un fichier : en cas de succès du cache, ezdxf n'est pas appelé
+    return _analyse(file_digest(file_path), lambda: load_dxf(file_path), cache)
+
+
+def _analyse(digest, load, cache):
+    with timed("analyse_dxf", digest=digest[:12]) as record:
+        cache = cache or AnalysisCache()
+        cached = cache.get(digest)
+        record["cache"] = cached is not None
+        if cached is not None:
+            cached["digest"] = digest
+            return cached
+        return analyse_document(digest, load(), cache)
+
+
+def analyse_document(digest, doc, cache, progress=None):
+    # progress(étape) est appelé avant chaque étape (travaux en arrière-plan, cf. utils.jobs)
+    progress = progress or (lambda stage: None)
+    if doc is None:
+        return None
+    progress("geometry")
+    geometry, cleanup = clean_geometry(extract_geometry(doc.modelspace()))
+    topology = build_topology(geometry)
+    perimeter, holes, _ = geometry_perimeter_and_holes(geometry, topology)
+    result = {
+        "perimeter": perimeter,
+        "holes": holes,
+        "area": topology.net_area,
+        "cleanup": cleanup,
+        "topologie": topology.report(),
+        # Déplacements à vide du parcours optimisé, comme dans l'onglet Devis (chiffrage des nomenclatures)
+        "deplacements": plan_toolpath(topology).rapid_distance,
+        "contours": topology.loops(),
+        "entities": geometry.n_entities,
+        "created": time.time(),
+    }
+    progress("preview")
+    preview = render_geometry(geometry, key=digest)
+    cache.put(digest, geometry, result, preview)
+    result.update(geometry=geometry, preview=preview, digest=digest)
+    return result
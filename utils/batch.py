@@ -0,0 +1,235 @@
+import argparse
+import csv
+import json
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from utils.cleanup import clean_geometry
+from utils.dxf_reader import STREAMING_THRESHOLD, load_dxf, stream_dxf_totals, geometry_perimeter_and_holes
+from utils.geometry import extract_geometry
+from utils.pricing import default_machines, material_cost, quote_grid, ranked_table
+from utils.topology import build_topology
+
+# holes_approx : lecture en flux, seuls les cercles sont comptés comme trous
+# branched_contours : contours ramifiés (jonction en T, bord commun) écartés des trous et de l'aire
+FIELDS = ["file", "status", "perimeter", "holes", "holes_approx", "area", "branched_contours", "entities",
+          "removed_length", "seconds", "error"]
+QUOTE_FIELDS = ["machine", "mass", "material_cost", "cut_seconds", "unit_price", "total_price"]
+
+
+class FileTimeout(BaseException):
+    # BaseException : ne doit pas être avalée par les "except Exception" de la lecture DXF
+    pass
+
+
+def _on_alarm(signum, frame):
+    raise FileTimeout()
+
+
+def analyse_path(file_path, timeout=None):
+    # Exécuté dans un processus du pool : toute erreur reste confinée à ce fichier
+    result = {"file": file_path, "status": "ok", "perimeter": None, "holes": None, "holes_approx": None,
+              "area": None, "branched_contours": None, "entities": None, "removed_length": None, "seconds": None,
+              "error": ""}
+    use_alarm = timeout and hasattr(signal, "setitimer")
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    start = time.perf_counter()
+    try:
+        streamed = None
+        if os.path.getsize(file_path) > STREAMING_THRESHOLD:
+            # Lecture en flux : pas de topologie, donc pas d'aire ; fichiers qu'iterdxf ne lit pas
+            # (DXF R12…) : chargement complet
+            try:
+                streamed = stream_dxf_totals(file_path)
+            except Exception as e:
+                print(f"{file_path} : lecture en flux impossible, chargement complet ({e})", file=sys.stderr)
+        if streamed is not None:
+            perimeter, holes, counts, _ = streamed
+            entities = sum(counts)
+            area = removed = branched = None
+        else:
+            doc = load_dxf(file_path)
+            if doc is None:
+                raise ValueError("fichier DXF illisible")
+            geometry, cleanup = clean_geometry(extract_geometry(doc.modelspace()))
+            removed = cleanup["longueur_retiree"]
+            topology = build_topology(geometry)
+            perimeter, holes, _ = geometry_perimeter_and_holes(geometry, topology)
+            area = round(topology.net_area, 2)
+            branched = topology.branched_components
+            entities = geometry.n_entities
+        result.update(perimeter=round(perimeter, 2), holes=holes, holes_approx=streamed is not None, area=area,
+                      branched_contours=branched, entities=entities, removed_length=removed)
+    except FileTimeout:
+        result.update(status="timeout", error=f"délai de {timeout} s dépassé")
+    except Exception as e:
+        result.update(status="error", error=f"{type(e).__name__}: {e}")
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    result["seconds"] = round(time.perf_counter() - start, 4)
+    return result
+
+
+def find_dxf_files(directory, recursive=True):
+    files = []
+    for root, _, names in os.walk(directory):
+        files.extend(os.path.join(root, n) for n in names if n.lower().endswith(".dxf"))
+        if not recursive:
+            break
+    return sorted(files)
+
+
+class ResultWriter:
+    # Écrit chaque résultat dès qu'il arrive (CSV ou JSON Lines)
+
+    def __init__(self, stream, fmt, fields=FIELDS):
+        self.stream = stream
+        self.fmt = fmt
+        if fmt == "csv":
+            self.writer = csv.DictWriter(stream, fieldnames=fields)
+            self.writer.writeheader()
+
+    def write(self, result):
+        if self.fmt == "csv":
+            self.writer.writerow(result)
+        else:
+            self.stream.write(json.dumps(result, ensure_ascii=False) + "\n")
+        self.stream.flush()
+
+
+def best_quote(perimeter, pricing, area=None):
+    # Option la moins chère toutes machines confondues pour la matière / épaisseur / quantité demandées
+    # Matière chiffrée d'après l'aire nette quand elle est connue
+    matiere = {"masse": None, "cout_matiere": 0.0}
+    if area is not None:
+        matiere = material_cost(area, pricing["material"], pricing["thickness"])
+    grid = quote_grid(pricing["machines_config"], perimeter, [pricing["quantity"]],
+                      materials=[pricing["material"]], thicknesses=[pricing["thickness"]],
+                      material_cost=matiere["cout_matiere"])
+    rows = ranked_table(grid)
+    if not rows:
+        return {field: None for field in QUOTE_FIELDS}
+    best = rows[0]
+    return {"machine": best["Machine"],
+            "mass": round(matiere["masse"], 4) if matiere["masse"] is not None else None,
+            "material_cost": round(matiere["cout_matiere"], 2) if area is not None else None,
+            "cut_seconds": best["Temps/pièce (s)"],
+            "unit_price": best["Prix unitaire (€)"], "total_price": best["Prix total (€)"]}
+
+
+def run_batch(files, writer, jobs=None, timeout=60.0, pricing=None):
+    summary = {"files": len(files), "ok": 0, "errors": 0, "timeouts": 0, "entities": 0, "streamed": 0}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(analyse_path, f, timeout): f for f in files}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                # Processus du pool tombé (crash natif, mémoire…)
+                result = {field: None for field in FIELDS}
+                result.update(file=futures[future], status="error", error=f"{type(e).__name__}: {e}")
+            if result["status"] == "ok":
+                summary["ok"] += 1
+                summary["entities"] += result["entities"]
+                summary["streamed"] += bool(result["holes_approx"])
+                if pricing is not None:
+                    result.update(best_quote(result["perimeter"], pricing, result["area"]))
+            elif result["status"] == "timeout":
+                summary["timeouts"] += 1
+            else:
+                summary["errors"] += 1
+            writer.write(result)
+    elapsed = time.perf_counter() - start
+    summary["seconds"] = round(elapsed, 3)
+    summary["files_per_s"] = round(len(files) / elapsed, 2) if elapsed else 0.0
+    summary["entities_per_s"] = round(summary["entities"] / elapsed, 1) if elapsed else 0.0
+    return summary
+
+
+def quote_bom_main(args):
+    from utils.bom import bom_summary, quote_bom_files, totals_csv
+    from utils.reports import bom_pdf
+
+    def progress(done, total):
+        print(f"\r{done}/{total} DXF analysés", end="", file=sys.stderr, flush=True)
+
+    priced, analyses, seconds = quote_bom_files(args.nomenclature, default_machines(), args.dossier, args.jobs,
+                                                progress)
+    summary = bom_summary(priced)
+    previews = {name: a["preview"] for name, a in analyses.items() if isinstance(a, dict)} if args.apercus else None
+    with open(args.output, "wb") as f:
+        f.write(bom_pdf(priced, summary, previews))
+    totaux = args.totaux or os.path.splitext(args.output)[0] + ".csv"
+    with open(totaux, "w", newline="", encoding="utf-8-sig") as f:
+        f.write(totals_csv(priced))
+    print(f"\n{summary['chiffrees']}/{summary['lignes']} lignes chiffrées, {summary['pieces']} pièces, "
+          f"total {summary['total']:.2f} € en {seconds:.2f} s -> {args.output}, {totaux}", file=sys.stderr)
+    for p in priced:
+        if p["erreur"]:
+            print(f"  ligne {p['ligne']} ({p['fichier']}) : {p['erreur']}", file=sys.stderr)
+    return 0 if summary["erreurs"] == 0 else 1
+
+
+def main(argv=None, prog="python -m utils.batch"):
+    parser = argparse.ArgumentParser(prog=prog,
+                                     description="Analyse DXF sans interface (périmètre, trous)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    analyze = sub.add_parser("analyze", help="analyser tous les DXF d'un dossier")
+    analyze.add_argument("directory")
+    analyze.add_argument("-o", "--output", help="fichier de sortie (.csv ou .jsonl), stdout par défaut")
+    analyze.add_argument("-f", "--format", choices=["csv", "jsonl"], help="format de sortie")
+    analyze.add_argument("-j", "--jobs", type=int, default=None, help="nombre de processus")
+    analyze.add_argument("-t", "--timeout", type=float, default=60.0, help="délai maximal par fichier (s)")
+    analyze.add_argument("--no-recursive", action="store_true", help="ne pas parcourir les sous-dossiers")
+    analyze.add_argument("--matiere", help="chiffrer chaque pièce pour cette matière (meilleure machine)")
+    analyze.add_argument("--epaisseur", type=float, default=3.0, help="épaisseur pour le chiffrage (mm)")
+    analyze.add_argument("--quantite", type=int, default=1, help="quantité pour le chiffrage")
+    bom = sub.add_parser("bom", help="chiffrer une nomenclature (CSV/XLSX) : devis PDF groupé et totaux CSV")
+    bom.add_argument("nomenclature")
+    bom.add_argument("--dossier", help="dossier des DXF (par défaut celui de la nomenclature)")
+    bom.add_argument("-o", "--output", default="devis_nomenclature.pdf", help="devis PDF groupé")
+    bom.add_argument("--totaux", help="CSV des totaux (par défaut : même nom que le PDF, en .csv)")
+    bom.add_argument("--apercus", action="store_true", help="ajouter l'aperçu de chaque pièce au PDF")
+    bom.add_argument("-j", "--jobs", type=int, default=None, help="nombre de processus")
+    args = parser.parse_args(argv)
+    if args.command == "bom":
+        return quote_bom_main(args)
+
+    fmt = args.format
+    if fmt is None:
+        fmt = "csv" if args.output and args.output.lower().endswith(".csv") else "jsonl"
+    files = find_dxf_files(args.directory, recursive=not args.no_recursive)
+    pricing = None
+    fields = FIELDS
+    if args.matiere:
+        pricing = {"machines_config": default_machines(), "material": args.matiere,
+                   "thickness": args.epaisseur, "quantity": args.quantite}
+        fields = FIELDS + QUOTE_FIELDS
+
+    stream = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+    try:
+        summary = run_batch(files, ResultWriter(stream, fmt, fields), jobs=args.jobs, timeout=args.timeout,
+                            pricing=pricing)
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+
+    print(f"{summary['files']} fichiers ({summary['ok']} ok, {summary['errors']} erreurs, "
+          f"{summary['timeouts']} hors délai) en {summary['seconds']:.2f} s – "
+          f"{summary['files_per_s']:.2f} fichiers/s, {summary['entities_per_s']:.0f} entités/s",
+          file=sys.stderr)
+    if summary["streamed"]:
+        print(f"{summary['streamed']} fichier(s) lu(s) en flux (holes_approx) : trous = cercles uniquement, "
+              f"aire non calculée", file=sys.stderr)
+    return 0 if summary["errors"] == 0 and summary["timeouts"] == 0 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,267 @@
+import csv
+import io
+import os
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from utils.analysis_cache import CACHE_DIR, AnalysisCache, analyse_dxf_file
+from utils.cut_time import CutProfile, cut_profile, cycle_time_model
+from utils.pricing import MATERIAL_PROPERTIES, MATERIALS, ZERO_AREA_WARNING, material_cost, quote_grid, ranked_table
+from utils.toolpath import RAPID_SPEED, plan_toolpath
+from utils.topology import build_topology
+
+# Colonnes d'une nomenclature (BOM) et intitulés acceptés pour chacune (sans accents ni casse)
+BOM_COLUMNS = {
+    "ref": ("ref", "reference", "repere", "part", "part number"),
+    "designation": ("designation", "description", "libelle", "nom"),
+    "quantite": ("quantite", "qte", "qty", "quantity"),
+    "matiere": ("matiere", "material", "materiau"),
+    "epaisseur": ("epaisseur", "ep", "thickness", "epaisseur (mm)", "epaisseur mm"),
+    "fichier": ("fichier", "dxf", "file", "fichier dxf", "plan"),
+}
+REQUIRED_COLUMNS = ("quantite", "matiere", "epaisseur", "fichier")
+TOTAL_FIELDS = ["Ligne", "Réf", "Désignation", "Fichier", "Quantité", "Matière", "Épaisseur (mm)", "Machine",
+                "Périmètre (mm)", "Aire nette (mm²)", "Masse (kg)", "Temps/pièce (s)", "Temps total (s)",
+                "Prix unitaire (€)", "Prix total (€)", "Erreur"]
+
+
+def _key(text):
+    # "Épaisseur_mm" -> "epaisseur mm" : accents, casse et séparateurs ignorés
+    text = unicodedata.normalize("NFKD", str(text or "").strip().lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(text.replace("_", " ").replace(".", " ").split())
+
+
+def _number(value):
+    # Nombres saisis à la française ("2,5") ou déjà numériques (XLSX)
+    if isinstance(value, (int, float)):
+        return float(value)
+    return float(str(value).strip().replace(" ", "").replace(",", "."))
+
+
+def _rows(data, name):
+    if name.lower().endswith((".xlsx", ".xlsm")):
+        try:
+            import openpyxl
+        except ModuleNotFoundError as e:
+            raise ValueError("La lecture des fichiers .xlsx nécessite openpyxl (pip install openpyxl) ; "
+                             "exporter la nomenclature en CSV sinon.") from e
+        sheet = openpyxl.load_workbook(io.BytesIO(data), read_only=True, data_only=True).active
+        return [list(row) for row in sheet.iter_rows(values_only=True)]
+    try:
+        text = data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        text = data.decode("cp1252")
+    try:
+        dialect = csv.Sniffer().sniff(text[:4096], delimiters=";,\t")
+    except csv.Error:
+        dialect = csv.excel
+    return list(csv.reader(io.StringIO(text), dialect))
+
+
+def read_bom(data, name="nomenclature.csv"):
+    # Nomenclature CSV / XLSX -> lignes {ligne, ref, designation, quantite, matiere, epaisseur, fichier, erreur}
+    rows = [r for r in _rows(data, name) if any(str(c or "").strip() for c in r)]
+    if not rows:
+        raise ValueError("Nomenclature vide")
+    aliases = {alias: field for field, names in BOM_COLUMNS.items() for alias in names}
+    columns = {aliases[_key(c)]: i for i, c in reversed(list(enumerate(rows[0]))) if _key(c) in aliases}
+    missing = [c for c in REQUIRED_COLUMNS if c not in columns]
+    if missing:
+        raise ValueError(f"Colonnes manquantes : {', '.join(missing)}")
+    materials = {_key(m): m for m in MATERIALS}
+    lines = []
+    for number, row in enumerate(rows[1:], start=2):
+        cells = {field: row[i] if i < len(row) else None for field, i in columns.items()}
+        line = {"ligne": number, "ref": str(cells.get("ref") or "").strip(),
+                "designation": str(cells.get("designation") or "").strip(),
+                "fichier": os.path.basename(str(cells["fichier"] or "").strip()),
+                "matiere": materials.get(_key(cells["matiere"]), str(cells["matiere"] or "").strip()),
+                "quantite": None, "epaisseur": None, "erreur": ""}
+        try:
+            line["quantite"] = int(_number(cells["quantite"]))
+            line["epaisseur"] = _number(cells["epaisseur"])
+            if line["quantite"] < 1 or line["epaisseur"] <= 0:
+                raise ValueError
+        except (TypeError, ValueError):
+            line["erreur"] = "quantité ou épaisseur invalide"
+        if not line["fichier"]:
+            line["erreur"] = line["erreur"] or "fichier DXF non renseigné"
+        lines.append(line)
+    return lines
+
+
+def _analyse_for_bom(path, cache_root):
+    # Exécuté dans un processus du pool : la géométrie n'est pas renvoyée, seuls les totaux, l'aperçu
+    # et le profil de coupe (temps par segment, calculé ici en parallèle)
+    result = analyse_dxf_file(path, AnalysisCache(cache_root))
+    if result is None:
+        raise ValueError("DXF illisible")
+    result["profil"] = cut_profile(build_topology(result.pop("geometry")))
+    return result
+
+
+def analyse_files(paths, jobs=None, progress=None, cache_root=CACHE_DIR):
+    # Analyses en parallèle (cache partagé avec l'application) ; progress(terminés, total) après chacune.
+    # Renvoie {chemin: analyse} et {chemin: message d'erreur}
+    analyses, errors = {}, {}
+    paths = sorted(set(paths))
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(_analyse_for_bom, p, cache_root): p for p in paths}
+        for done, future in enumerate(as_completed(futures), start=1):
+            try:
+                analyses[futures[future]] = future.result()
+            except Exception as e:
+                errors[futures[future]] = f"{type(e).__name__}: {e}"
+            if progress is not None:
+                progress(done, len(paths))
+    return analyses, errors
+
+
+def part_size(analysis):
+    # Encombrement (longueur, largeur) en mm d'après les boîtes des contours
+    boxes = [c["bbox"] for c in analysis.get("contours") or []]
+    if not boxes:
+        return 0.0, 0.0
+    xmin, ymin = min(b[0] for b in boxes), min(b[1] for b in boxes)
+    xmax, ymax = max(b[2] for b in boxes), max(b[3] for b in boxes)
+    return round(xmax - xmin, 2), round(ymax - ymin, 2)
+
+
+def cut_profile_of(analysis):
+    # Profil calculé par le pool, sinon d'après la géométrie, sinon contour simple d'un seul amorçage
+    if analysis.get("profil") is not None:
+        return analysis["profil"]
+    if analysis.get("geometry") is not None:
+        return cut_profile(build_topology(analysis["geometry"]))
+    return CutProfile.simple(analysis["perimeter"])
+
+
+def rapid_distance_of(analysis):
+    # Déplacements à vide de l'analyse, sinon d'après la géométrie, sinon aucun
+    if analysis.get("deplacements") is not None:
+        return analysis["deplacements"]
+    if analysis.get("geometry") is not None:
+        return plan_toolpath(build_topology(analysis["geometry"])).rapid_distance
+    return 0.0
+
+
+def price_line(line, analysis, machines_config, profil=None, deplacements=None):
+    # Devis d'une ligne (même dictionnaire et même modèle de temps que l'onglet Devis, déplacements
+    # à vide compris) sur la machine la moins chère
+    if line["matiere"] not in MATERIAL_PROPERTIES:
+        raise ValueError(f"matière inconnue : {line['matiere']}")
+    cout = material_cost(analysis["area"], line["matiere"], line["epaisseur"])
+    profil = profil or cut_profile_of(analysis)
+    deplacements = rapid_distance_of(analysis) if deplacements is None else deplacements
+    grid = quote_grid(machines_config, analysis["perimeter"], [line["quantite"]], materials=[line["matiere"]],
+                      thicknesses=[line["epaisseur"]], rapid_distance=deplacements, rapid_speed=RAPID_SPEED,
+                      material_cost=cout["cout_matiere"], cycle_time=cycle_time_model(profil, machines_config))
+    rows = ranked_table(grid)
+    if not rows:
+        raise ValueError(f"aucune machine ne coupe {line['matiere']}")
+    best = rows[0]
+    i = grid["machines"].index(best["Machine"])
+    longueur, largeur = part_size(analysis)
+    return {
+        "ref": line["ref"] or os.path.splitext(line["fichier"])[0], "designation": line["designation"],
+        "quantite": line["quantite"], "matiere": line["matiere"], "epaisseur": line["epaisseur"],
+        "longueur": longueur, "largeur": largeur, "machine": best["Machine"],
+        "aire": analysis["area"], "masse": cout["masse"],
+        "vitesse_coupe": round(float(grid["speed"][i, 0, 0]), 3), "perimetre_total": analysis["perimeter"],
+        "deplacements": deplacements, "temps_coupe_sec": float(grid["seconds"][i, 0, 0]), "amorcages": profil.pierces,
+        "prix_matiere": cout["cout_matiere"], "cout_coupe": float(grid["cut_cost"][i, 0, 0]),
+        "total_unitaire": float(grid["unit"][i, 0, 0]), "sous_traitance": 0.0, "transport": 0.0,
+        "prix_total_final": float(grid["total"][i, 0, 0, 0]), "meilleure_option": None,
+    }
+
+
+def price_bom(lines, analyses, machines_config):
+    # analyses : {nom de fichier: analyse | message d'erreur}. Chaque ligne reçoit son devis ou son erreur.
+    priced, profiles = [], {}
+    for line in lines:
+        result = {"ligne": line["ligne"], "fichier": line["fichier"], "devis": None, "erreur": line["erreur"]}
+        analysis = analyses.get(line["fichier"])
+        if not result["erreur"]:
+            if analysis is None:
+                result["erreur"] = "fichier DXF introuvable"
+            elif isinstance(analysis, str):
+                result["erreur"] = analysis
+            else:
+                try:
+                    # Un profil et un parcours par fichier, partagés par toutes les lignes qui le citent
+                    if line["fichier"] not in profiles:
+                        profiles[line["fichier"]] = cut_profile_of(analysis), rapid_distance_of(analysis)
+                    result["devis"] = price_line(line, analysis, machines_config, *profiles[line["fichier"]])
+                    # Chiffrée sans matière : la ligne reste au total mais est signalée
+                    if result["devis"]["aire"] <= 0:
+                        result["erreur"] = ZERO_AREA_WARNING
+                except (KeyError, ValueError) as e:
+                    result["erreur"] = str(e)
+        result["ligne_bom"] = line
+        priced.append(result)
+    return priced
+
+
+def totals_table(priced):
+    rows = []
+    for p in priced:
+        line, devis = p["ligne_bom"], p["devis"] or {}
+        rows.append({
+            "Ligne": p["ligne"], "Réf": devis.get("ref", line["ref"]), "Désignation": line["designation"],
+            "Fichier": p["fichier"], "Quantité": line["quantite"], "Matière": line["matiere"],
+            "Épaisseur (mm)": line["epaisseur"], "Machine": devis.get("machine"),
+            "Périmètre (mm)": round(devis["perimetre_total"], 2) if devis else None,
+            "Aire nette (mm²)": round(devis["aire"], 2) if devis else None,
+            "Masse (kg)": round(devis["masse"], 4) if devis else None,
+            "Temps/pièce (s)": round(devis["temps_coupe_sec"], 2) if devis else None,
+            "Temps total (s)": round(devis["temps_coupe_sec"] * devis["quantite"], 1) if devis else None,
+            "Prix unitaire (€)": round(devis["total_unitaire"], 2) if devis else None,
+            "Prix total (€)": round(devis["prix_total_final"], 2) if devis else None,
+            "Erreur": p["erreur"],
+        })
+    return rows
+
+
+def bom_summary(priced):
+    quoted = [p["devis"] for p in priced if p["devis"] is not None]
+    return {
+        "lignes": len(priced),
+        "chiffrees": len(quoted),
+        "erreurs": len(priced) - len(quoted),
+        "alertes": sum(1 for p in priced if p["devis"] is not None and p["erreur"]),
+        "pieces": sum(d["quantite"] for d in quoted),
+        "masse": sum(d["masse"] * d["quantite"] for d in quoted),
+        "temps": sum(d["temps_coupe_sec"] * d["quantite"] for d in quoted),
+        "total": sum(d["prix_total_final"] for d in quoted),
+    }
+
+
+def totals_csv(priced):
+    # Une ligne par ligne de nomenclature puis la ligne de total ; séparateur ";" (Excel FR)
+    stream = io.StringIO()
+    writer = csv.DictWriter(stream, fieldnames=TOTAL_FIELDS, delimiter=";")
+    writer.writeheader()
+    writer.writerows(totals_table(priced))
+    summary = bom_summary(priced)
+    notes = [f"{summary['erreurs']} ligne(s) en erreur"] if summary["erreurs"] else []
+    notes += [f"{summary['alertes']} ligne(s) chiffrée(s) avec alerte"] if summary["alertes"] else []
+    writer.writerow({"Ligne": "Total", "Quantité": summary["pieces"], "Masse (kg)": round(summary["masse"], 3),
+                     "Temps total (s)": round(summary["temps"], 1), "Prix total (€)": round(summary["total"], 2),
+                     "Erreur": " ; ".join(notes)})
+    return stream.getvalue()
+
+
+def quote_bom_files(bom_path, machines_config, directory=None, jobs=None, progress=None):
+    # Chaîne complète hors interface : lecture, analyses en parallèle, chiffrage ligne à ligne.
+    # Les DXF sont cherchés dans `directory` (par défaut le dossier de la nomenclature).
+    with open(bom_path, "rb") as f:
+        lines = read_bom(f.read(), bom_path)
+    directory = directory or os.path.dirname(os.path.abspath(bom_path))
+    paths = {line["fichier"]: os.path.join(directory, line["fichier"]) for line in lines if line["fichier"]}
+    start = time.perf_counter()
+    found, errors = analyse_files([p for p in paths.values() if os.path.isfile(p)], jobs, progress)
+    analyses = {name: found.get(path, errors.get(path)) for name, path in paths.items()}
+    priced = price_bom(lines, analyses, machines_config)
+    return priced, analyses, time.perf_counter() - start
@@ -0,0 +1,232 @@
+import numpy as np
+
+from utils.geometry import DxfGeometry, bulge_centers
+from utils.topology import SNAP_TOLERANCE, snap_points
+
+# Extrémités libres plus proches que cette distance (mm) : l'interstice est refermé
+GAP_TOLERANCE = 0.1
+# Pas de quantification des directions de droites (rad)
+ANGLE_STEP = 1e-6
+
+REPORT_LABELS = {
+    "nuls": "Segments de longueur nulle",
+    "doublons": "Doublons exacts",
+    "chevauchements": "Segments colinéaires fusionnés",
+    "arcs": "Arcs cocirculaires fusionnés",
+    "jonctions": "Interstices refermés",
+}
+
+
+def _quantize(values, step):
+    return np.round(np.asarray(values, dtype=np.float64) / step).astype(np.int64)
+
+
+def _row_groups(keys, minor=None):
+    # Tri lexicographique des lignes de `keys` (puis de `minor`) : ordre et numéro de groupe
+    # (lignes identiques) de chaque ligne triée. lexsort est stable : à égalité, l'ordre d'origine.
+    columns = tuple(keys.T[::-1])
+    sort = np.lexsort(columns if minor is None else (minor,) + columns)
+    ordered = keys[sort]
+    change = np.ones(len(sort), dtype=bool)
+    change[1:] = (ordered[1:] != ordered[:-1]).any(axis=1)
+    return sort, np.cumsum(change) - 1
+
+
+def _first_unique(keys):
+    # Indices (dans l'ordre d'origine) de la première occurrence de chaque ligne de `keys`
+    sort, group = _row_groups(keys)
+    return np.sort(sort[np.diff(group, prepend=-1) > 0])
+
+
+def _runs(group, start, end, tolerance):
+    # Balayage trié : intervalles [start, end] triés par (groupe croissant, start) regroupés tant
+    # qu'ils se chevauchent. Maximum cumulé par groupe via un décalage de chaque groupe hors de
+    # portée des autres. Renvoie le numéro de série de chaque intervalle.
+    if len(start) == 0:
+        return np.zeros(0, dtype=np.int64)
+    low = min(start.min(), end.min())
+    span = max(start.max(), end.max()) - low + 1.0
+    shift = (group - group[0]) * span - low
+    reach = np.maximum.accumulate(end + shift) - shift
+    new_group = np.r_[True, group[1:] != group[:-1]]
+    overlap = np.r_[False, start[1:] < reach[:-1] - tolerance[1:]]
+    return np.cumsum(new_group | ~overlap) - 1
+
+
+def _split_runs(run, lo, hi, tolerance):
+    # Séries fusionnées redécoupées à chaque extrémité d'origine : les recouvrements ne sont plus
+    # coupés qu'une fois, mais aucun sommet auquel un autre segment se raccroche ne disparaît.
+    # Renvoie (série, début, fin) de chaque morceau, dans l'ordre de la série.
+    if len(run) == 0:
+        return run, lo, hi
+    runs = np.concatenate((run, run))
+    t = np.concatenate((lo, hi))
+    tolerance = np.concatenate((tolerance, tolerance))
+    order = np.lexsort((t, runs))
+    runs, t, tolerance = runs[order], t[order], tolerance[order]
+    distinct = np.r_[True, (runs[1:] != runs[:-1]) | (np.diff(t) > tolerance[1:])]
+    runs, t = runs[distinct], t[distinct]
+    same = runs[1:] == runs[:-1]
+    return runs[:-1][same], t[:-1][same], t[1:][same]
+
+
+def _merge_lines(segments, owner):
+    # Segments droits portés par la même droite et qui se recouvrent -> morceaux sans recouvrement
+    x1, y1, x2, y2 = segments[:, :4].T
+    theta = np.mod(np.arctan2(y2 - y1, x2 - x1), np.pi)
+    d = np.column_stack((np.cos(theta), np.sin(theta)))
+    offset = -d[:, 1] * x1 + d[:, 0] * y1
+    t0 = d[:, 0] * x1 + d[:, 1] * y1
+    t1 = d[:, 0] * x2 + d[:, 1] * y2
+    lo, hi = np.minimum(t0, t1), np.maximum(t0, t1)
+    keys = np.column_stack((_quantize(theta, ANGLE_STEP), _quantize(offset, SNAP_TOLERANCE)))
+    sort, group = _row_groups(keys, lo)
+    run = _runs(group, lo[sort], hi[sort], np.full(len(sort), SNAP_TOLERANCE))
+    counts = np.bincount(run)
+    first = np.cumsum(counts) - counts
+    merged = counts > 1
+    keep = np.ones(len(segments), dtype=bool)
+    keep[sort[counts[run] > 1]] = False
+    if not merged.any():
+        return np.zeros((0, 5)), owner[:0], keep, 0
+    # Morceaux portés par la droite du premier segment de la série
+    members = counts[run] > 1
+    piece_run, t_start, t_end = _split_runs(run[members], lo[sort][members], hi[sort][members],
+                                            np.full(int(members.sum()), SNAP_TOLERANCE))
+    ref = sort[first[piece_run]]
+    base = np.column_stack((x1[ref], y1[ref])) - d[ref] * t0[ref, None]
+    p1 = base + d[ref] * t_start[:, None]
+    p2 = base + d[ref] * t_end[:, None]
+    new = np.column_stack((p1, p2, np.zeros(len(ref))))
+    return new, owner[ref], keep, int(counts[merged].sum() - merged.sum())
+
+
+def _merge_arcs(segments, owner, circles, circle_owner):
+    # Arcs d'un même cercle qui se recouvrent -> arcs sans recouvrement, redécoupés aux extrémités
+    # d'origine. Un cercle entièrement couvert par des arcs est retiré (les arcs portent les sommets).
+    cx, cy, r = bulge_centers(segments)
+    sweep = 4.0 * np.arctan(segments[:, 4])
+    start = np.arctan2(segments[:, 1] - cy, segments[:, 0] - cx)
+    start = np.mod(np.where(sweep < 0, start + sweep, start), 2.0 * np.pi)
+    sweep = np.abs(sweep)
+    keys = _quantize(np.column_stack((cx, cy, r)), SNAP_TOLERANCE)
+
+    sort, group = _row_groups(keys, start)
+    end = start + sweep
+    tolerance = SNAP_TOLERANCE / r
+    run = _runs(group, start[sort], end[sort], tolerance[sort])
+    counts = np.bincount(run) if len(run) else np.zeros(0, dtype=np.int64)
+    first = np.cumsum(counts) - counts
+    merged = counts > 1
+    keep = np.ones(len(segments), dtype=bool)
+    members = counts[run] > 1 if len(run) else np.zeros(0, dtype=bool)
+    keep[sort[members]] = False
+
+    # Série qui fait le tour complet : extrémités au-delà d'un tour ramenées dans [a0, a0 + 2π]
+    a0 = start[sort[first]]
+    reach = np.maximum.reduceat(end[sort], first) if len(first) else np.zeros(0)
+    full = merged & (reach >= a0 + 2.0 * np.pi - tolerance[sort[first]])
+    m_run, m_index = run[members], sort[members]
+    limit = a0[m_run] + 2.0 * np.pi
+    wrap = full[m_run]
+    lo, hi = start[m_index], end[m_index]
+    lo = np.where(wrap & (lo >= limit - tolerance[m_index]), np.maximum(lo - 2.0 * np.pi, a0[m_run]), lo)
+    hi = np.where(wrap & (hi >= limit - tolerance[m_index]), np.maximum(hi - 2.0 * np.pi, a0[m_run]), hi)
+    closing = np.nonzero(full)[0]
+    piece_run, t_start, t_end = _split_runs(
+        np.concatenate((m_run, closing)), np.concatenate((lo, a0[closing] + 2.0 * np.pi)),
+        np.concatenate((hi, a0[closing] + 2.0 * np.pi)), np.concatenate((tolerance[m_index],
+                                                                         tolerance[sort[first[closing]]])))
+    ref = sort[first[piece_run]]
+    new = np.column_stack((cx[ref] + r[ref] * np.cos(t_start), cy[ref] + r[ref] * np.sin(t_start),
+                           cx[ref] + r[ref] * np.cos(t_end), cy[ref] + r[ref] * np.sin(t_end),
+                           np.tan((t_end - t_start) / 4.0)))
+
+    # Cercles couverts par une série complète d'arcs (même centre et rayon)
+    covered = np.zeros(len(circles), dtype=bool)
+    if len(closing) and len(circles):
+        both, both_group = _row_groups(np.concatenate((keys[sort[first[closing]]],
+                                                       _quantize(circles, SNAP_TOLERANCE))))
+        is_circle = both >= len(closing)
+        full_group = np.zeros(both_group[-1] + 1, dtype=bool)
+        full_group[both_group[~is_circle]] = True
+        covered[both[is_circle] - len(closing)] = full_group[both_group[is_circle]]
+    removed = int(counts[merged].sum() - merged.sum()) + int(covered.sum())
+    return new, owner[ref], ~covered, keep, removed
+
+
+def _close_gaps(segments, tolerance):
+    # Extrémités libres (degré 1 après accrochage) proches deux à deux : ramenées à leur milieu
+    points = segments[:, :4].reshape(-1, 2)
+    if len(points) == 0:
+        return segments, 0
+    nodes = snap_points(points, SNAP_TOLERANCE)
+    free = np.nonzero(np.bincount(nodes)[nodes] == 1)[0]
+    if len(free) < 2:
+        return segments, 0
+    groups = snap_points(points[free], tolerance)
+    counts = np.bincount(groups)
+    pairs = counts[groups] == 2
+    # Les deux extrémités d'un même segment ne sont pas reliées entre elles
+    sort = np.argsort(groups[pairs], kind="stable")
+    a, b = free[pairs][sort][0::2], free[pairs][sort][1::2]
+    other = a // 2 != b // 2
+    a, b = a[other], b[other]
+    middle = (points[a] + points[b]) / 2.0
+    points = points.copy()
+    points[a] = middle
+    points[b] = middle
+    closed = segments.copy()
+    closed[:, :4] = points.reshape(-1, 4)
+    return closed, len(a)
+
+
+def clean_geometry(geometry, gap_tolerance=GAP_TOLERANCE):
+    # Normalisation avant chiffrage, en O(n log n) (hachage et balayages triés, aucune comparaison
+    # deux à deux) : segments nuls et doublons retirés, recouvrements colinéaires et arcs
+    # cocirculaires découpés sans perdre de sommet, interstices refermés. Renvoie (géométrie nettoyée, rapport).
+    segments = np.asarray(geometry.segments, dtype=np.float64)
+    owner = np.asarray(geometry.segment_owner)
+    circles = np.asarray(geometry.circles, dtype=np.float64)
+    circle_owner = np.asarray(geometry.circle_owner)
+    report = dict.fromkeys(REPORT_LABELS, 0)
+
+    nonzero = np.hypot(segments[:, 2] - segments[:, 0], segments[:, 3] - segments[:, 1]) > SNAP_TOLERANCE
+    nonzero &= ~np.isnan(segments).any(axis=1)
+    report["nuls"] = int((~nonzero).sum())
+    segments, owner = segments[nonzero], owner[nonzero]
+
+    # Forme canonique (extrémités dans l'ordre lexicographique) puis hachage des coordonnées
+    ends = _quantize(segments[:, :4], SNAP_TOLERANCE)
+    swap = (ends[:, 0] > ends[:, 2]) | ((ends[:, 0] == ends[:, 2]) & (ends[:, 1] > ends[:, 3]))
+    ends[swap] = ends[swap][:, [2, 3, 0, 1]]
+    bulge = np.where(swap, -segments[:, 4], segments[:, 4])
+    unique = _first_unique(np.column_stack((ends, _quantize(bulge, 1e-9))))
+    unique_circles = _first_unique(_quantize(circles, SNAP_TOLERANCE))
+    report["doublons"] = len(segments) - len(unique) + len(circles) - len(unique_circles)
+    segments, owner = segments[unique], owner[unique]
+    circles, circle_owner = circles[unique_circles], circle_owner[unique_circles]
+
+    straight = segments[:, 4] == 0.0
+    lines, line_owner, keep_lines, report["chevauchements"] = _merge_lines(segments[straight], owner[straight])
+    arcs, arc_owner, keep_circles, keep_arcs, report["arcs"] = _merge_arcs(
+        segments[~straight], owner[~straight], circles, circle_owner)
+    keep = np.zeros(len(segments), dtype=bool)
+    keep[straight] = keep_lines
+    keep[~straight] = keep_arcs
+    segments = np.concatenate((segments[keep], lines, arcs))
+    owner = np.concatenate((owner[keep], line_owner, arc_owner))
+    circles, circle_owner = circles[keep_circles], circle_owner[keep_circles]
+
+    segments, report["jonctions"] = _close_gaps(segments, gap_tolerance)
+    cleaned = DxfGeometry(segments, owner, circles, circle_owner, geometry.kinds)
+    report["longueur_retiree"] = round(geometry.perimeter - cleaned.perimeter, 2)
+    return cleaned, report
+
+
+def report_lines(report):
+    # Lignes lisibles du rapport, seulement pour les corrections effectuées
+    lines = [f"{label} : {report[key]}" for key, label in REPORT_LABELS.items() if report.get(key)]
+    if lines and report.get("longueur_retiree"):
+        lines.append(f"Longueur de découpe retirée : {report['longueur_retiree']:.2f} mm")
+    return lines
@@ -0,0 +1,121 @@
+import numpy as np
+
+from utils.geometry import bulge_centers, bulge_lengths
+from utils.pricing import interpolate, machine_dynamics
+from utils.topology import SNAP_TOLERANCE, orient_segments, snap_points
+
+
+class CutProfile:
+    # Ce qui, dans une pièce, fait varier le temps de coupe, indépendamment de la machine :
+    #   lengths (S,) : longueur de chaque segment coupé (cercles compris)
+    #   radius  (S,) : rayon des arcs, inf pour les droites
+    #   corner  (S,) : vitesse de passage à l'angle qui suit le segment, en fraction de la vitesse
+    #                  tenue sur le segment (1 = tangent, 0 = arrêt complet)
+    #   pierces      : amorçages, un par contour fermé ou chaîne ouverte
+
+    def __init__(self, lengths, radius, corner, pierces):
+        self.lengths = np.asarray(lengths, dtype=np.float64)
+        self.radius = np.asarray(radius, dtype=np.float64)
+        self.corner = np.asarray(corner, dtype=np.float64)
+        self.pierces = int(pierces)
+
+    @property
+    def length(self):
+        return float(self.lengths.sum())
+
+    @classmethod
+    def simple(cls, length, pierces=1, corners=0):
+        # Pièce saisie à la main : longueur droite, `corners` angles droits, sans arcs
+        lengths = np.full(max(corners, 1), length / max(corners, 1))
+        corner = np.full(len(lengths), 1.0 if corners == 0 else 0.0)
+        return cls(lengths, np.full(len(lengths), np.inf), corner, pierces)
+
+
+def _tangents(segments):
+    # Directions (rad) de la tangente au départ et à l'arrivée de chaque segment orienté :
+    # celle de la corde, tournée de ∓θ/2 sur un arc de θ = 4·atan(bulge)
+    chord = np.arctan2(segments[:, 3] - segments[:, 1], segments[:, 2] - segments[:, 0])
+    half = 2.0 * np.arctan(segments[:, 4])
+    return chord - half, chord + half
+
+
+def _radius(segments):
+    radius = np.full(len(segments), np.inf)
+    curved = np.abs(segments[:, 4]) > 1e-12
+    radius[curved] = bulge_centers(segments[curved])[2]
+    return radius
+
+
+def cut_profile(topology):
+    # Profil de coupe d'une pièce : segments des contours dans leur ordre de parcours,
+    # angles entre segments consécutifs (dernier -> premier compris), puis cercles et segments ouverts
+    segments = np.asarray(topology.geometry.segments, dtype=np.float64)
+    oriented = orient_segments(segments[topology.order], topology.reverse)
+    offsets = topology.loop_offsets
+    index = np.arange(len(oriented))
+    loop = np.searchsorted(offsets, index, side="right") - 1
+    following = index + 1
+    last = following == offsets[np.minimum(loop + 1, len(offsets) - 1)]
+    following[last] = offsets[loop[last]]
+    start, end = _tangents(oriented)
+    deviation = np.abs(np.angle(np.exp(1j * (start[following] - end))))
+    # Vitesse de passage ∝ cos(déviation) : arrêt complet au-delà d'un angle droit
+    corner = np.maximum(np.cos(deviation), 0.0)
+
+    circles = np.asarray(topology.geometry.circles, dtype=np.float64)[topology.loop_circle[topology.loop_circle >= 0]]
+    open_segments = segments[topology.open_segments]
+    chords = np.hypot(open_segments[:, 2] - open_segments[:, 0], open_segments[:, 3] - open_segments[:, 1])
+    open_segments = open_segments[chords > SNAP_TOLERANCE]
+    # Chaînes ouvertes : deux extrémités libres chacune
+    ends = snap_points(np.concatenate((open_segments[:, 0:2], open_segments[:, 2:4])))
+    free = int((np.bincount(ends)[ends] == 1).sum()) if len(ends) else 0
+    chains = max(free // 2, 1) if len(open_segments) else 0
+
+    all_segments = np.concatenate((oriented, open_segments))
+    lengths = bulge_lengths(np.hypot(all_segments[:, 2] - all_segments[:, 0], all_segments[:, 3] - all_segments[:, 1]),
+                            all_segments[:, 4])
+    return CutProfile(
+        lengths=np.concatenate((lengths, 2.0 * np.pi * circles[:, 2])),
+        radius=np.concatenate((_radius(all_segments), circles[:, 2])),
+        corner=np.concatenate((corner, np.ones(len(open_segments) + len(circles)))),
+        pierces=len(offsets) - 1 + len(circles) + chains,
+    )
+
+
+def time_components(profile, speed, dynamics, thicknesses):
+    # Temps par pièce (s) pour une machine, diffusés sur speed (..., T) :
+    #   coupe    : Σ longueur / vitesse tenue, la vitesse étant réduite sur les petits rayons
+    #   angles   : décélération de v à c·v puis réaccélération, (v - c·v)² / (a·v) par angle
+    #   departs  : mise en vitesse et arrêt de chaque contour, v / a
+    #   percages : amorçages, temps fonction de l'épaisseur
+    acceleration = float(dynamics["acceleration"])
+    ratio = np.ones(len(profile.radius))
+    arcs = np.isfinite(profile.radius)
+    ratio[arcs] = np.clip(interpolate(dynamics["vitesse_rayon"], profile.radius[arcs]), 1e-3, 1.0)
+    slow_length = float((profile.lengths / ratio).sum())
+    corner_loss = float((ratio * (1.0 - profile.corner) ** 2).sum())
+    return {
+        "coupe": slow_length / speed,
+        "angles": speed * corner_loss / acceleration,
+        "departs": speed * profile.pierces / acceleration,
+        "percages": profile.pierces * interpolate(dynamics["percage"], thicknesses),
+    }
+
+
+def cycle_time_model(profile, machines_config):
+    # Fonction à passer à pricing.quote_grid(cycle_time=...) : tous les segments sont évalués
+    # d'un bloc pour chaque machine, la grille matières × épaisseurs par diffusion
+    def cycle_time(speed, machines, thicknesses):
+        seconds = np.empty_like(speed)
+        for i, machine in enumerate(machines):
+            parts = time_components(profile, speed[i], machine_dynamics(machines_config, machine), thicknesses)
+            seconds[i] = sum(parts.values())
+        return seconds
+    return cycle_time
+
+
+def cycle_time_breakdown(profile, machines_config, machine, speed, thickness):
+    # Détail (s) pour l'affichage d'un devis
+    parts = time_components(profile, np.float64(speed), machine_dynamics(machines_config, machine),
+                            np.float64(thickness))
+    return {name: float(value) for name, value in parts.items()}
@@ -0,0 +1,279 @@
+import contextlib
+import json
+import os
+import queue
+import re
+import sqlite3
+import time
+
+DB_PATH = os.environ.get("PARTLAB_DB", os.path.join(os.path.expanduser("~"), ".partlab", "partlab.db"))
+POOL_SIZE = int(os.environ.get("PARTLAB_DB_POOL", "4"))
+PAGE_SIZE = 50
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS clients (
+    id INTEGER PRIMARY KEY,
+    entreprise TEXT NOT NULL COLLATE NOCASE,
+    nom TEXT NOT NULL COLLATE NOCASE,
+    email TEXT NOT NULL DEFAULT '' COLLATE NOCASE,
+    telephone TEXT NOT NULL DEFAULT '',
+    notes TEXT NOT NULL DEFAULT '',
+    cree REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS clients_entreprise ON clients (entreprise, nom);
+CREATE INDEX IF NOT EXISTS clients_nom ON clients (nom);
+CREATE INDEX IF NOT EXISTS clients_email ON clients (email);
+
+CREATE TABLE IF NOT EXISTS configurations (
+    id INTEGER PRIMARY KEY,
+    utilisateur TEXT NOT NULL,
+    matiere TEXT NOT NULL,
+    epaisseur REAL NOT NULL,
+    quantite INTEGER NOT NULL,
+    cree REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS configurations_utilisateur ON configurations (utilisateur, cree);
+
+CREATE TABLE IF NOT EXISTS machines (
+    machine TEXT NOT NULL,
+    matiere TEXT NOT NULL,
+    epaisseur REAL NOT NULL,
+    vitesse REAL NOT NULL,
+    PRIMARY KEY (machine, matiere, epaisseur)
+);
+
+-- Paramètres dynamiques (pricing.DYNAMICS) : tables percage / vitesse_rayon, valeurs simples avec x = 0
+CREATE TABLE IF NOT EXISTS machine_dynamique (
+    machine TEXT NOT NULL,
+    parametre TEXT NOT NULL,
+    x REAL NOT NULL,
+    valeur REAL NOT NULL,
+    PRIMARY KEY (machine, parametre, x)
+);
+
+CREATE TABLE IF NOT EXISTS devis (
+    id INTEGER PRIMARY KEY,
+    utilisateur TEXT NOT NULL,
+    client_id INTEGER REFERENCES clients (id) ON DELETE SET NULL,
+    ref TEXT NOT NULL DEFAULT '' COLLATE NOCASE,
+    designation TEXT NOT NULL DEFAULT '',
+    matiere TEXT NOT NULL,
+    epaisseur REAL NOT NULL,
+    quantite INTEGER NOT NULL,
+    machine TEXT NOT NULL,
+    total REAL NOT NULL,
+    details TEXT NOT NULL DEFAULT '{}',
+    cree REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS devis_cree ON devis (cree);
+CREATE INDEX IF NOT EXISTS devis_client ON devis (client_id, cree);
+CREATE INDEX IF NOT EXISTS devis_utilisateur ON devis (utilisateur, cree);
+CREATE INDEX IF NOT EXISTS devis_ref ON devis (ref);
+"""
+
+# Index plein texte synchronisé par triggers (si SQLite est compilé avec FTS5)
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS clients_fts USING fts5(
+    entreprise, nom, email, notes, content='clients', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS clients_ai AFTER INSERT ON clients BEGIN
+    INSERT INTO clients_fts (rowid, entreprise, nom, email, notes)
+    VALUES (new.id, new.entreprise, new.nom, new.email, new.notes);
+END;
+CREATE TRIGGER IF NOT EXISTS clients_ad AFTER DELETE ON clients BEGIN
+    INSERT INTO clients_fts (clients_fts, rowid, entreprise, nom, email, notes)
+    VALUES ('delete', old.id, old.entreprise, old.nom, old.email, old.notes);
+END;
+CREATE TRIGGER IF NOT EXISTS clients_au AFTER UPDATE ON clients BEGIN
+    INSERT INTO clients_fts (clients_fts, rowid, entreprise, nom, email, notes)
+    VALUES ('delete', old.id, old.entreprise, old.nom, old.email, old.notes);
+    INSERT INTO clients_fts (rowid, entreprise, nom, email, notes)
+    VALUES (new.id, new.entreprise, new.nom, new.email, new.notes);
+END;
+"""
+
+CLIENT_COLUMNS = "id, entreprise, nom, email, telephone, notes, cree"
+QUOTE_COLUMNS = "id, utilisateur, client_id, ref, designation, matiere, epaisseur, quantite, machine, total, cree"
+# Champs du devis de session non enregistrés dans l'historique (aperçu PNG en octets)
+QUOTE_TRANSIENT_FIELDS = ("apercu",)
+
+
+def _escape_like(text):
+    return re.sub(r"([\\%_])", r"\\\1", text)
+
+
+class Database:
+    # Connexions réutilisées (pool) : WAL permet aux lectures de ne pas attendre les écritures
+
+    def __init__(self, path=DB_PATH, pool_size=POOL_SIZE):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.pool = queue.Queue()
+        for _ in range(pool_size):
+            self.pool.put(self._connect())
+        with self.connection() as conn:
+            conn.executescript(SCHEMA)
+            try:
+                conn.executescript(FTS_SCHEMA)
+                self.fts = True
+            except sqlite3.OperationalError:
+                self.fts = False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    @contextlib.contextmanager
+    def connection(self):
+        conn = self.pool.get()
+        try:
+            yield conn
+        finally:
+            self.pool.put(conn)
+
+    @contextlib.contextmanager
+    def transaction(self):
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def _query(self, sql, params=()):
+        with self.connection() as conn:
+            return [dict(row) for row in conn.execute(sql, params)]
+
+    # --- Clients ---------------------------------------------------------
+
+    def add_client(self, entreprise, nom, email="", telephone="", notes=""):
+        with self.transaction() as conn:
+            cursor = conn.execute(
+                "INSERT INTO clients (entreprise, nom, email, telephone, notes, cree) VALUES (?, ?, ?, ?, ?, ?)",
+                (entreprise, nom, email, telephone, notes, time.time()))
+            return cursor.lastrowid
+
+    def delete_clients(self, ids):
+        with self.transaction() as conn:
+            conn.executemany("DELETE FROM clients WHERE id = ?", [(i,) for i in ids])
+
+    def _client_filter(self, search):
+        # Recherche plein texte par préfixe de chaque mot ; à défaut, préfixe entreprise / nom / email
+        search = (search or "").strip()
+        if not search:
+            return "", ()
+        if self.fts:
+            tokens = re.findall(r"\w+", search)
+            if tokens:
+                query = " ".join(f'"{token}"*' for token in tokens)
+                return "WHERE id IN (SELECT rowid FROM clients_fts WHERE clients_fts MATCH ?)", (query,)
+        prefix = _escape_like(search) + "%"
+        return ("WHERE entreprise LIKE ? ESCAPE '\\' OR nom LIKE ? ESCAPE '\\' OR email LIKE ? ESCAPE '\\'",
+                (prefix, prefix, prefix))
+
+    def count_clients(self, search=""):
+        where, params = self._client_filter(search)
+        return self._query(f"SELECT COUNT(*) AS n FROM clients {where}", params)[0]["n"]
+
+    def list_clients(self, search="", limit=PAGE_SIZE, offset=0):
+        where, params = self._client_filter(search)
+        return self._query(f"SELECT {CLIENT_COLUMNS} FROM clients {where} "
+                           f"ORDER BY entreprise, nom, id LIMIT ? OFFSET ?", params + (limit, offset))
+
+    # --- Configurations --------------------------------------------------
+
+    def add_configuration(self, utilisateur, matiere, epaisseur, quantite):
+        with self.transaction() as conn:
+            conn.execute("INSERT INTO configurations (utilisateur, matiere, epaisseur, quantite, cree) "
+                         "VALUES (?, ?, ?, ?, ?)", (utilisateur, matiere, epaisseur, quantite, time.time()))
+
+    def list_configurations(self, utilisateur, limit=PAGE_SIZE):
+        return self._query("SELECT matiere, epaisseur, quantite, cree FROM configurations WHERE utilisateur = ? "
+                           "ORDER BY cree DESC LIMIT ?", (utilisateur, limit))
+
+    # --- Machines --------------------------------------------------------
+
+    def load_machines(self):
+        # Même forme que pricing.DEFAULT_MACHINES ; None si rien n'est encore enregistré
+        from utils.pricing import DYNAMICS  # numpy : pas avant la connexion
+
+        rows = self._query("SELECT machine, matiere, epaisseur, vitesse FROM machines "
+                           "ORDER BY machine, matiere, epaisseur")
+        if not rows:
+            return None
+        config = {}
+        for row in rows:
+            config.setdefault(row["machine"], {}).setdefault(row["matiere"], {})[row["epaisseur"]] = row["vitesse"]
+        for row in self._query("SELECT machine, parametre, x, valeur FROM machine_dynamique "
+                               "ORDER BY machine, parametre, x"):
+            if row["machine"] not in config:
+                continue
+            dynamics = config[row["machine"]].setdefault(DYNAMICS, {})
+            if row["parametre"] == "acceleration":
+                dynamics["acceleration"] = row["valeur"]
+            else:
+                dynamics.setdefault(row["parametre"], {})[row["x"]] = row["valeur"]
+        return config
+
+    def save_machines(self, config):
+        from utils.pricing import DYNAMICS
+
+        rows = [(machine, matiere, float(t), float(v))
+                for machine, tables in config.items()
+                for matiere, table in tables.items() if matiere != DYNAMICS
+                for t, v in (table.items() if isinstance(table, dict) else [(3.0, table)])]
+        dynamics = [(machine, parametre, float(x), float(v))
+                    for machine, tables in config.items()
+                    for parametre, table in tables.get(DYNAMICS, {}).items()
+                    for x, v in (table.items() if isinstance(table, dict) else [(0.0, table)])]
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM machines")
+            conn.executemany("INSERT INTO machines (machine, matiere, epaisseur, vitesse) VALUES (?, ?, ?, ?)", rows)
+            conn.execute("DELETE FROM machine_dynamique")
+            conn.executemany("INSERT INTO machine_dynamique (machine, parametre, x, valeur) VALUES (?, ?, ?, ?)",
+                             dynamics)
+
+    # --- Historique des devis --------------------------------------------
+
+    def add_quote(self, utilisateur, devis, client_id=None):
+        # Pas de default=str : un champ non sérialisable doit échouer plutôt qu'être enregistré en repr
+        details = json.dumps({k: v for k, v in devis.items() if k not in QUOTE_TRANSIENT_FIELDS}, ensure_ascii=False)
+        with self.transaction() as conn:
+            cursor = conn.execute(
+                "INSERT INTO devis (utilisateur, client_id, ref, designation, matiere, epaisseur, quantite, machine, "
+                "total, details, cree) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (utilisateur, client_id, devis["ref"], devis["designation"], devis["matiere"], devis["epaisseur"],
+                 devis["quantite"], devis["machine"], devis["prix_total_final"], details, time.time()))
+            return cursor.lastrowid
+
+    def _quote_filter(self, ref="", client_id=None, utilisateur=None):
+        clauses, params = [], []
+        if ref:
+            clauses.append("ref LIKE ? ESCAPE '\\'")
+            params.append(_escape_like(ref) + "%")
+        if client_id is not None:
+            clauses.append("client_id = ?")
+            params.append(client_id)
+        if utilisateur is not None:
+            clauses.append("utilisateur = ?")
+            params.append(utilisateur)
+        return ("WHERE " + " AND ".join(clauses)) if clauses else "", tuple(params)
+
+    def count_quotes(self, **filters):
+        where, params = self._quote_filter(**filters)
+        return self._query(f"SELECT COUNT(*) AS n FROM devis {where}", params)[0]["n"]
+
+    def list_quotes(self, limit=PAGE_SIZE, offset=0, **filters):
+        where, params = self._quote_filter(**filters)
+        return self._query(f"SELECT {QUOTE_COLUMNS} FROM devis {where} ORDER BY cree DESC LIMIT ? OFFSET ?",
+                           params + (limit, offset))
+
+    def get_quote(self, quote_id):
+        rows = self._query("SELECT details FROM devis WHERE id = ?", (quote_id,))
+        return json.loads(rows[0]["details"]) if rows else None
@@ -1,94 +1,148 @@
 import ezdxf
+from ezdxf.addons import iterdxf
+from ezdxf.lldxf.validator import binary_tags_loader
+from ezdxf.document import Drawing
+from ezdxf.filemanagement import dxf_stream_info
+from ezdxf.math import arc_angle_span_deg
+import io
 import math
+import os
+import sys
 import matplotlib.pyplot as plt
-
+from utils.cleanup import clean_geometry
+from utils.geometry import GeometryBuilder, KIND_LABELS, extract_geometry
+from utils.instrumentation import instrumented
+from utils.render import draw_geometry
+from utils.topology import build_topology
+
+# Au-delà de cette taille, l'analyse lit le fichier entité par entité
+STREAMING_THRESHOLD = int(os.environ.get("PARTLAB_STREAMING_THRESHOLD", 50 * 1024 * 1024))
+# Nombre d'entités emballées en tableaux à la fois en mode streaming
+STREAMING_CHUNK = 10000
+STREAMING_HOLES_NOTE = "Trous : cercles uniquement (lecture en flux, valeur approchée)"
+
+@instrumented("load_dxf")
 def load_dxf(file_path):
     try:
         doc = ezdxf.readfile(file_path)
         return doc
     except Exception as e:
-        print("Erreur de lecture DXF :", e)
+        # stderr : stdout porte les résultats de la ligne de commande (JSONL/CSV)
+        print("Erreur de lecture DXF :", e, file=sys.stderr)
+        return None
+
+class _BufferReader(io.RawIOBase):
+    # Lecture séquentielle d'un mmap / bytes : ezdxf le parcourt par blocs, sans copie complète
+
+    def __init__(self, buffer):
+        self.view = memoryview(buffer)
+        self.pos = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        n = min(len(b), len(self.view) - self.pos)
+        b[:n] = self.view[self.pos: self.pos + n]
+        self.pos += n
+        return n
+
+    def close(self):
+        self.view.release()
+        super().close()
+
+
+def _text_stream(buffer, encoding, errors):
+    return io.TextIOWrapper(io.BufferedReader(_BufferReader(buffer)), encoding=encoding, errors=errors)
+
+
+@instrumented("load_dxf")
+def load_dxf_buffer(buffer):
+    # Équivalent de load_dxf pour un contenu déjà en mémoire (mmap du dépôt de fichiers)
+    try:
+        if bytes(buffer[:22]) == b"AutoCAD Binary DXF\r\n\x1a\x00":
+            return Drawing.load(binary_tags_loader(bytes(buffer), errors="surrogateescape"))
+        with _text_stream(buffer, "utf-8", "ignore") as stream:
+            info = dxf_stream_info(stream)
+        with _text_stream(buffer, info.encoding, "surrogateescape") as stream:
+            return ezdxf.read(stream)
+    except Exception as e:
+        print("Erreur de lecture DXF :", e, file=sys.stderr)
         return None
 
 def distance(p1, p2):
     return math.dist(p1, p2)
 
 def arc_length(entity):
-    start_angle = math.radians(entity.dxf.start_angle)
-    end_angle = math.radians(entity.dxf.end_angle)
-    angle = abs(end_angle - start_angle)
+    angle = math.radians(arc_angle_span_deg(entity.dxf.start_angle, entity.dxf.end_angle))
     return abs(angle * entity.dxf.radius)
 
+@instrumented("get_dxf_perimeter_and_holes")
 def get_dxf_perimeter_and_holes(dxf_doc):
-    msp = dxf_doc.modelspace()
-    perimeter = 0.0
-    num_holes = 0
-    details = []
-
-    for e in msp:
-        if e.dxftype() == 'LINE':
-            start = e.dxf.start
-            end = e.dxf.end
-            d = distance(start[:2], end[:2])
-            perimeter += d
-            details.append(f"Ligne: {d:.2f} mm")
-
-        elif e.dxftype() == 'CIRCLE':
-            r = e.dxf.radius
-            p = 2 * math.pi * r
-            perimeter += p
-            num_holes += 1
-            details.append(f"Cercle: {p:.2f} mm")
-
-        elif e.dxftype() == 'ARC':
-            length = arc_length(e)
-            perimeter += length
-            details.append(f"Arc: {length:.2f} mm")
-
-        elif e.dxftype() in ['LWPOLYLINE', 'POLYLINE']:
+    # Accepte un document ezdxf ou un chemin ; les gros fichiers passent en streaming, sauf si
+    # iterdxf ne sait pas les lire (DXF R12…) : chargement complet dans ce cas
+    if isinstance(dxf_doc, (str, os.PathLike)):
+        if os.path.getsize(dxf_doc) > STREAMING_THRESHOLD:
             try:
-                vertices = [tuple(v[:2]) for v in e.get_points()]
-                for i in range(len(vertices) - 1):
-                    perimeter += distance(vertices[i], vertices[i+1])
-                if e.closed and len(vertices) > 1:
-                    perimeter += distance(vertices[-1], vertices[0])
-                details.append(f"Polyline: {perimeter:.2f} mm")
-            except Exception as ex:
-                print("Erreur LWPOLYLINE :", ex)
-
+                return scan_dxf_stream(dxf_doc)
+            except Exception as e:
+                print("Lecture en flux impossible, chargement complet :", e, file=sys.stderr)
+        dxf_doc = load_dxf(dxf_doc)
+        if dxf_doc is None:
+            return 0.0, 0, []
+    # Doublons et recouvrements retirés avant de sommer les longueurs
+    geometry, _ = clean_geometry(extract_geometry(dxf_doc.modelspace()))
+    return geometry_perimeter_and_holes(geometry)
+
+def scan_dxf_stream(file_path, chunk_size=STREAMING_CHUNK):
+    perimeter, num_holes, counts, lengths = stream_dxf_totals(file_path, chunk_size)
+    # En streaming, details résume les longueurs par type d'entité ; le nombre de trous n'y compte
+    # que les cercles (pas de topologie), contrairement à la lecture complète
+    details = [f"{label}: {counts[k]} entités, {lengths[k]:.2f} mm"
+               for k, label in enumerate(KIND_LABELS) if counts[k]]
+    details.append(STREAMING_HOLES_NOTE)
     return round(perimeter, 2), num_holes, details
 
+def stream_dxf_totals(file_path, chunk_size=STREAMING_CHUNK):
+    # Lecture incrémentale de l'espace objet sans construire le document :
+    # la mémoire dépend de chunk_size, pas de la taille du fichier
+    perimeter = 0.0
+    num_holes = 0
+    counts = [0] * len(KIND_LABELS)
+    lengths = [0.0] * len(KIND_LABELS)
+    builder = GeometryBuilder()
+
+    def flush(builder):
+        nonlocal perimeter, num_holes
+        geometry = builder.build()
+        perimeter += geometry.perimeter
+        # Sans document complet, la topologie n'est pas reconstruite : seuls les cercles comptent
+        num_holes += geometry.num_circles
+        per_entity = geometry.entity_lengths()
+        for kind in range(len(KIND_LABELS)):
+            mask = geometry.kinds == kind
+            counts[kind] += int(mask.sum())
+            lengths[kind] += float(per_entity[mask].sum())
+
+    for e in iterdxf.modelspace(file_path):
+        builder.add(e)
+        if len(builder.kinds) >= chunk_size:
+            flush(builder)
+            builder = GeometryBuilder()
+    flush(builder)
+    return perimeter, num_holes, counts, lengths
+
+def geometry_perimeter_and_holes(geometry, topology=None):
+    # Trous = contours intérieurs (cercles, polylignes fermées ou chaînes LINE/ARC)
+    topology = topology or build_topology(geometry)
+    # details est une séquence paresseuse : les libellés ne sont formatés qu'à la lecture
+    return round(geometry.perimeter, 2), topology.num_holes, geometry.details
+
+@instrumented("plot_dxf")
 def plot_dxf(dxf_doc):
-    msp = dxf_doc.modelspace()
+    # Tracé groupé : un chemin composé par type d'entité
     fig, ax = plt.subplots()
-    for e in msp:
-        if e.dxftype() == 'LINE':
-            x = [e.dxf.start[0], e.dxf.end[0]]
-            y = [e.dxf.start[1], e.dxf.end[1]]
-            ax.plot(x, y, color='blue')
-
-        elif e.dxftype() == 'CIRCLE':
-            circle = plt.Circle((e.dxf.center[0], e.dxf.center[1]), e.dxf.radius, fill=False, color='green')
-            ax.add_patch(circle)
-
-        elif e.dxftype() == 'ARC':
-            start_angle = math.radians(e.dxf.start_angle)
-            end_angle = math.radians(e.dxf.end_angle)
-            angle_range = abs(end_angle - start_angle)
-            arc = plt.Arc((e.dxf.center[0], e.dxf.center[1]), 2*e.dxf.radius, 2*e.dxf.radius, 
-                          angle=0, theta1=e.dxf.start_angle, theta2=e.dxf.end_angle, color='orange')
-            ax.add_patch(arc)
-
-        elif e.dxftype() in ['LWPOLYLINE', 'POLYLINE']:
-            try:
-                vertices = [tuple(v[:2]) for v in e.get_points()]
-                xs, ys = zip(*vertices)
-                ax.plot(xs, ys, color='red')
-            except Exception:
-                continue
-
-    ax.set_aspect('equal')
-    ax.set_title("Aperçu DXF")
+    draw_geometry(ax, extract_geometry(dxf_doc.modelspace()))
     return fig
 
 def modify_dxf(output_path, **kwargs):
@@ -113,4 +167,33 @@ def modify_dxf(output_path, **kwargs):
             (x, y)
         ], close=True)
 
+    # Ajouts en série (générateur de dessins synthétiques des benchmarks)
+    for p1, p2 in kwargs.get('add_lines', ()):
+        msp.add_line(p1, p2)
+
+    for center, radius, start_angle, end_angle in kwargs.get('add_arcs', ()):
+        msp.add_arc(center, radius, start_angle, end_angle)
+
+    for center, radius in kwargs.get('add_circles', ()):
+        msp.add_circle(center, radius)
+
+    # Polylignes : points (x, y, bulge) et fermeture
+    for points, closed in kwargs.get('add_polylines', ()):
+        msp.add_lwpolyline(points, format="xyb", close=closed)
+
+    # Blocs : {nom: [(type, args)...]} puis insertions (nom, point, échelle, rotation)
+    for name, entities in kwargs.get('add_blocks', {}).items():
+        block = doc.blocks.new(name=name)
+        for kind, args in entities:
+            getattr(block, f"add_{kind}")(*args)
+    for name, insert, scale, rotation in kwargs.get('add_inserts', ()):
+        msp.add_blockref(name, insert, dxfattribs={"xscale": scale, "yscale": scale, "rotation": rotation})
+
     doc.saveas(output_path)
+
+if __name__ == "__main__":
+    # Alias de python -m utils.batch : ce module tient lieu de utils.dxf_reader pour utils.batch,
+    # qui ne le recharge pas (une seule copie des réglages et de l'instrumentation)
+    sys.modules.setdefault("utils.dxf_reader", sys.modules[__name__])
+    from utils.batch import main
+    raise SystemExit(main(prog="python -m utils.dxf_reader"))
@@ -0,0 +1,482 @@
+import math
+import sys
+from collections.abc import Sequence
+
+import numpy as np
+
+# Précision de discrétisation (mm) des ELLIPSE / SPLINE
+FLATTEN_DISTANCE = 0.01
+
+# Nombre maximal de cordes par arc lors d'une discrétisation
+MAX_ARC_STEPS = 64
+
+# Codes des types d'entités (index dans KIND_LABELS)
+LINE, ARC, CIRCLE, POLYLINE, ELLIPSE, SPLINE = range(6)
+KIND_LABELS = ("Ligne", "Arc", "Cercle", "Polyline", "Ellipse", "Spline")
+
+
+def bulge_lengths(chords, bulges):
+    # Longueur d'un segment à renflement : corde * (θ/2) / sin(θ/2) avec θ = 4·atan(b)
+    half = 2.0 * np.arctan(np.abs(bulges))
+    factor = np.ones_like(half)
+    curved = half > 1e-12
+    factor[curved] = half[curved] / np.sin(half[curved])
+    return chords * factor
+
+
+def bulge_centers(segments):
+    # Centre et rayon des segments à renflement
+    x1, y1, x2, y2, b = segments.T
+    dx, dy = x2 - x1, y2 - y1
+    chord = np.hypot(dx, dy)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Distance signée du milieu de la corde au centre
+        k = (1.0 - b * b) / (4.0 * b)
+        cx = (x1 + x2) / 2.0 - k * dy
+        cy = (y1 + y2) / 2.0 + k * dx
+        radius = chord * (1.0 + b * b) / (4.0 * np.abs(b))
+    return cx, cy, radius
+
+
+def arc_steps(radius, sweep, tolerance):
+    # Nombre de cordes pour que la flèche reste sous la tolérance
+    ratio = np.clip(1.0 - tolerance / np.maximum(radius, 1e-12), -1.0, 1.0)
+    max_step = np.maximum(2.0 * np.arccos(ratio), 1e-3)
+    return np.clip(np.ceil(np.abs(sweep) / max_step), 1, MAX_ARC_STEPS).astype(np.int64)
+
+
+def flatten_arcs(cx, cy, radius, start, sweep, tolerance):
+    # Discrétise tous les arcs d'un coup : renvoie des morceaux (M, 2, 2) et l'arc d'origine
+    if len(cx) == 0:
+        return np.zeros((0, 2, 2)), np.zeros(0, dtype=np.int64)
+    steps = arc_steps(radius, sweep, tolerance)
+    arc = np.repeat(np.arange(len(cx)), steps)
+    first = np.cumsum(steps) - steps
+    k = np.arange(len(arc)) - first[arc]
+    a0 = start[arc] + sweep[arc] * k / steps[arc]
+    a1 = start[arc] + sweep[arc] * (k + 1) / steps[arc]
+    r = radius[arc]
+    pieces = np.stack((
+        np.column_stack((cx[arc] + r * np.cos(a0), cy[arc] + r * np.sin(a0))),
+        np.column_stack((cx[arc] + r * np.cos(a1), cy[arc] + r * np.sin(a1))),
+    ), axis=1)
+    return pieces, arc
+
+
+def flatten_segments(segments, tolerance):
+    # Chaque segment (droit ou arc) devient une suite de morceaux droits, dans l'ordre :
+    # renvoie les points de départ/arrivée (M, 2, 2) et l'indice du segment d'origine
+    if len(segments) == 0:
+        return np.zeros((0, 2, 2)), np.zeros(0, dtype=np.int64)
+    x1, y1, x2, y2, b = np.asarray(segments, dtype=np.float64).T
+    curved = np.abs(b) > 1e-12
+    cx, cy, radius = bulge_centers(np.asarray(segments)[curved])
+    start = np.zeros(len(b))
+    sweep = np.zeros(len(b))
+    r = np.zeros(len(b))
+    ccx = np.zeros(len(b))
+    ccy = np.zeros(len(b))
+    start[curved] = np.arctan2(y1[curved] - cy, x1[curved] - cx)
+    sweep[curved] = 4.0 * np.arctan(b[curved])
+    r[curved], ccx[curved], ccy[curved] = radius, cx, cy
+    steps = np.ones(len(b), dtype=np.int64)
+    steps[curved] = arc_steps(radius, sweep[curved], tolerance)
+
+    seg = np.repeat(np.arange(len(b)), steps)
+    first = np.cumsum(steps) - steps
+    k = np.arange(len(seg)) - first[seg]
+
+    def point(t):
+        angle = start[seg] + sweep[seg] * t
+        return np.where(curved[seg][:, None],
+                        np.column_stack((ccx[seg] + r[seg] * np.cos(angle), ccy[seg] + r[seg] * np.sin(angle))),
+                        np.column_stack((x1[seg] + (x2 - x1)[seg] * t, y1[seg] + (y2 - y1)[seg] * t)))
+
+    # Extrémités exactes pour garder la continuité entre segments
+    t0 = k / steps[seg]
+    t1 = (k + 1) / steps[seg]
+    p0 = point(t0)
+    p1 = point(t1)
+    is_first = k == 0
+    is_last = k == steps[seg] - 1
+    p0[is_first] = np.column_stack((x1, y1))[seg[is_first]]
+    p1[is_last] = np.column_stack((x2, y2))[seg[is_last]]
+    return np.stack((p0, p1), axis=1), seg
+
+
+def signed_areas(segments):
+    # Aire signée (formule du lacet) + segment circulaire r²/2·(θ - sin θ) pour chaque arc
+    x1, y1, x2, y2, b = np.asarray(segments, dtype=np.float64).T
+    area = (x1 * y2 - x2 * y1) / 2.0
+    theta = 4.0 * np.arctan(b)
+    chord = np.hypot(x2 - x1, y2 - y1)
+    curved = np.abs(b) > 1e-12
+    r = np.zeros(len(b))
+    r[curved] = chord[curved] / (2.0 * np.abs(np.sin(theta[curved] / 2.0)))
+    return area + r * r / 2.0 * (theta - np.sin(theta))
+
+
+def segment_extents(segments):
+    # Boîte englobante de chaque segment, arcs compris
+    x1, y1, x2, y2, b = segments.T
+    mx = (x1 + x2) / 2.0 + b / 2.0 * (y2 - y1)
+    my = (y1 + y2) / 2.0 - b / 2.0 * (x2 - x1)
+    box = np.column_stack((np.minimum.reduce([x1, x2, mx]), np.minimum.reduce([y1, y2, my]),
+                           np.maximum.reduce([x1, x2, mx]), np.maximum.reduce([y1, y2, my])))
+    large = np.abs(b) > 1.0
+    if large.any():
+        cx, cy, r = bulge_centers(segments[large])
+        box[large] = np.column_stack((np.minimum(box[large, 0], cx - r), np.minimum(box[large, 1], cy - r),
+                                      np.maximum(box[large, 2], cx + r), np.maximum(box[large, 3], cy + r)))
+    return box
+
+
+def arc_to_bulge(cx, cy, r, start_angle, end_angle):
+    # Convertit un ARC (angles en degrés, sens trigo) en segments (x1, y1, x2, y2, bulge)
+    sweep = (end_angle - start_angle) % 360.0
+    if sweep == 0.0 and not math.isclose(start_angle, end_angle):
+        sweep = 360.0
+    if sweep == 0.0:
+        return []
+    # Un bulge de 360° est infini : on coupe l'arc en deux moitiés
+    parts = 2 if sweep > 359.999 else 1
+    step = sweep / parts
+    result = []
+    a = math.radians(start_angle)
+    for _ in range(parts):
+        b = a + math.radians(step)
+        result.append((cx + r * math.cos(a), cy + r * math.sin(a),
+                       cx + r * math.cos(b), cy + r * math.sin(b),
+                       math.tan(math.radians(step) / 4.0)))
+        a = b
+    return result
+
+
+class LazyDetails(Sequence):
+    # Liste "Ligne: 12.00 mm" construite uniquement à la demande
+
+    def __init__(self, geometry):
+        self._geometry = geometry
+        self._lengths = None
+
+    def __len__(self):
+        return self._geometry.n_entities
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if self._lengths is None:
+            self._lengths = self._geometry.entity_lengths()
+        kind = KIND_LABELS[self._geometry.kinds[index]]
+        return f"{kind}: {self._lengths[index]:.2f} mm"
+
+    def __repr__(self):
+        return f"LazyDetails({len(self)} entités)"
+
+
+class DxfGeometry:
+    # Géométrie 2D compacte :
+    #   segments (N, 5) : x1, y1, x2, y2, bulge (0 = droite, sinon arc)
+    #   circles  (K, 3) : cx, cy, r
+    #   *_owner         : index de l'entité DXF d'origine
+    #   kinds    (E,)   : type de chaque entité (voir KIND_LABELS)
+
+    ARRAYS = ("segments", "segment_owner", "circles", "circle_owner", "kinds")
+
+    def __init__(self, segments=None, segment_owner=None, circles=None, circle_owner=None, kinds=None):
+        self.segments = np.zeros((0, 5)) if segments is None else segments
+        self.segment_owner = np.zeros(0, dtype=np.int64) if segment_owner is None else segment_owner
+        self.circles = np.zeros((0, 3)) if circles is None else circles
+        self.circle_owner = np.zeros(0, dtype=np.int64) if circle_owner is None else circle_owner
+        self.kinds = np.zeros(0, dtype=np.int8) if kinds is None else kinds
+        self._segment_lengths = None
+
+    @property
+    def n_entities(self):
+        return len(self.kinds)
+
+    def segment_lengths(self):
+        if self._segment_lengths is None:
+            s = self.segments
+            chords = np.hypot(s[:, 2] - s[:, 0], s[:, 3] - s[:, 1])
+            self._segment_lengths = bulge_lengths(chords, s[:, 4])
+        return self._segment_lengths
+
+    def circle_lengths(self):
+        return 2.0 * np.pi * self.circles[:, 2]
+
+    @property
+    def perimeter(self):
+        return float(self.segment_lengths().sum() + self.circle_lengths().sum())
+
+    @property
+    def num_circles(self):
+        return len(self.circles)
+
+    def entity_lengths(self):
+        n = self.n_entities
+        return (np.bincount(self.segment_owner, weights=self.segment_lengths(), minlength=n)
+                + np.bincount(self.circle_owner, weights=self.circle_lengths(), minlength=n))
+
+    @property
+    def details(self):
+        return LazyDetails(self)
+
+    def bounds(self):
+        # (xmin, ymin, xmax, ymax) : segments (arcs compris) et cercles
+        box = segment_extents(np.asarray(self.segments))
+        c = self.circles
+        xs = np.concatenate((box[:, 0], box[:, 2], c[:, 0] - c[:, 2], c[:, 0] + c[:, 2]))
+        ys = np.concatenate((box[:, 1], box[:, 3], c[:, 1] - c[:, 2], c[:, 1] + c[:, 2]))
+        if len(xs) == 0:
+            return (0.0, 0.0, 0.0, 0.0)
+        return (float(xs.min()), float(ys.min()), float(xs.max()), float(ys.max()))
+
+    def arrays(self):
+        return {name: getattr(self, name) for name in self.ARRAYS}
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        return cls(**{name: arrays[name] for name in cls.ARRAYS})
+
+
+class GeometryBuilder:
+    # Accumule les entités une par une puis emballe tout en tableaux NumPy
+
+    def __init__(self, flatten_distance=FLATTEN_DISTANCE, blocks=None):
+        self.flatten_distance = flatten_distance
+        # Géométrie de chaque bloc (repère du bloc), calculée une fois et partagée avec les blocs imbriqués
+        self.blocks = {} if blocks is None else blocks
+        # INSERT / MINSERT : (bloc, xscale, yscale, rotation, x, y, colonnes, lignes, pas colonnes, pas lignes, miroir)
+        self.inserts = []
+        self.kinds = []
+        self.lines = []
+        self.line_owner = []
+        self.circles = []
+        self.circle_owner = []
+        # Sommets de toutes les polylignes (x, y, bulge) à la suite
+        self.vertices = []
+        self.polylines = []  # (début, nombre de sommets, fermée, entité)
+
+    def add(self, e):
+        kind = e.dxftype()
+        if kind == "LINE":
+            s, t = e.dxf.start, e.dxf.end
+            self.lines.append((s[0], s[1], t[0], t[1], 0.0))
+            self.line_owner.append(self._new_entity(LINE))
+
+        elif kind == "CIRCLE":
+            c = e.dxf.center
+            x = -c[0] if _mirrored(e) else c[0]
+            self.circles.append((x, c[1], e.dxf.radius))
+            self.circle_owner.append(self._new_entity(CIRCLE))
+
+        elif kind == "ARC":
+            c = e.dxf.center
+            parts = arc_to_bulge(c[0], c[1], e.dxf.radius, e.dxf.start_angle, e.dxf.end_angle)
+            if _mirrored(e):
+                parts = [(-x1, y1, -x2, y2, -b) for x1, y1, x2, y2, b in parts]
+            owner = self._new_entity(ARC)
+            self.lines.extend(parts)
+            self.line_owner.extend([owner] * len(parts))
+
+        elif kind == "LWPOLYLINE":
+            points = e.get_points("xyb")
+            if _mirrored(e):
+                points = [(-x, y, -b) for x, y, b in points]
+            self._add_polyline(points, e.closed, POLYLINE)
+
+        elif kind == "POLYLINE":
+            if e.is_2d_polyline:
+                points = [(v.dxf.location[0], v.dxf.location[1], v.dxf.bulge) for v in e.vertices]
+                if _mirrored(e):
+                    points = [(-x, y, -b) for x, y, b in points]
+            elif e.is_3d_polyline:
+                points = [(v.dxf.location[0], v.dxf.location[1], 0.0) for v in e.vertices]
+            else:
+                return
+            self._add_polyline(points, e.is_closed, POLYLINE)
+
+        elif kind == "INSERT":
+            block = self._block(e)
+            if block is None:
+                return
+            d = e.dxf
+            self.inserts.append((block, d.xscale, d.yscale, d.rotation, d.insert[0], d.insert[1],
+                                 d.column_count, d.row_count, d.column_spacing, d.row_spacing, _mirrored(e)))
+
+        elif kind in ("ELLIPSE", "SPLINE"):
+            try:
+                points = [(p[0], p[1], 0.0) for p in e.flattening(self.flatten_distance)]
+            except Exception as ex:
+                print(f"Erreur {kind} :", ex, file=sys.stderr)
+                return
+            self._add_polyline(points, False, ELLIPSE if kind == "ELLIPSE" else SPLINE)
+
+    def _block(self, e):
+        name = e.dxf.name
+        if name not in self.blocks:
+            # None pendant la construction : une référence circulaire est ignorée
+            self.blocks[name] = None
+            layout = e.doc.blocks.get(name) if e.doc is not None else None
+            if layout is not None:
+                builder = GeometryBuilder(self.flatten_distance, self.blocks)
+                for child in layout:
+                    builder.add(child)
+                geometry = builder.build()
+                if geometry.n_entities:
+                    base = layout.block.dxf.base_point
+                    self.blocks[name] = transform_geometry(geometry, np.eye(2)[None], -np.array([[base[0], base[1]]]))
+        return self.blocks[name]
+
+    def _insert_parts(self):
+        # Copies des blocs insérés, regroupées par bloc : une transformation vectorisée par bloc
+        groups = {}
+        for insert in self.inserts:
+            groups.setdefault(id(insert[0]), []).append(insert)
+        for group in groups.values():
+            block = group[0][0]
+            params = np.array([g[1:] for g in group], dtype=np.float64)
+            matrices, offsets = insert_transforms(params)
+            # Échelle uniforme : colonnes de la matrice de même norme
+            uniform = np.isclose(np.hypot(matrices[:, 0, 0], matrices[:, 1, 0]),
+                                 np.hypot(matrices[:, 0, 1], matrices[:, 1, 1]))
+            if uniform.all():
+                yield transform_geometry(block, matrices, offsets)
+            else:
+                # Échelle non uniforme : arcs et cercles deviennent des ellipses, on transforme le bloc discrétisé
+                key = ("discrétisé", id(block))
+                if key not in self.blocks:
+                    self.blocks[key] = flat_geometry(block, self.flatten_distance)
+                if uniform.any():
+                    yield transform_geometry(block, matrices[uniform], offsets[uniform])
+                yield transform_geometry(self.blocks[key], matrices[~uniform], offsets[~uniform])
+
+    def _new_entity(self, kind):
+        self.kinds.append(kind)
+        return len(self.kinds) - 1
+
+    def _add_polyline(self, points, closed, kind):
+        owner = self._new_entity(kind)
+        if len(points) < 2:
+            return
+        self.polylines.append((len(self.vertices), len(points), bool(closed), owner))
+        self.vertices.extend(points)
+
+    def _polyline_segments(self):
+        if not self.polylines:
+            return np.zeros((0, 5)), np.zeros(0, dtype=np.int64)
+        verts = np.asarray(self.vertices, dtype=np.float64).reshape(-1, 3)
+        start, count, closed, owner = (np.asarray(c) for c in zip(*self.polylines))
+        last = start + count - 1
+        # Pour chaque sommet : indice du sommet suivant, -1 si fin de polyligne ouverte
+        nxt = np.arange(len(verts)) + 1
+        nxt[last] = np.where(closed, start, -1)
+        keep = nxt >= 0
+        i = np.nonzero(keep)[0]
+        j = nxt[keep]
+        segments = np.column_stack((verts[i, 0], verts[i, 1], verts[j, 0], verts[j, 1], verts[i, 2]))
+        owners = np.repeat(owner, count)[keep]
+        return segments, owners
+
+    def build(self):
+        poly_segments, poly_owner = self._polyline_segments()
+        lines = np.asarray(self.lines, dtype=np.float64).reshape(-1, 5)
+        geometry = DxfGeometry(
+            segments=np.concatenate((lines, poly_segments)),
+            segment_owner=np.concatenate((np.asarray(self.line_owner, dtype=np.int64), poly_owner)),
+            circles=np.asarray(self.circles, dtype=np.float64).reshape(-1, 3),
+            circle_owner=np.asarray(self.circle_owner, dtype=np.int64),
+            kinds=np.asarray(self.kinds, dtype=np.int8),
+        )
+        if not self.inserts:
+            return geometry
+        return concatenate_geometries([geometry, *self._insert_parts()])
+
+
+def _mirrored(e):
+    # Entités OCS extrudées en (0, 0, -1) : fréquent dans les exports FAO
+    extrusion = e.dxf.get("extrusion")
+    return extrusion is not None and extrusion[2] < 0
+
+
+def insert_transforms(params):
+    # params (I, 10) : xscale, yscale, rotation (°), x, y, colonnes, lignes, pas colonnes, pas lignes, miroir
+    # -> matrices (J, 2, 2) et translations (J, 2), une par exemplaire (MINSERT : colonnes × lignes)
+    sx, sy, rotation, x, y, cols, rows, col_step, row_step, mirror = params.T
+    cols, rows = np.maximum(cols, 1).astype(np.int64), np.maximum(rows, 1).astype(np.int64)
+    count = cols * rows
+    i = np.repeat(np.arange(len(params)), count)
+    k = np.arange(len(i)) - np.repeat(np.cumsum(count) - count, count)
+    angle = np.radians(rotation[i])
+    cos, sin = np.cos(angle), np.sin(angle)
+    # Décalage du réseau dans le repère tourné (non mis à l'échelle), comme ezdxf.multi_insert
+    dx = (k % cols[i]) * col_step[i]
+    dy = (k // cols[i]) * row_step[i]
+    matrices = np.stack((np.column_stack((cos * sx[i], -sin * sy[i])),
+                         np.column_stack((sin * sx[i], cos * sy[i]))), axis=1)
+    offsets = np.column_stack((x[i] + cos * dx - sin * dy, y[i] + sin * dx + cos * dy))
+    # Extrusion (0, 0, -1) : repère OCS miroir en X
+    flip = mirror[i] > 0
+    matrices[flip, 0] *= -1.0
+    offsets[flip, 0] *= -1.0
+    return matrices, offsets
+
+
+def transform_geometry(geometry, matrices, offsets):
+    # Une copie de la géométrie par transformation affine (matrices (I, 2, 2), translations (I, 2)),
+    # calculée d'un bloc ; les entités de la copie i sont numérotées i × E + entité d'origine
+    n = len(matrices)
+    entities = geometry.n_entities
+    segments = np.asarray(geometry.segments, dtype=np.float64)
+    circles = np.asarray(geometry.circles, dtype=np.float64)
+    start = np.einsum("iab,nb->ina", matrices, segments[:, 0:2]) + offsets[:, None]
+    end = np.einsum("iab,nb->ina", matrices, segments[:, 2:4]) + offsets[:, None]
+    det = matrices[:, 0, 0] * matrices[:, 1, 1] - matrices[:, 0, 1] * matrices[:, 1, 0]
+    # Symétrie (déterminant négatif) : le sens de parcours des arcs s'inverse
+    bulge = segments[None, :, 4] * np.sign(det)[:, None]
+    centers = np.einsum("iab,nb->ina", matrices, circles[:, 0:2]) + offsets[:, None]
+    radii = circles[None, :, 2] * np.sqrt(np.abs(det))[:, None]
+    shift = (np.arange(n, dtype=np.int64) * entities)[:, None]
+    return DxfGeometry(
+        segments=np.concatenate((start, end, bulge[..., None]), axis=2).reshape(-1, 5),
+        segment_owner=(np.asarray(geometry.segment_owner)[None] + shift).ravel(),
+        circles=np.concatenate((centers, radii[..., None]), axis=2).reshape(-1, 3),
+        circle_owner=(np.asarray(geometry.circle_owner)[None] + shift).ravel(),
+        kinds=np.tile(np.asarray(geometry.kinds), n),
+    )
+
+
+def flat_geometry(geometry, tolerance):
+    # Arcs et cercles remplacés par des cordes (pour les transformations non conformes)
+    pieces, index = flatten_segments(geometry.segments, tolerance)
+    circles = np.asarray(geometry.circles)
+    k = len(circles)
+    circle_pieces, circle_index = flatten_arcs(circles[:, 0], circles[:, 1], circles[:, 2],
+                                               np.zeros(k), np.full(k, 2.0 * np.pi), tolerance)
+    all_pieces = np.concatenate((pieces, circle_pieces)).reshape(-1, 4)
+    return DxfGeometry(
+        segments=np.column_stack((all_pieces, np.zeros(len(all_pieces)))),
+        segment_owner=np.concatenate((np.asarray(geometry.segment_owner)[index],
+                                      np.asarray(geometry.circle_owner)[circle_index])),
+        kinds=np.asarray(geometry.kinds),
+    )
+
+
+def concatenate_geometries(geometries):
+    # Assemble plusieurs géométries ; les entités sont renumérotées à la suite
+    shifts = np.cumsum([0] + [g.n_entities for g in geometries[:-1]])
+    return DxfGeometry(
+        segments=np.concatenate([np.asarray(g.segments) for g in geometries]),
+        segment_owner=np.concatenate([np.asarray(g.segment_owner) + s for g, s in zip(geometries, shifts)]),
+        circles=np.concatenate([np.asarray(g.circles) for g in geometries]),
+        circle_owner=np.concatenate([np.asarray(g.circle_owner) + s for g, s in zip(geometries, shifts)]),
+        kinds=np.concatenate([np.asarray(g.kinds) for g in geometries]),
+    )
+
+
+def extract_geometry(entities, flatten_distance=FLATTEN_DISTANCE):
+    builder = GeometryBuilder(flatten_distance)
+    for e in entities:
+        builder.add(e)
+    return builder.build()
@@ -0,0 +1,121 @@
+import contextlib
+import contextvars
+import cProfile
+import functools
+import io
+import json
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+# Mesures conservées en mémoire (panneau admin) et émises en JSON sur le logger "partlab.perf"
+RECENT_SIZE = 2000
+# Valeurs par défaut du processus ; chaque session peut les changer pour ses propres mesures (set_options)
+TRACE_MEMORY = os.environ.get("PARTLAB_TRACE_MEMORY", "") == "1"
+PROFILE = os.environ.get("PARTLAB_PROFILE", "") == "1"
+PROFILE_LINES = 15
+
+logger = logging.getLogger("partlab.perf")
+_destination = os.environ.get("PARTLAB_PERF_LOG")
+if _destination:
+    _handler = logging.StreamHandler(sys.stderr) if _destination == "-" else logging.FileHandler(_destination)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+
+RECENT = deque(maxlen=RECENT_SIZE)
+# Contexte de la requête en cours (utilisateur, onglet…), recopié dans chaque mesure
+_context = contextvars.ContextVar("partlab_perf_context", default={})
+# Options de mesure de la session en cours (pic mémoire, profilage), sans toucher aux autres sessions
+_options = contextvars.ContextVar("partlab_perf_options", default={})
+# Un seul cProfile actif à la fois dans le processus
+_profile_lock = threading.Lock()
+
+
+def set_context(**fields):
+    _context.set({**_context.get(), **fields})
+
+
+def set_options(memory=None, profile=None):
+    # None : valeur par défaut du processus (PARTLAB_TRACE_MEMORY / PARTLAB_PROFILE)
+    _options.set({k: v for k, v in (("memory", memory), ("profile", profile)) if v is not None})
+
+
+@contextlib.contextmanager
+def timed(stage, memory=None, profile=None, **fields):
+    options = _options.get()
+    memory = options.get("memory", TRACE_MEMORY) if memory is None else memory
+    profile = options.get("profile", PROFILE) if profile is None else profile
+    record = {"stage": stage, **_context.get(), **fields}
+    # Mémoire : uniquement si aucune mesure englobante ne trace déjà. tracemalloc est global au
+    # processus : le pic inclut les allocations des autres threads (sessions) pendant la mesure
+    tracing = memory and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    profiler = None
+    if profile and _profile_lock.acquire(blocking=False):
+        profiler = cProfile.Profile()
+        profiler.enable()
+    start = time.perf_counter()
+    record["ok"] = False
+    try:
+        yield record
+        record["ok"] = True
+    except BaseException as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        record["seconds"] = round(time.perf_counter() - start, 6)
+        if profiler is not None:
+            profiler.disable()
+            _profile_lock.release()
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(PROFILE_LINES)
+            record["profile"] = stream.getvalue()
+        if tracing:
+            record["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 3)
+            tracemalloc.stop()
+        record["at"] = time.time()
+        RECENT.append(record)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({k: v for k, v in record.items() if k != "profile"}, default=str))
+
+
+def instrumented(stage):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def stage_stats():
+    # Par étape : nombre d'appels, p50 / p95 / max (ms), erreurs
+    # numpy importé ici : le module est chargé par app.py avant la page de connexion
+    import numpy as np
+    records = list(RECENT)
+    stages = sorted({r["stage"] for r in records})
+    rows = []
+    for stage in stages:
+        seconds = np.array([r["seconds"] for r in records if r["stage"] == stage]) * 1000
+        p50, p95 = np.percentile(seconds, [50, 95])
+        rows.append({
+            "Étape": stage,
+            "Appels": len(seconds),
+            "p50 (ms)": round(float(p50), 1),
+            "p95 (ms)": round(float(p95), 1),
+            "max (ms)": round(float(seconds.max()), 1),
+            "Erreurs": sum(1 for r in records if r["stage"] == stage and not r["ok"]),
+        })
+    return rows
+
+
+def slowest(n=10):
+    return sorted(RECENT, key=lambda r: r["seconds"], reverse=True)[:n]
@@ -0,0 +1,212 @@
+import contextlib
+import multiprocessing
+import os
+import signal
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.analysis_cache import CACHE_DIR, AnalysisCache, analyse_document, file_digest
+from utils.dxf_reader import load_dxf_buffer
+from utils.uploads import mapped_file
+
+JOB_WORKERS = int(os.environ.get("PARTLAB_JOB_WORKERS", "2"))
+JOB_TTL = 600  # secondes de conservation d'un travail terminé
+CANCEL_POLL = 0.2  # secondes entre deux vérifications des demandes d'annulation pendant une étape
+# fork : les processus héritent des modules déjà importés (numpy, ezdxf) ; spawn là où fork n'existe pas
+START_METHOD = os.environ.get("PARTLAB_START_METHOD",
+                              "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn")
+
+# Étapes d'une analyse, dans l'ordre d'exécution
+STAGES = {"load": "Lecture du DXF", "geometry": "Périmètre et trous", "preview": "Aperçu"}
+STATE_LABELS = {"pending": "En attente", "running": "Démarrage", "done": "Terminé",
+                "cancelled": "Annulé", "error": "Erreur"}
+
+
+class JobCancelled(BaseException):
+    # BaseException : ne doit pas être avalée par les "except Exception" de la lecture DXF
+    pass
+
+
+@contextlib.contextmanager
+def _interruptible(job_id, cancel_requests):
+    # Pendant les étapes longues (lecture ezdxf, extraction), un fil surveille les demandes
+    # d'annulation et interrompt le fil principal du processus par un signal. Sans pthread_kill
+    # (Windows), l'annulation n'est vérifiée qu'entre deux étapes.
+    if not hasattr(signal, "pthread_kill"):
+        yield
+        return
+    stop = threading.Event()
+    main = threading.get_ident()
+
+    def on_signal(signum, frame):
+        if not stop.is_set():
+            raise JobCancelled(job_id)
+
+    def watch():
+        while not stop.wait(CANCEL_POLL):
+            if cancel_requests.get(job_id):
+                signal.pthread_kill(main, signal.SIGUSR1)
+                return
+
+    previous = signal.signal(signal.SIGUSR1, on_signal)
+    watcher = threading.Thread(target=watch, daemon=True)
+    watcher.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        watcher.join()
+        signal.signal(signal.SIGUSR1, previous)
+
+
+def _analysis_worker(job_id, path, digest, cache_root, stages, cancel_requests):
+    # Exécuté dans un processus du pool ; l'annulation est vérifiée entre deux étapes et, pendant
+    # une étape, par le fil de surveillance
+    def progress(stage):
+        if cancel_requests.get(job_id):
+            raise JobCancelled(job_id)
+        stages[job_id] = stage
+
+    with _interruptible(job_id, cancel_requests):
+        progress("load")
+        # Fichier du dépôt lu en mémoire mappée ; le mmap est fermé dès le document construit
+        with mapped_file(path) as buffer:
+            doc = load_dxf_buffer(buffer)
+        result = analyse_document(digest, doc, AnalysisCache(cache_root), progress)
+    if result is None:
+        raise ValueError("DXF illisible")
+    return result
+
+
+class Job:
+
+    def __init__(self, job_id, digest, name, future=None, result=None):
+        self.id = job_id
+        self.digest = digest
+        self.name = name
+        self.future = future
+        self.result = result
+        self.owners = set()
+        self.submitted = time.time()
+        self.finished = None if future is not None else self.submitted
+        if future is not None:
+            future.add_done_callback(lambda f: setattr(self, "finished", time.time()))
+
+    def state(self):
+        if self.future is None:
+            return "done"
+        if self.future.cancelled():
+            return "cancelled"
+        if not self.future.done():
+            return "running" if self.future.running() else "pending"
+        error = self.future.exception()
+        if isinstance(error, JobCancelled):
+            return "cancelled"
+        return "error" if error is not None else "done"
+
+
+class JobQueue:
+    # Analyses DXF dans un pool de processus borné, partagé par toutes les sessions.
+    # Un même contenu (empreinte SHA-256) n'est analysé qu'une fois à la fois : les sessions
+    # qui le soumettent pendant l'analyse se rattachent au travail en cours.
+
+    def __init__(self, workers=JOB_WORKERS, cache_root=CACHE_DIR):
+        self.workers = workers
+        self.cache_root = cache_root
+        self.jobs = {}
+        self.by_digest = {}
+        self.lock = threading.Lock()
+        self._pool = None
+        self._manager = None
+
+    def _start(self):
+        # Pool et dictionnaires partagés (étape en cours, demandes d'annulation) créés au premier travail
+        if self._pool is None:
+            # Méthode de démarrage explicite : le comportement ne dépend pas du défaut de la plateforme
+            context = multiprocessing.get_context(START_METHOD)
+            self._manager = context.Manager()
+            self.stages = self._manager.dict()
+            self.cancel_requests = self._manager.dict()
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def submit(self, path, digest=None, name=None, owner=None):
+        digest = digest or file_digest(path)
+        name = name or os.path.basename(path)
+        cached = AnalysisCache(self.cache_root).get(digest)
+        with self.lock:
+            self._purge()
+            for other in self.jobs.values():
+                other.owners.discard(owner)
+            job = self.jobs.get(self.by_digest.get(digest))
+            if job is None or job.state() in ("cancelled", "error"):
+                job_id = uuid.uuid4().hex
+                if cached is not None:
+                    cached["digest"] = digest
+                    job = Job(job_id, digest, name, result=cached)
+                else:
+                    self._start()
+                    future = self._pool.submit(_analysis_worker, job_id, path, digest, self.cache_root,
+                                               self.stages, self.cancel_requests)
+                    job = Job(job_id, digest, name, future)
+                self.jobs[job_id] = job
+                self.by_digest[digest] = job_id
+            job.owners.add(owner)
+            return job
+
+    def cancel(self, job_id, owner=None):
+        # Le travail n'est arrêté que si plus aucune session ne l'attend
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.state() not in ("pending", "running"):
+                return False
+            job.owners.discard(owner)
+            if job.owners:
+                return False
+            if not job.future.cancel():
+                self.cancel_requests[job.id] = True
+            return True
+
+    def status(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        state = job.state()
+        stage = self.stages.get(job.id) if job.future is not None else None
+        if state == "running" and stage in STAGES:
+            index = list(STAGES).index(stage)
+            label, progress = STAGES[stage], index / len(STAGES)
+        else:
+            label, progress = STATE_LABELS.get(state, ""), 1.0 if state == "done" else 0.0
+        error = job.future.exception() if state == "error" else None
+        return {
+            "state": state,
+            "done": state in ("done", "cancelled", "error"),
+            "label": label,
+            "progress": progress,
+            "seconds": (job.finished or time.time()) - job.submitted,
+            "error": f"{type(error).__name__}: {error}" if error is not None else None,
+            "name": job.name,
+        }
+
+    def result(self, job_id):
+        job = self.jobs[job_id]
+        if job.result is None:
+            job.result = job.future.result()
+        return job.result
+
+    def _purge(self):
+        # Travaux terminés depuis plus de JOB_TTL oubliés (le résultat reste dans le cache disque)
+        limit = time.time() - JOB_TTL
+        for job_id, job in list(self.jobs.items()):
+            if job.finished is not None and job.finished < limit:
+                del self.jobs[job_id]
+                if self.by_digest.get(job.digest) == job_id:
+                    del self.by_digest[job.digest]
+                if job.future is not None:
+                    self.stages.pop(job_id, None)
+                    self.cancel_requests.pop(job_id, None)
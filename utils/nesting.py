@@ -0,0 +1,388 @@
+import io
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.collections import PolyCollection
+from matplotlib.patches import Rectangle
+from matplotlib.path import Path
+
+# Nombre maximal de cellules de la grille de tôle pour l'imbrication raster
+MAX_GRID_CELLS = 250_000
+ROTATIONS = (0, 90, 180, 270)
+NESTING_TOLERANCE = 0.5
+
+
+def part_shapes(topology, tolerance=NESTING_TOLERANCE):
+    # Une pièce par contour extérieur : polygone extérieur, trous directs et aire nette
+    shapes = []
+    holes_of = {}
+    for i in topology.inner_loops:
+        holes_of.setdefault(int(topology.loop_parent[i]), []).append(int(i))
+    for i in topology.outer_loops:
+        holes = holes_of.get(int(i), [])
+        shapes.append({
+            "outline": topology.loop_polygon(i, tolerance),
+            "holes": [topology.loop_polygon(h, tolerance) for h in holes],
+            "area": float(topology.loop_area[i] - sum(topology.loop_area[h] for h in holes)),
+        })
+    return shapes
+
+
+def rotate(points, angle):
+    a = math.radians(angle)
+    c, s = math.cos(a), math.sin(a)
+    return points @ np.array([[c, s], [-s, c]])
+
+
+def placed_polygon(polygon, outline, angle, x, y):
+    # Place `polygon` (contour ou trou) selon la pièce tournée dont la boîte démarre en (x, y)
+    origin = rotate(outline, angle).min(axis=0)
+    return rotate(polygon, angle) - origin + (x, y)
+
+
+class NestingResult:
+
+    def __init__(self, placements, sheets, method, shapes, sheet_size):
+        self.placements = placements  # (tôle, pièce, angle, x, y)
+        self.sheets = sheets
+        self.method = method
+        self.shapes = shapes
+        self.sheet_size = sheet_size
+        self.solve_time = 0.0
+        self.evaluations = 0
+        self.unplaced = 0
+
+    @property
+    def yield_pct(self):
+        if not self.sheets:
+            return 0.0
+        used = sum(self.shapes[p[1]]["area"] for p in self.placements)
+        return 100.0 * used / (self.sheets * self.sheet_size[0] * self.sheet_size[1])
+
+    @property
+    def lower_bound(self):
+        # Borne basse du nombre de tôles (aire totale / aire d'une tôle)
+        used = sum(self.shapes[p[1]]["area"] for p in self.placements)
+        return max(1, math.ceil(used / (self.sheet_size[0] * self.sheet_size[1])))
+
+    def score(self):
+        # Moins de tôles d'abord, puis dernière tôle la plus compacte
+        last = [p for p in self.placements if p[0] == self.sheets - 1]
+        extent = max((p[3] + _rotated_size(self.shapes[p[1]]["outline"], p[2])[0] for p in last), default=0.0)
+        return (self.unplaced, self.sheets, extent)
+
+    def summary(self):
+        return {
+            "tôles": self.sheets,
+            "rendement (%)": round(self.yield_pct, 2),
+            "pièces placées": len(self.placements),
+            "non placées": self.unplaced,
+            "méthode": self.method,
+            "borne basse": self.lower_bound,
+            "temps de calcul (s)": round(self.solve_time, 3),
+            "évaluations": self.evaluations,
+        }
+
+
+def _rotated_size(outline, angle):
+    r = rotate(outline, angle)
+    return r.max(axis=0) - r.min(axis=0)
+
+
+def skyline_nest(shapes, items, sheet_w, sheet_h, spacing, rotations=(0, 90), deadline=None):
+    # Placement des boîtes englobantes sur une ligne d'horizon (bas-gauche), tôle après tôle.
+    # Passé l'échéance (time.time()), les pièces restantes sont posées en rangées (_shelf_nest)
+    placements = []
+    unplaced = 0
+    skylines = []  # une ligne d'horizon [(x, y, largeur)] par tôle
+    for index, shape in enumerate(items):
+        if deadline is not None and time.time() >= deadline:
+            # Rangées au-dessus du point le plus haut de la dernière tôle
+            sheet = max(len(skylines) - 1, 0)
+            top = max((y for _, y, _ in skylines[-1]), default=0.0) if skylines else 0.0
+            rest, sheets, rest_unplaced = _shelf_nest(shapes, items[index:], sheet_w, sheet_h, spacing,
+                                                      rotations, sheet, top)
+            return placements + rest, max(sheets, len(skylines)), unplaced + rest_unplaced
+        best = None
+        for angle in rotations:
+            w, h = _rotated_size(shapes[shape]["outline"], angle) + spacing
+            for sheet, skyline in enumerate(skylines + [[(0.0, 0.0, sheet_w)]]):
+                for k in range(len(skyline)):
+                    x = skyline[k][0]
+                    # L'espacement n'est pas exigé contre les bords de la tôle
+                    if x + w - spacing > sheet_w + 1e-9:
+                        break
+                    # Hauteur d'appui = plus haut segment sous la largeur de la pièce
+                    y, span, j = 0.0, 0.0, k
+                    while span < w - 1e-9 and j < len(skyline):
+                        y = max(y, skyline[j][1])
+                        span += skyline[j][2]
+                        j += 1
+                    if y + h - spacing > sheet_h + 1e-9:
+                        continue
+                    candidate = (sheet, y, x, angle, w, h)
+                    if best is None or candidate[:3] < best[:3]:
+                        best = candidate
+                if best is not None and best[0] == sheet:
+                    break
+        if best is None:
+            unplaced += 1
+            continue
+        sheet, y, x, angle, w, h = best
+        if sheet == len(skylines):
+            skylines.append([(0.0, 0.0, sheet_w)])
+        skylines[sheet] = _skyline_insert(skylines[sheet], x, y + h, w)
+        placements.append((sheet, shape, angle, x, y))
+    return placements, len(skylines), unplaced
+
+
+def _shelf_nest(shapes, items, sheet_w, sheet_h, spacing, rotations, sheet=0, y=0.0):
+    # Rangées gauche -> droite, coût constant par pièce : orientation la moins haute qui tient
+    placements = []
+    unplaced = 0
+    x, row, used = 0.0, 0.0, sheet
+    sizes = {}
+    for shape in items:
+        if shape not in sizes:
+            fits = [(h, w, angle) for angle in rotations
+                    for w, h in [_rotated_size(shapes[shape]["outline"], angle) + spacing]
+                    if w - spacing <= sheet_w + 1e-9 and h - spacing <= sheet_h + 1e-9]
+            sizes[shape] = min(fits) if fits else None
+        if sizes[shape] is None:
+            unplaced += 1
+            continue
+        h, w, angle = sizes[shape]
+        if x + w - spacing > sheet_w + 1e-9:
+            x, y, row = 0.0, y + row, 0.0
+        if y + h - spacing > sheet_h + 1e-9:
+            x, y, row, sheet = 0.0, 0.0, 0.0, sheet + 1
+        placements.append((sheet, shape, angle, x, y))
+        used = sheet
+        x += w
+        row = max(row, h)
+    return placements, used + 1 if placements else 0, unplaced
+
+
+def _skyline_insert(skyline, x, top, w):
+    result = []
+    end = x + w
+    for sx, sy, sw in skyline:
+        se = sx + sw
+        if se <= x or sx >= end:
+            result.append((sx, sy, sw))
+            continue
+        if sx < x:
+            result.append((sx, sy, x - sx))
+        if se > end:
+            result.append((end, sy, se - end))
+    result.append((x, top, w))
+    result.sort()
+    # Fusion des segments voisins de même hauteur
+    merged = [result[0]]
+    for sx, sy, sw in result[1:]:
+        px, py, pw = merged[-1]
+        if abs(py - sy) < 1e-9 and abs(px + pw - sx) < 1e-9:
+            merged[-1] = (px, py, pw + sw)
+        else:
+            merged.append((sx, sy, sw))
+    return merged
+
+
+def _dilate(mask, k):
+    # Dilatation carrée de k cellules : décalages successifs selon y puis selon x (noyau séparable
+    # (2k+1)², les voisins en diagonale reçoivent aussi tout l'espacement)
+    for _ in range(k):
+        grown = mask.copy()
+        grown[1:, :] |= mask[:-1, :]
+        grown[:-1, :] |= mask[1:, :]
+        mask = grown
+    for _ in range(k):
+        grown = mask.copy()
+        grown[:, 1:] |= mask[:, :-1]
+        grown[:, :-1] |= mask[:, 1:]
+        mask = grown
+    return mask
+
+
+def rasterize(shape, angle, resolution):
+    # Masque booléen (lignes = y, colonnes = x) de la pièce tournée, trous exclus
+    outline = rotate(shape["outline"], angle)
+    origin = outline.min(axis=0)
+    size = outline.max(axis=0) - origin
+    nx = max(1, int(math.ceil(size[0] / resolution)))
+    ny = max(1, int(math.ceil(size[1] / resolution)))
+    gx, gy = np.meshgrid((np.arange(nx) + 0.5) * resolution, (np.arange(ny) + 0.5) * resolution)
+    centers = np.column_stack((gx.ravel(), gy.ravel())) + origin
+    mask = Path(outline).contains_points(centers)
+    for hole in shape["holes"]:
+        mask &= ~Path(rotate(hole, angle)).contains_points(centers)
+    return mask.reshape(ny, nx)
+
+
+def raster_nest(shapes, items, sheet_w, sheet_h, spacing, resolution, rotations=ROTATIONS, deadline=None):
+    # Imbrication polygonale sur grille : les trous des pièces restent utilisables.
+    # None si l'échéance (time.time()) tombe avant que toutes les pièces soient posées
+    nx, ny = int(sheet_w // resolution), int(sheet_h // resolution)
+    # Les pièces posées sont dilatées de l'espacement (+1 cellule pour l'erreur de rastérisation)
+    grow = int(math.ceil(spacing / resolution)) + 1
+    kernels = {}
+
+    def kernel(shape, angle):
+        key = (shape, angle)
+        if key not in kernels:
+            mask = rasterize(shapes[shape], angle, resolution)
+            fft = None
+            if mask.shape[0] <= ny and mask.shape[1] <= nx:
+                padded = np.zeros((ny, nx))
+                padded[: mask.shape[0], : mask.shape[1]] = mask
+                fft = np.conj(np.fft.rfft2(padded))
+            kernels[key] = (mask, fft, _dilate(np.pad(mask, grow), grow))
+        return kernels[key]
+
+    sheets = []
+    placements = []
+    unplaced = 0
+    for shape in items:
+        if deadline is not None and time.time() >= deadline:
+            return None
+        for index in range(len(sheets) + 1):
+            if index == len(sheets):
+                sheets.append(np.zeros((ny, nx)))
+            occupied = sheets[index]
+            occupied_fft = np.fft.rfft2(occupied)
+            best = None
+            for angle in rotations:
+                mask, fft, grown = kernel(shape, angle)
+                if fft is None:
+                    continue
+                # Recouvrement pour toutes les positions d'un coup (corrélation par FFT)
+                overlap = np.fft.irfft2(occupied_fft * fft, s=occupied.shape)
+                valid = overlap[: ny - mask.shape[0] + 1, : nx - mask.shape[1] + 1] < 0.5
+                cols = np.nonzero(valid.any(axis=0))[0]
+                if len(cols) == 0:
+                    continue
+                # Bas-gauche : colonne la plus à gauche puis ligne la plus basse
+                pos = (int(cols[0]), int(np.argmax(valid[:, cols[0]])))
+                if best is None or pos < best[0]:
+                    best = (pos, angle, grown)
+            if best is None:
+                if not occupied.any():
+                    # Pièce plus grande que la tôle
+                    sheets.pop()
+                    unplaced += 1
+                    break
+                continue
+            (x, y), angle, grown = best
+            _stamp(occupied, grown, x - grow, y - grow)
+            placements.append((index, shape, angle, x * resolution, y * resolution))
+            break
+    return placements, len(sheets), unplaced
+
+
+def _stamp(occupied, mask, x, y):
+    # Ajoute `mask` à la grille en (x, y), rogné aux bords de la tôle
+    ny, nx = occupied.shape
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + mask.shape[1], nx), min(y + mask.shape[0], ny)
+    occupied[y0:y1, x0:x1] += mask[y0 - y: y1 - y, x0 - x: x1 - x]
+
+
+def _search_worker(shapes, items, sheet_w, sheet_h, spacing, resolution, rotations, deadline, seed):
+    # Ordres d'insertion aléatoires (aire décroissante perturbée) jusqu'à l'échéance ;
+    # une passe interrompue est abandonnée, None si aucune n'a abouti à temps
+    rng = random.Random(seed)
+    best, evaluations = None, 0
+    order = sorted(items, key=lambda s: -shapes[s]["area"])
+    while True:
+        candidate = list(order)
+        if evaluations or seed:
+            for _ in range(max(1, len(candidate) // 4)):
+                i, j = rng.randrange(len(candidate)), rng.randrange(len(candidate))
+                candidate[i], candidate[j] = candidate[j], candidate[i]
+        angles = tuple(rng.sample(rotations, len(rotations))) if evaluations or seed else rotations
+        nested = raster_nest(shapes, candidate, sheet_w, sheet_h, spacing, resolution, angles, deadline)
+        if nested is None:
+            break
+        placements, sheets, unplaced = nested
+        result = NestingResult(placements, sheets, "polygone (raster)", shapes, (sheet_w, sheet_h))
+        result.unplaced = unplaced
+        evaluations += 1
+        if best is None or result.score() < best.score():
+            best = result
+        if time.time() >= deadline:
+            break
+    if best is None:
+        return None
+    return best.placements, best.sheets, best.unplaced, evaluations
+
+
+def nest_parts(shapes, quantity, sheet_w, sheet_h, spacing=5.0, time_budget=5.0, workers=None,
+               rotations=ROTATIONS, resolution=None):
+    start = time.time()
+    items = [i for i in range(len(shapes)) for _ in range(int(quantity))]
+
+    # 1. Solution de référence : boîtes englobantes sur ligne d'horizon, bornée par le budget
+    placements, sheets, unplaced = skyline_nest(shapes, items, sheet_w, sheet_h, spacing,
+                                                deadline=start + time_budget)
+    best = NestingResult(placements, sheets, "boîtes (skyline)", shapes, (sheet_w, sheet_h))
+    best.unplaced = unplaced
+    best.evaluations = 1
+
+    # 2. Imbrication polygonale raster, recherche parallèle dans le budget de temps
+    if resolution is None:
+        resolution = max(1.0, math.sqrt(sheet_w * sheet_h / MAX_GRID_CELLS))
+    remaining = time_budget - (time.time() - start)
+    if items and remaining > 0:
+        deadline = time.time() + remaining
+        workers = workers or max(1, min(4, os.cpu_count() or 1))
+        args = (shapes, items, sheet_w, sheet_h, spacing, resolution, tuple(rotations), deadline)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_search_worker, *args, seed) for seed in range(workers)]
+            for future in futures:
+                found = future.result()
+                if found is None:
+                    # Budget trop court pour une passe raster complète : la solution skyline reste
+                    continue
+                placements, sheets, unplaced, evaluations = found
+                result = NestingResult(placements, sheets, "polygone (raster)", shapes, (sheet_w, sheet_h))
+                result.unplaced = unplaced
+                best.evaluations += evaluations
+                if result.score() < best.score():
+                    result.evaluations = best.evaluations
+                    best = result
+    best.solve_time = time.time() - start
+    return best
+
+
+def render_layout(result, max_sheets=6, width_px=900):
+    # Aperçu PNG des premières tôles, côte à côte
+    sheet_w, sheet_h = result.sheet_size
+    shown = max(1, min(result.sheets, max_sheets))
+    fig = Figure(figsize=(width_px / 100, max(2.0, width_px / 100 * sheet_h / (sheet_w * shown) + 0.8)), dpi=100)
+    ax = fig.add_subplot()
+    gap = sheet_w * 0.05
+    polygons, holes = [], []
+    for sheet, shape, angle, x, y in result.placements:
+        if sheet >= shown:
+            continue
+        outline = result.shapes[shape]["outline"]
+        offset = x + sheet * (sheet_w + gap)
+        polygons.append(placed_polygon(outline, outline, angle, offset, y))
+        holes.extend(placed_polygon(h, outline, angle, offset, y) for h in result.shapes[shape]["holes"])
+    for k in range(shown):
+        ax.add_patch(Rectangle((k * (sheet_w + gap), 0), sheet_w, sheet_h, fill=False, edgecolor="black"))
+    ax.add_collection(PolyCollection(polygons, facecolors="#f39c12", edgecolors="#7f4b00", linewidths=0.5))
+    ax.add_collection(PolyCollection(holes, facecolors="white", edgecolors="#7f4b00", linewidths=0.5))
+    ax.set_xlim(-gap, shown * (sheet_w + gap))
+    ax.set_ylim(-gap, sheet_h + gap)
+    ax.set_aspect("equal")
+    ax.set_title(f"Imbrication : {result.sheets} tôle(s), rendement {result.yield_pct:.1f} %")
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png")
+    return buffer.getvalue()
+
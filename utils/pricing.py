@@ -0,0 +1,199 @@
+import copy
+
+import numpy as np
+
+MATERIALS = ["Acier", "Alu", "Inox"]
+
+# Paramètres dynamiques d'une machine, rangés sous cette clé à côté de ses tables de vitesses :
+#   percage       : {épaisseur (mm): temps d'amorçage (s)}, interpolé comme les vitesses
+#   acceleration  : accélération de la tête (mm/s²)
+#   vitesse_rayon : {rayon (mm): fraction de la vitesse nominale tenue sur un arc de ce rayon}
+DYNAMICS = "dynamique"
+DEFAULT_DYNAMICS = {
+    "percage": {1.0: 0.1, 3.0: 0.3, 6.0: 1.0, 10.0: 2.5, 20.0: 8.0},
+    "acceleration": 5000.0,
+    "vitesse_rayon": {1.0: 0.3, 3.0: 0.5, 10.0: 0.8, 25.0: 1.0},
+}
+
+# Vitesses de coupe (mm/s) par machine, matière et épaisseur (mm) ; interpolées linéairement
+# entre les points et bornées aux extrémités. Les anciennes valeurs uniques correspondent à 3 mm.
+DEFAULT_MACHINES = {
+    "Machine A": {
+        "Acier": {1.0: 35.0, 3.0: 20.0, 6.0: 11.0, 10.0: 6.0, 20.0: 2.0},
+        "Alu": {1.0: 70.0, 3.0: 40.0, 6.0: 20.0, 10.0: 9.0, 20.0: 3.0},
+        "Inox": {1.0: 28.0, 3.0: 15.0, 6.0: 7.0, 10.0: 3.5, 20.0: 1.2},
+        DYNAMICS: {"percage": {1.0: 0.1, 3.0: 0.3, 6.0: 1.0, 10.0: 2.5, 20.0: 8.0}, "acceleration": 5000.0,
+                   "vitesse_rayon": {1.0: 0.3, 3.0: 0.5, 10.0: 0.8, 25.0: 1.0}},
+    },
+    "Machine B": {
+        "Acier": {1.0: 45.0, 3.0: 25.0, 6.0: 14.0, 10.0: 8.0, 20.0: 3.0},
+        "Alu": {1.0: 60.0, 3.0: 35.0, 6.0: 18.0, 10.0: 8.0, 20.0: 2.5},
+        "Inox": {1.0: 36.0, 3.0: 20.0, 6.0: 10.0, 10.0: 5.0, 20.0: 1.8},
+        DYNAMICS: {"percage": {1.0: 0.08, 3.0: 0.25, 6.0: 0.8, 10.0: 2.0, 20.0: 6.0}, "acceleration": 8000.0,
+                   "vitesse_rayon": {1.0: 0.35, 3.0: 0.55, 10.0: 0.85, 25.0: 1.0}},
+    },
+    "Machine C": {
+        "Acier": {1.0: 32.0, 3.0: 18.0, 6.0: 10.0, 10.0: 5.5, 20.0: 1.8},
+        "Alu": {1.0: 52.0, 3.0: 30.0, 6.0: 15.0, 10.0: 7.0, 20.0: 2.0},
+        "Inox": {1.0: 22.0, 3.0: 12.0, 6.0: 6.0, 10.0: 3.0, 20.0: 1.0},
+        DYNAMICS: {"percage": {1.0: 0.15, 3.0: 0.4, 6.0: 1.3, 10.0: 3.0, 20.0: 10.0}, "acceleration": 3000.0,
+                   "vitesse_rayon": {1.0: 0.25, 3.0: 0.45, 10.0: 0.75, 25.0: 1.0}},
+    },
+}
+
+TARIF_SECONDE = 0.068  # € par seconde de coupe
+QUANTITY_BREAKS = [1, 10, 50, 100, 500]
+# Aire nette nulle d'un DXF : contours ouverts, la matière n'est pas chiffrée
+ZERO_AREA_WARNING = "aire nette nulle (contours ouverts) : matière non chiffrée"
+
+# Densité (g/cm³), prix (€/kg) et résistance (MPa) de chaque matière
+MATERIAL_PROPERTIES = {
+    "Acier": {"densite": 7.85, "prix_kg": 0.80, "resistance": 250},
+    "Alu": {"densite": 2.7, "prix_kg": 1.50, "resistance": 150},
+    "Inox": {"densite": 8.0, "prix_kg": 2.00, "resistance": 200},
+}
+
+
+def default_machines():
+    return copy.deepcopy(DEFAULT_MACHINES)
+
+
+def machine_materials(tables):
+    # Matières d'une machine (ses tables de vitesses, sans les paramètres dynamiques)
+    return [m for m in tables if m != DYNAMICS]
+
+
+def machine_dynamics(machines_config, machine):
+    # Paramètres dynamiques de la machine ; valeurs par défaut pour les réglages absents
+    # (configurations enregistrées avant l'introduction du modèle de temps)
+    defaults = DEFAULT_MACHINES.get(machine, {}).get(DYNAMICS, DEFAULT_DYNAMICS)
+    return {**defaults, **machines_config.get(machine, {}).get(DYNAMICS, {})}
+
+
+def interpolate(table, x):
+    # Table {x: y} (ou valeur unique) évaluée en x, bornée aux extrémités
+    points, values = _curve(table)
+    return np.interp(x, points, values)
+
+
+def _curve(table):
+    # Table {épaisseur: vitesse} ou vitesse unique (ancien format, indépendante de l'épaisseur)
+    if isinstance(table, dict):
+        points = sorted((float(t), float(v)) for t, v in table.items())
+        return np.array([p[0] for p in points]), np.array([p[1] for p in points])
+    return np.array([0.0]), np.array([float(table)])
+
+
+def speed_grid(machines_config, machines, materials, thicknesses):
+    # Vitesses (M, Mat, T) ; NaN si la machine ne coupe pas la matière
+    thicknesses = np.asarray(thicknesses, dtype=np.float64)
+    grid = np.full((len(machines), len(materials), len(thicknesses)), np.nan)
+    for i, machine in enumerate(machines):
+        for j, material in enumerate(materials):
+            table = machines_config.get(machine, {}).get(material)
+            if table is None or table == {}:
+                # Table absente ou vidée : la machine ne coupe pas la matière
+                continue
+            x, y = _curve(table)
+            grid[i, j] = np.interp(thicknesses, x, y)
+    return grid
+
+
+def speed_at(machines_config, machine, material, thickness):
+    return float(speed_grid(machines_config, [machine], [material], [thickness])[0, 0, 0])
+
+
+def material_grid(areas, materials=None, thicknesses=(3.0,), properties=MATERIAL_PROPERTIES):
+    # Masse (kg) et coût matière (€) de N pièces d'aire nette donnée (mm²) : tableaux (N, Mat, T)
+    # mm² × mm × g/cm³ -> kg : facteur 1e-6
+    materials = MATERIALS if materials is None else list(materials)
+    areas = np.asarray(areas, dtype=np.float64).reshape(-1, 1, 1)
+    thicknesses = np.asarray(thicknesses, dtype=np.float64).reshape(1, 1, -1)
+    density = np.array([properties[m]["densite"] for m in materials]).reshape(1, -1, 1)
+    price = np.array([properties[m]["prix_kg"] for m in materials]).reshape(1, -1, 1)
+    mass = areas * thicknesses * density * 1e-6
+    return {"mass": mass, "cost": mass * price}
+
+
+def material_cost(area, material, thickness, properties=MATERIAL_PROPERTIES):
+    grid = material_grid([area], [material], [thickness], properties)
+    return {"masse": float(grid["mass"][0, 0, 0]), "cout_matiere": float(grid["cost"][0, 0, 0])}
+
+
+def quote_grid(machines_config, cut_length, quantities, machines=None, materials=None, thicknesses=(3.0,),
+               rapid_distance=0.0, rapid_speed=None, material_cost=0.0, tarif_seconde=TARIF_SECONDE,
+               fixed_costs=0.0, cycle_time=None):
+    # Évalue toute la grille machine × matière × épaisseur × quantité en une fois.
+    # material_cost : € par pièce, scalaire ou tableau diffusable en (Mat, T)
+    # cycle_time    : fonction optionnelle (vitesse (M, Mat, T), machines, épaisseurs) -> temps de coupe
+    #                 par pièce (s), à la place de cut_length / vitesse (cf. utils.cut_time)
+    # fixed_costs   : frais par commande (sous-traitance, transport…), répartis sur la quantité
+    machines = list(machines_config) if machines is None else list(machines)
+    materials = MATERIALS if materials is None else list(materials)
+    speed = speed_grid(machines_config, machines, materials, thicknesses)
+    quantities = np.asarray(quantities, dtype=np.float64)
+
+    if cycle_time is not None:
+        seconds = cycle_time(speed, machines, np.asarray(thicknesses, dtype=np.float64))
+    else:
+        seconds = cut_length / speed
+    if rapid_speed:
+        seconds = seconds + rapid_distance / rapid_speed
+    cut_cost = seconds * tarif_seconde
+    unit = cut_cost + np.broadcast_to(np.asarray(material_cost, dtype=np.float64), speed.shape[1:])
+    total = unit[..., None] * quantities + fixed_costs
+    return {
+        "machines": machines,
+        "materials": materials,
+        "thicknesses": np.asarray(thicknesses, dtype=np.float64),
+        "quantities": quantities,
+        "speed": speed,                          # (M, Mat, T)
+        "seconds": seconds,                      # (M, Mat, T) par pièce
+        "cut_cost": cut_cost,                    # (M, Mat, T) par pièce
+        "unit": unit,                            # (M, Mat, T) hors frais fixes
+        "total": total,                          # (M, Mat, T, Q)
+        "unit_price": total / quantities,        # (M, Mat, T, Q) frais fixes répartis
+        "batch_seconds": seconds[..., None] * quantities,
+    }
+
+
+def ranked_table(grid, material=None, thickness=None, quantity=None):
+    # Tableau comparatif trié par prix total (puis par temps), filtrable
+    m, k, t, q = np.meshgrid(*(np.arange(n) for n in grid["total"].shape), indexing="ij")
+    rows = np.column_stack((m.ravel(), k.ravel(), t.ravel(), q.ravel()))
+    valid = np.isfinite(grid["total"]).ravel()
+    if material is not None:
+        valid &= np.asarray(grid["materials"])[rows[:, 1]] == material
+    if thickness is not None:
+        valid &= np.isclose(grid["thicknesses"][rows[:, 2]], thickness)
+    if quantity is not None:
+        valid &= grid["quantities"][rows[:, 3]] == quantity
+    rows = rows[valid]
+    total = grid["total"][tuple(rows.T)]
+    batch = grid["batch_seconds"][tuple(rows.T)]
+    rows = rows[np.lexsort((batch, total))]
+    fastest = batch.min() if len(batch) else None
+    return [{
+        "Rang": rank + 1,
+        "Machine": grid["machines"][i],
+        "Matière": grid["materials"][j],
+        "Épaisseur (mm)": float(grid["thicknesses"][k]),
+        "Quantité": int(grid["quantities"][q]),
+        "Vitesse (mm/s)": round(float(grid["speed"][i, j, k]), 3),
+        "Temps/pièce (s)": round(float(grid["seconds"][i, j, k]), 2),
+        "Prix unitaire (€)": round(float(grid["unit_price"][i, j, k, q]), 2),
+        "Prix total (€)": round(float(grid["total"][i, j, k, q]), 2),
+        "Plus rapide": bool(np.isclose(grid["batch_seconds"][i, j, k, q], fastest)) if quantity is not None else False,
+    } for rank, (i, j, k, q) in enumerate(rows)]
+
+
+def quote(machines_config, machine, material, thickness, quantity, cut_length, **kwargs):
+    # Devis d'une seule combinaison : même moteur que la grille
+    grid = quote_grid(machines_config, cut_length, [quantity], [machine], [material], [thickness], **kwargs)
+    return {
+        "vitesse": float(grid["speed"][0, 0, 0]),
+        "temps_coupe_sec": float(grid["seconds"][0, 0, 0]),
+        "cout_coupe": float(grid["cut_cost"][0, 0, 0]),
+        "total_unitaire": float(grid["unit"][0, 0, 0]),
+        "prix_total": float(grid["total"][0, 0, 0, 0]),
+    }
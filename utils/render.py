@@ -0,0 +1,153 @@
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from matplotlib.colors import to_rgba_array
+from matplotlib.figure import Figure
+from matplotlib.patches import PathPatch
+from matplotlib.path import Path
+
+from utils.geometry import bulge_centers, flatten_arcs
+
+# Couleurs historiques de plot_dxf, dans l'ordre de KIND_LABELS
+KIND_COLORS = to_rgba_array(["blue", "orange", "green", "red", "red", "red"])
+
+# Au-delà de ce nombre d'entités, la géométrie est simplifiée à la résolution de sortie
+LOD_THRESHOLD = 20000
+PREVIEW_WIDTH_PX = 900
+PREVIEW_DPI = 100
+PREVIEW_CACHE_SIZE = 32
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def geometry_fingerprint(geometry):
+    h = hashlib.sha1()
+    for array in geometry.arrays().values():
+        h.update(np.ascontiguousarray(array).tobytes())
+    return h.hexdigest()
+
+
+def geometry_pieces(geometry, tolerance):
+    # Toute la géométrie en segments droits (M, 2, 2) + type d'entité de chaque morceau
+    seg = np.asarray(geometry.segments)
+    kinds = np.asarray(geometry.kinds)
+    seg_kind = kinds[np.asarray(geometry.segment_owner)]
+    curved = np.abs(seg[:, 4]) > 1e-12
+
+    straight = seg[~curved][:, :4].reshape(-1, 2, 2)
+    straight_kind = seg_kind[~curved]
+
+    arcs = seg[curved]
+    cx, cy, radius = bulge_centers(arcs)
+    start = np.arctan2(arcs[:, 1] - cy, arcs[:, 0] - cx)
+    sweep = 4.0 * np.arctan(arcs[:, 4])
+    arc_pieces, arc_index = flatten_arcs(cx, cy, radius, start, sweep, tolerance)
+
+    circles = np.asarray(geometry.circles)
+    n = len(circles)
+    circle_pieces, circle_index = flatten_arcs(circles[:, 0], circles[:, 1], circles[:, 2],
+                                                np.zeros(n), np.full(n, 2.0 * np.pi), tolerance)
+    circle_kind = kinds[np.asarray(geometry.circle_owner)]
+
+    return (straight, straight_kind,
+            np.concatenate((arc_pieces, circle_pieces)),
+            np.concatenate((seg_kind[curved][arc_index], circle_kind[circle_index])))
+
+
+def clip_pieces(pieces, kinds, box):
+    # Morceaux (M, 2, 2) ramenés à la boîte (xmin, ymin, xmax, ymax) par Liang-Barsky vectorisé ;
+    # ceux qui n'y entrent pas sont retirés
+    if len(pieces) == 0:
+        return pieces, kinds
+    start = pieces[:, 0]
+    delta = pieces[:, 1] - start
+    t0, t1 = np.zeros(len(pieces)), np.ones(len(pieces))
+    keep = np.ones(len(pieces), dtype=bool)
+    for p, q in ((-delta[:, 0], start[:, 0] - box[0]), (delta[:, 0], box[2] - start[:, 0]),
+                 (-delta[:, 1], start[:, 1] - box[1]), (delta[:, 1], box[3] - start[:, 1])):
+        parallel = p == 0
+        keep &= ~(parallel & (q < 0))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            r = np.where(parallel, 0.0, q / np.where(parallel, 1.0, p))
+        t0 = np.where(~parallel & (p < 0), np.maximum(t0, r), t0)
+        t1 = np.where(~parallel & (p > 0), np.minimum(t1, r), t1)
+    keep &= t0 <= t1
+    clipped = np.stack((start + t0[:, None] * delta, start + t1[:, None] * delta), axis=1)
+    return clipped[keep], kinds[keep]
+
+
+def decimate(pieces, kinds, pixel, origin):
+    # Niveau de détail : les morceaux qui tombent sur les mêmes pixels ne sont tracés qu'une fois.
+    # Les morceaux doivent tenir dans 0xFFFF pixels depuis l'origine (cf. clip_pieces) : au-delà,
+    # les extrémités écrêtées se confondraient.
+    if len(pieces) == 0:
+        return pieces, kinds
+    cells = np.floor((pieces - origin) / pixel).astype(np.int64).reshape(-1, 4)
+    cells = np.clip(cells, 0, 0xFFFF)
+    # Orientation canonique pour fusionner A→B et B→A
+    a = (cells[:, 0] << 16) | cells[:, 1]
+    b = (cells[:, 2] << 16) | cells[:, 3]
+    keys = (np.minimum(a, b) << 32) | np.maximum(a, b)
+    _, keep = np.unique(keys, return_index=True)
+    return pieces[keep], kinds[keep]
+
+
+def _compound_path(pieces):
+    codes = np.tile(np.array([Path.MOVETO, Path.LINETO], dtype=Path.code_type), len(pieces))
+    return Path(pieces.reshape(-1, 2), codes)
+
+
+def draw_pieces(ax, pieces, kinds, linewidth=1.0):
+    # Un seul chemin composé par type d'entité : matplotlib ne crée pas un objet Path par segment
+    for kind in np.unique(kinds):
+        # add_artist plutôt que add_patch : pas de calcul de limites segment par segment
+        ax.add_artist(PathPatch(_compound_path(pieces[kinds == kind]), fill=False,
+                                edgecolor=KIND_COLORS[kind], linewidth=linewidth))
+
+
+def draw_geometry(ax, geometry, width_px=PREVIEW_WIDTH_PX, lod_threshold=LOD_THRESHOLD):
+    xmin, ymin, xmax, ymax = geometry.bounds()
+    pixel = max(xmax - xmin, ymax - ymin, 1e-9) / width_px
+    straight, straight_kind, curved, curved_kind = geometry_pieces(geometry, tolerance=pixel / 2.0)
+    if geometry.n_entities > lod_threshold:
+        origin = np.array([xmin, ymin])
+        straight, straight_kind = decimate(straight, straight_kind, pixel, origin)
+        curved, curved_kind = decimate(curved, curved_kind, pixel, origin)
+
+    draw_pieces(ax, np.concatenate((straight, curved)), np.concatenate((straight_kind, curved_kind)))
+
+    if xmax > xmin or ymax > ymin:
+        margin = max(xmax - xmin, ymax - ymin) * 0.02
+        ax.set_xlim(xmin - margin, xmax + margin)
+        ax.set_ylim(ymin - margin, ymax + margin)
+    ax.set_aspect("equal")
+    ax.set_title("Aperçu DXF")
+
+
+def render_geometry(geometry, fmt="png", width_px=PREVIEW_WIDTH_PX, lod_threshold=LOD_THRESHOLD, key=None):
+    # Rendu hors écran (sans pyplot) vers PNG/SVG, mémorisé par empreinte de géométrie
+    key = (key or geometry_fingerprint(geometry), fmt, width_px, lod_threshold)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    xmin, ymin, xmax, ymax = geometry.bounds()
+    ratio = (ymax - ymin) / (xmax - xmin) if xmax > xmin else 1.0
+    width_in = width_px / PREVIEW_DPI
+    fig = Figure(figsize=(width_in, max(2.0, min(width_in * ratio, 2.0 * width_in))), dpi=PREVIEW_DPI)
+    fig.subplots_adjust(left=0.06, right=0.98, bottom=0.05, top=0.93)
+    draw_geometry(fig.add_subplot(), geometry, width_px, lod_threshold)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=fmt)
+    data = buffer.getvalue()
+
+    with _cache_lock:
+        _cache[key] = data
+        while len(_cache) > PREVIEW_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return data
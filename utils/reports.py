@@ -0,0 +1,182 @@
+import contextvars
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from fpdf import FPDF
+from fpdf.enums import XPos, YPos
+from matplotlib.figure import Figure
+
+from utils.instrumentation import instrumented
+
+# Rendus lourds (PDF, rastérisation d'aperçus) hors du thread du script Streamlit
+RENDER_WORKERS = int(os.environ.get("PARTLAB_RENDER_WORKERS", "2"))
+# Polices standard (Helvetica) : jeu WinAnsi, qui couvre € et les tirets, pas les emojis
+PDF_ENCODING = "cp1252"
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def render_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=RENDER_WORKERS, thread_name_prefix="partlab-render")
+        return _pool
+
+
+def submit_render(fn, *args, **kwargs):
+    # Le contexte (utilisateur, onglet) suit le rendu dans le thread du pool
+    return render_pool().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def pdf_text(text):
+    # Caractères hors WinAnsi (emojis) retirés
+    return text.encode(PDF_ENCODING, "ignore").decode(PDF_ENCODING).strip()
+
+
+class ReportPDF(FPDF):
+    # fpdf2 : PDF et images entièrement en mémoire, aucun fichier temporaire
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.core_fonts_encoding = PDF_ENCODING
+
+    def text_line(self, text, h=8, **kwargs):
+        self.cell(0, h, text=pdf_text(text), new_x=XPos.LMARGIN, new_y=YPos.NEXT, **kwargs)
+
+    def row(self, cells, widths, h=7, bold=False):
+        self.set_font("Helvetica", "B" if bold else "", 10)
+        for i, (text, width) in enumerate(zip(cells, widths)):
+            last = i == len(cells) - 1
+            self.cell(width, h, text=pdf_text(str(text)), border=1,
+                      new_x=XPos.LMARGIN if last else XPos.RIGHT, new_y=YPos.NEXT if last else YPos.TOP,
+                      align="L" if i == 0 else "R")
+        self.set_font("Helvetica", "", 12)
+
+    def png(self, data, w=0, h=0):
+        # fpdf2 garde les images par contenu : un aperçu répété n'est intégré qu'une fois
+        self.image(io.BytesIO(data), w=w, h=h)
+
+    def to_bytes(self):
+        return bytes(self.output())
+
+
+def image_png(pixels, width_px=900):
+    # Tableau (H, W, 3|4) -> PNG, sans pyplot (utilisable depuis un thread)
+    height, width = pixels.shape[:2]
+    dpi = 100
+    fig = Figure(figsize=(width_px / dpi, width_px * height / width / dpi), dpi=dpi)
+    ax = fig.add_axes((0, 0, 1, 1))
+    ax.imshow(pixels)
+    ax.set_axis_off()
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=dpi)
+    return buffer.getvalue()
+
+
+def _quote_page(pdf, devis, postes=(), preview=None):
+    pdf.add_page()
+    pdf.set_font("Helvetica", "B", 14)
+    pdf.text_line(f"Devis – Réf : {devis['ref']}", h=10)
+    pdf.set_font("Helvetica", "", 12)
+    pdf.text_line(f"Désignation : {devis['designation']}")
+    pdf.text_line(f"Quantité : {devis['quantite']}")
+    pdf.text_line(f"Matière : {devis['matiere']} | Épaisseur : {devis['epaisseur']} mm")
+    pdf.text_line(f"Dim : {devis['longueur']} x {devis['largeur']} mm")
+    if devis.get("masse") is not None:
+        pdf.text_line(f"Aire nette : {devis['aire']:.0f} mm² | Masse : {devis['masse']:.3f} kg")
+    pdf.text_line(f"Machine : {devis['machine']} (vitesse : {devis['vitesse_coupe']} mm/s)")
+    pdf.text_line(f"Périmètre total : {devis['perimetre_total']:.2f} mm")
+    if devis["deplacements"] is not None:
+        pdf.text_line(f"Déplacements à vide : {devis['deplacements']:.2f} mm")
+    pdf.text_line(f"Temps découpe estimé : {devis['temps_coupe_sec']:.2f} sec")
+    if devis.get("amorcages"):
+        # Absent des devis enregistrés avant le modèle de temps par segment
+        pdf.text_line(f"Amorçages : {devis['amorcages']}")
+
+    pdf.ln(3)
+    pdf.set_font("Helvetica", "B", 12)
+    pdf.text_line("Détail du chiffrage")
+    quantite = devis["quantite"]
+    widths = (90, 30, 30, 40)
+    pdf.row(("Poste", "Unitaire (€)", "Quantité", "Montant (€)"), widths, bold=True)
+    pdf.row(("Matière", f"{devis['prix_matiere']:.2f}", quantite, f"{devis['prix_matiere'] * quantite:.2f}"), widths)
+    pdf.row(("Découpe", f"{devis['cout_coupe']:.2f}", quantite, f"{devis['cout_coupe'] * quantite:.2f}"), widths)
+    pdf.row(("Sous-traitance", "", "", f"{devis['sous_traitance']:.2f}"), widths)
+    pdf.row(("Transport", "", "", f"{devis['transport']:.2f}"), widths)
+    pdf.row(("Total devis", f"{devis['total_unitaire']:.2f}", quantite, f"{devis['prix_total_final']:.2f}"),
+            widths, bold=True)
+    meilleure_option = devis.get("meilleure_option")
+    if meilleure_option is not None and meilleure_option["Machine"] != devis["machine"]:
+        pdf.text_line(f"Option la moins chère : {meilleure_option['Machine']} "
+                      f"({meilleure_option['Prix total (€)']:.2f} €)")
+
+    if postes:
+        pdf.ln(3)
+        pdf.set_font("Helvetica", "B", 12)
+        pdf.text_line("Postes supplémentaires (hors total)")
+        widths = (90, 30, 30, 40)
+        pdf.row(("Poste", "Durée (min)", "€/min", "Coût (€)"), widths, bold=True)
+        for poste in postes:
+            pdf.row((poste["Poste"], poste["Durée (min)"], f"{poste['Tarif €/min']:.2f}",
+                     f"{poste['Coût total (€)']:.2f}"), widths)
+        pdf.row(("Total postes", "", "", f"{sum(p['Coût total (€)'] for p in postes):.2f}"), widths, bold=True)
+
+    if preview is not None:
+        pdf.ln(3)
+        pdf.png(preview, w=120)
+
+
+@instrumented("pdf_export")
+def quote_pdf(devis, postes=(), preview=None):
+    pdf = ReportPDF()
+    _quote_page(pdf, devis, postes, preview)
+    return pdf.to_bytes()
+
+
+@instrumented("pdf_export")
+def drawing_pdf(pixels=None):
+    pdf = ReportPDF()
+    pdf.add_page()
+    pdf.set_font("Helvetica", size=12)
+    if pixels is None:
+        pdf.cell(200, 10, text=pdf_text("Dessin exporté – formes non visibles"),
+                 new_x=XPos.LMARGIN, new_y=YPos.NEXT, align="C")
+    else:
+        pdf.cell(200, 10, text=pdf_text("Dessin exporté"), new_x=XPos.LMARGIN, new_y=YPos.NEXT, align="C")
+        pdf.png(image_png(pixels), w=190)
+    return pdf.to_bytes()
+
+
+@instrumented("pdf_export")
+def bom_pdf(priced, summary, previews=None):
+    # Devis groupé d'une nomenclature : page de synthèse puis une page par ligne chiffrée.
+    # previews : {fichier DXF: PNG} facultatif, un aperçu par pièce
+    pdf = ReportPDF()
+    pdf.add_page()
+    pdf.set_font("Helvetica", "B", 14)
+    pdf.text_line("Devis groupé – nomenclature", h=10)
+    pdf.set_font("Helvetica", "", 12)
+    pdf.text_line(f"Lignes chiffrées : {summary['chiffrees']} / {summary['lignes']} | "
+                  f"Pièces : {summary['pieces']} | Masse : {summary['masse']:.2f} kg")
+    pdf.text_line(f"Temps de découpe total : {summary['temps'] / 60:.1f} min | "
+                  f"Total : {summary['total']:.2f} €")
+    pdf.ln(3)
+    widths = (14, 46, 22, 26, 30, 20, 32)
+    pdf.row(("Ligne", "Réf", "Qté", "Matière", "Machine", "Ép.", "Total (€)"), widths, bold=True)
+    for p in priced:
+        devis = p["devis"]
+        if devis is None:
+            pdf.row((p["ligne"], p["fichier"][:24], "", "", p["erreur"][:16], "", ""), widths)
+        else:
+            pdf.row((p["ligne"], str(devis["ref"])[:24], devis["quantite"], devis["matiere"], devis["machine"],
+                     devis["epaisseur"], f"{devis['prix_total_final']:.2f}"), widths)
+    pdf.row(("Total", "", summary["pieces"], "", "", "", f"{summary['total']:.2f}"), widths, bold=True)
+    previews = previews or {}
+    for p in priced:
+        if p["devis"] is not None:
+            _quote_page(pdf, p["devis"], preview=previews.get(p["fichier"]))
+    return pdf.to_bytes()
@@ -0,0 +1,224 @@
+import hashlib
+import io
+import json
+import math
+
+import ezdxf
+import numpy as np
+
+from utils.instrumentation import instrumented
+
+# Tolérance de simplification des tracés à main levée (unités du canevas, 1 px = 1 mm)
+SIMPLIFY_TOLERANCE = 0.5
+CURVE_STEPS = 8  # points par courbe de Bézier avant simplification
+
+
+def rdp(points, tolerance=SIMPLIFY_TOLERANCE):
+    # Ramer–Douglas–Peucker itératif ; la distance au segment est calculée d'un bloc par intervalle
+    points = np.asarray(points, dtype=np.float64)
+    if len(points) < 3:
+        return points
+    keep = np.zeros(len(points), dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        a, b = points[first], points[last]
+        inner = points[first + 1: last]
+        ab = b - a
+        norm = math.hypot(*ab)
+        if norm == 0.0:
+            d = np.hypot(*(inner - a).T)
+        else:
+            d = np.abs(ab[0] * (inner[:, 1] - a[1]) - ab[1] * (inner[:, 0] - a[0])) / norm
+        i = int(np.argmax(d))
+        if d[i] > tolerance:
+            split = first + 1 + i
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return points[keep]
+
+
+def object_matrix(obj):
+    # Matrice 3x3 (coordonnées locales centrées -> canevas), comme calcTransformMatrix de fabric.js
+    sx = obj.get("scaleX", 1.0) * (-1.0 if obj.get("flipX") else 1.0)
+    sy = obj.get("scaleY", 1.0) * (-1.0 if obj.get("flipY") else 1.0)
+    angle = math.radians(obj.get("angle", 0.0))
+    cos, sin = math.cos(angle), math.sin(angle)
+    # left/top désignent le point d'origine (originX/originY) de la boîte englobante, trait compris
+    stroke = obj.get("strokeWidth", 0.0) if obj.get("stroke") else 0.0
+    w = (obj.get("width", 0.0) + stroke) * abs(sx)
+    h = (obj.get("height", 0.0) + stroke) * abs(sy)
+    origin = {"left": 0.0, "center": 0.5, "right": 1.0, "top": 0.0, "bottom": 1.0}
+    ox = 0.5 - origin.get(obj.get("originX", "left"), 0.0)
+    oy = 0.5 - origin.get(obj.get("originY", "top"), 0.0)
+    cx = obj.get("left", 0.0) + cos * ox * w - sin * oy * h
+    cy = obj.get("top", 0.0) + sin * ox * w + cos * oy * h
+    return np.array([[cos * sx, -sin * sy, cx],
+                     [sin * sx, cos * sy, cy],
+                     [0.0, 0.0, 1.0]])
+
+
+def _apply(matrix, points):
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    return points @ matrix[:2, :2].T + matrix[:2, 2]
+
+
+def _cubics(segments, steps=CURVE_STEPS):
+    # Segments (S, 4, 2) de Bézier cubiques évalués d'un bloc -> points (S * steps, 2), départ exclu
+    t = np.linspace(0.0, 1.0, steps + 1)[1:, None]
+    p0, c1, c2, p1 = (segments[:, i, None] for i in range(4))
+    points = (1 - t) ** 3 * p0 + 3 * (1 - t) ** 2 * t * c1 + 3 * (1 - t) * t ** 2 * c2 + t ** 3 * p1
+    return points.reshape(-1, 2)
+
+
+def path_polylines(path):
+    # Commandes SVG absolues de fabric.Path -> liste de (points, fermé)
+    # Chaque commande devient un segment cubique (droites et quadratiques incluses) ;
+    # les segments d'un sous-tracé sont échantillonnés ensemble
+    polylines = []
+    start = position = (0.0, 0.0)
+    segments = []
+
+    def flush(closed):
+        if segments:
+            points = np.vstack(([start], _cubics(np.array(segments))))
+            polylines.append((points, closed))
+        segments.clear()
+
+    for command in path:
+        op, args = command[0], command[1:]
+        if op == "M":
+            flush(False)
+            start = position = (args[0], args[1])
+        elif op == "L":
+            end = (args[0], args[1])
+            segments.append((position, position, end, end))
+            position = end
+        elif op == "Q":
+            (cx, cy), end = (args[0], args[1]), (args[2], args[3])
+            x0, y0 = position
+            segments.append((position, (x0 + 2 / 3 * (cx - x0), y0 + 2 / 3 * (cy - y0)),
+                             (end[0] + 2 / 3 * (cx - end[0]), end[1] + 2 / 3 * (cy - end[1])), end))
+            position = end
+        elif op == "C":
+            end = (args[4], args[5])
+            segments.append((position, (args[0], args[1]), (args[2], args[3]), end))
+            position = end
+        elif op in ("z", "Z"):
+            if position != start:
+                segments.append((position, position, start, start))
+            flush(True)
+            position = start
+        elif len(args) >= 2:
+            # Arcs et autres commandes : approximés par leur point d'arrivée
+            end = (args[-2], args[-1])
+            segments.append((position, position, end, end))
+            position = end
+    flush(False)
+    return polylines
+
+
+def convert_object(obj, height, tolerance=SIMPLIFY_TOLERANCE):
+    # Objet fabric.js -> primitives DXF en coordonnées DXF (axe Y vers le haut)
+    matrix = object_matrix(obj)
+
+    def to_dxf(points):
+        points = _apply(matrix, points)
+        points[:, 1] = height - points[:, 1]
+        return [(float(x), float(y)) for x, y in points]
+
+    kind = obj.get("type")
+    w, h = obj.get("width", 0.0), obj.get("height", 0.0)
+    if kind == "line":
+        return [("line", to_dxf([(obj["x1"], obj["y1"]), (obj["x2"], obj["y2"])]))]
+    if kind == "rect":
+        corners = [(-w / 2, -h / 2), (w / 2, -h / 2), (w / 2, h / 2), (-w / 2, h / 2)]
+        return [("polyline", to_dxf(corners), True)]
+    if kind == "triangle":
+        return [("polyline", to_dxf([(0, -h / 2), (w / 2, h / 2), (-w / 2, h / 2)]), True)]
+    if kind in ("circle", "ellipse"):
+        rx = obj.get("rx", obj.get("radius", 0.0))
+        ry = obj.get("ry", obj.get("radius", 0.0))
+        center, major, minor = to_dxf([(0, 0), (rx, 0), (0, ry)])
+        major_axis = np.subtract(major, center)
+        minor_axis = np.subtract(minor, center)
+        a, b = math.hypot(*major_axis), math.hypot(*minor_axis)
+        if math.isclose(a, b, rel_tol=1e-9):
+            return [("circle", center, a)]
+        if a < b:
+            major_axis, a, b = minor_axis, b, a
+        return [("ellipse", center, tuple(major_axis), b / a)]
+    if kind in ("polyline", "polygon"):
+        offset = obj.get("pathOffset", {"x": 0.0, "y": 0.0})
+        points = np.array([(p["x"] - offset["x"], p["y"] - offset["y"]) for p in obj.get("points", [])])
+        if len(points) < 2:
+            return []
+        return [("polyline", to_dxf(points), kind == "polygon")]
+    if kind == "path":
+        offset = obj.get("pathOffset", {"x": 0.0, "y": 0.0})
+        result = []
+        for points, closed in path_polylines(obj.get("path", [])):
+            points = rdp(points - (offset["x"], offset["y"]), tolerance / max(abs(obj.get("scaleX", 1.0)), 1e-9))
+            if len(points) > 1:
+                result.append(("polyline", to_dxf(points), closed))
+        return result
+    return []
+
+
+def object_key(obj):
+    return hashlib.sha1(json.dumps(obj, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class CanvasConverter:
+    # Conversion incrémentale : chaque objet est converti une fois (clé = empreinte de son JSON),
+    # le DXF n'est réécrit que si la liste des objets a changé.
+
+    def __init__(self, height, tolerance=SIMPLIFY_TOLERANCE):
+        self.height = height
+        self.tolerance = tolerance
+        self.primitives = {}
+        self.last_keys = None
+        self.last_dxf = None
+        self.converted = 0
+        self.reused = 0
+
+    @instrumented("canvas_export")
+    def convert(self, json_data):
+        objects = (json_data or {}).get("objects", [])
+        keys = [object_key(obj) for obj in objects]
+        if keys == self.last_keys:
+            self.reused += len(keys)
+            return self.last_dxf
+        for key, obj in zip(keys, objects):
+            if key in self.primitives:
+                self.reused += 1
+            else:
+                self.primitives[key] = convert_object(obj, self.height, self.tolerance)
+                self.converted += 1
+        # Objets supprimés du dessin : leurs primitives sont oubliées
+        self.primitives = {key: self.primitives[key] for key in keys}
+        self.last_keys = keys
+        self.last_dxf = self._write(keys)
+        return self.last_dxf
+
+    def _write(self, keys):
+        doc = ezdxf.new()
+        msp = doc.modelspace()
+        for key in keys:
+            for primitive in self.primitives[key]:
+                kind = primitive[0]
+                if kind == "line":
+                    msp.add_line(*primitive[1])
+                elif kind == "polyline":
+                    msp.add_lwpolyline(primitive[1], close=primitive[2])
+                elif kind == "circle":
+                    msp.add_circle(primitive[1], primitive[2])
+                elif kind == "ellipse":
+                    msp.add_ellipse(primitive[1], major_axis=primitive[2], ratio=primitive[3])
+        buffer = io.StringIO()
+        doc.write(buffer)
+        return buffer.getvalue().encode("utf-8")
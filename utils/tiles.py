@@ -0,0 +1,202 @@
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from utils.geometry import DxfGeometry, segment_extents
+from utils.render import clip_pieces, decimate, draw_pieces, geometry_pieces
+
+TILE_PX = 256
+VIEW_WIDTH_PX = 1024
+VIEW_HEIGHT_PX = 768
+MAX_ZOOM = 10  # niveau 0 : dessin entier dans la vue ; chaque niveau double l'échelle
+ITEMS_PER_CELL = 4  # occupation moyenne visée pour la grille de l'index
+MAX_CELL_SPAN = 64  # au-delà, une primitive est testée à chaque requête plutôt qu'inscrite dans ses cellules
+TILE_CACHE_SIZE = 192
+CLIP_MARGIN_PX = 2  # marge de découpage des morceaux autour d'une tuile (épaisseur du trait)
+INDEX_CACHE_SIZE = 8
+
+_tiles = OrderedDict()
+_indexes = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+class SpatialIndex:
+    # Grille uniforme sur les boîtes englobantes des primitives (segments puis cercles).
+    # Chaque primitive est inscrite dans toutes les cellules qu'elle recouvre, au format CSR :
+    #   cell_offsets (C+1) : bornes des primitives de chaque cellule dans `items`
+    # Les très grandes primitives (contour d'une tôle entière…) sont gardées à part dans `large`.
+
+    def __init__(self, geometry, items_per_cell=ITEMS_PER_CELL):
+        segments = np.asarray(geometry.segments, dtype=np.float64)
+        circles = np.asarray(geometry.circles, dtype=np.float64)
+        self.geometry = geometry
+        self.n_segments = len(segments)
+        self.boxes = np.concatenate((segment_extents(segments).reshape(-1, 4),
+                                     np.column_stack((circles[:, :2] - circles[:, 2:3],
+                                                      circles[:, :2] + circles[:, 2:3]))))
+        n = len(self.boxes)
+        if n == 0:
+            self.bounds = (0.0, 0.0, 0.0, 0.0)
+            self.cell, self.nx, self.ny = 1.0, 1, 1
+            self.items = self.large = np.zeros(0, dtype=np.int64)
+            self.cell_offsets = np.zeros(2, dtype=np.int64)
+            return
+        self.bounds = (float(self.boxes[:, 0].min()), float(self.boxes[:, 1].min()),
+                       float(self.boxes[:, 2].max()), float(self.boxes[:, 3].max()))
+        xmin, ymin, xmax, ymax = self.bounds
+        size = max(xmax - xmin, ymax - ymin, 1e-9)
+        self.cell = size / max(1.0, math.sqrt(n / items_per_cell))
+        self.nx = int((xmax - xmin) // self.cell) + 1
+        self.ny = int((ymax - ymin) // self.cell) + 1
+
+        lo, hi = self._cells(self.boxes)
+        span = (hi[:, 0] - lo[:, 0] + 1) * (hi[:, 1] - lo[:, 1] + 1)
+        self.large = np.nonzero(span > MAX_CELL_SPAN)[0]
+        small = np.nonzero(span <= MAX_CELL_SPAN)[0]
+        lo, hi, count = lo[small], hi[small], span[small]
+        owner = np.repeat(np.arange(len(small)), count)
+        k = np.arange(len(owner)) - np.repeat(np.cumsum(count) - count, count)
+        rows = hi[:, 1] - lo[:, 1] + 1
+        cx = lo[owner, 0] + k // rows[owner]
+        cy = lo[owner, 1] + k % rows[owner]
+        keys = cx * self.ny + cy
+        sort = np.argsort(keys, kind="stable")
+        self.items = small[owner[sort]]
+        self.cell_offsets = np.concatenate(([0], np.cumsum(np.bincount(keys, minlength=self.nx * self.ny))))
+
+    def _cells(self, boxes):
+        origin = np.array(self.bounds[:2])
+        lo = np.floor((boxes[:, :2] - origin) / self.cell).astype(np.int64)
+        hi = np.floor((boxes[:, 2:] - origin) / self.cell).astype(np.int64)
+        limit = np.array([self.nx - 1, self.ny - 1])
+        return np.clip(lo, 0, limit), np.clip(hi, 0, limit)
+
+    def query(self, box):
+        # Indices (segments, cercles) dont la boîte coupe `box` = (xmin, ymin, xmax, ymax)
+        box = np.asarray(box, dtype=np.float64)
+        xmin, ymin, xmax, ymax = self.bounds
+        if len(self.boxes) == 0 or box[2] < xmin or box[3] < ymin or box[0] > xmax or box[1] > ymax:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        lo, hi = self._cells(box.reshape(1, 4))
+        xs = np.arange(lo[0, 0], hi[0, 0] + 1)
+        keys_lo = xs * self.ny + lo[0, 1]
+        keys_hi = xs * self.ny + hi[0, 1]
+        # Une colonne de cellules = une plage contiguë de `items`
+        start, stop = self.cell_offsets[keys_lo], self.cell_offsets[keys_hi + 1]
+        count = stop - start
+        index = np.repeat(start - np.cumsum(np.r_[0, count[:-1]]), count) + np.arange(count.sum())
+        candidates = np.unique(np.concatenate((self.items[index], self.large)))
+        b = self.boxes[candidates]
+        hit = candidates[(b[:, 0] <= box[2]) & (b[:, 2] >= box[0]) & (b[:, 1] <= box[3]) & (b[:, 3] >= box[1])]
+        return hit[hit < self.n_segments], hit[hit >= self.n_segments] - self.n_segments
+
+    def subset(self, box):
+        # Sous-géométrie visible dans `box` ; kinds reste complet (indexé par l'entité d'origine)
+        seg, circ = self.query(box)
+        g = self.geometry
+        return DxfGeometry(np.asarray(g.segments)[seg], np.asarray(g.segment_owner)[seg],
+                           np.asarray(g.circles)[circ], np.asarray(g.circle_owner)[circ], g.kinds)
+
+
+def spatial_index(geometry, key):
+    # Un index par dessin (clé = empreinte du fichier), construit une fois par processus
+    with _cache_lock:
+        if key in _indexes:
+            _indexes.move_to_end(key)
+            return _indexes[key]
+    index = SpatialIndex(geometry)
+    with _cache_lock:
+        _indexes[key] = index
+        while len(_indexes) > INDEX_CACHE_SIZE:
+            _indexes.popitem(last=False)
+    return index
+
+
+class TileGrid:
+    # Pyramide de tuiles : au niveau z, la vue couvre (taille du dessin) / 2^z ; tuile (z, tx, ty)
+    # de TILE_PX pixels, ty croissant vers le haut comme l'axe Y du DXF
+
+    def __init__(self, index, key):
+        self.index = index
+        self.key = key
+        xmin, ymin, xmax, ymax = index.bounds
+        size = max(xmax - xmin, ymax - ymin, 1e-9) * 1.04
+        self.middle = ((xmin + xmax) / 2.0, (ymin + ymax) / 2.0)
+        self.origin = np.array([self.middle[0] - size / 2.0, self.middle[1] - size / 2.0])
+        # Niveau 0 : le dessin entier tient dans la plus petite dimension de la vue
+        self.pixel0 = size / min(VIEW_WIDTH_PX, VIEW_HEIGHT_PX)
+
+    def pixel(self, zoom):
+        return self.pixel0 / 2 ** zoom
+
+    def tile_box(self, zoom, tx, ty):
+        world = TILE_PX * self.pixel(zoom)
+        x0, y0 = self.origin + (tx * world, ty * world)
+        return (x0, y0, x0 + world, y0 + world)
+
+    def tile(self, zoom, tx, ty):
+        cache_key = (self.key, zoom, tx, ty)
+        with _cache_lock:
+            if cache_key in _tiles:
+                _tiles.move_to_end(cache_key)
+                return _tiles[cache_key]
+        image = self._render(zoom, tx, ty)
+        with _cache_lock:
+            _tiles[cache_key] = image
+            while len(_tiles) > TILE_CACHE_SIZE:
+                _tiles.popitem(last=False)
+        return image
+
+    def _render(self, zoom, tx, ty):
+        box = self.tile_box(zoom, tx, ty)
+        pixel = self.pixel(zoom)
+        visible = self.index.subset(box)
+        image = np.full((TILE_PX, TILE_PX, 3), 255, dtype=np.uint8)
+        if len(visible.segments) == 0 and len(visible.circles) == 0:
+            return image
+        # Détail adapté au niveau : cordes à la demi-taille de pixel, morceaux ramenés à la tuile
+        # (marge de quelques pixels pour l'épaisseur du trait) puis doublons de pixels fusionnés.
+        # Sans ce découpage, deux longues lignes voisines qui traversent la tuile auraient leurs
+        # extrémités écrêtées dans les mêmes cellules et l'une d'elles disparaîtrait.
+        straight, straight_kind, curved, curved_kind = geometry_pieces(visible, tolerance=pixel / 2.0)
+        margin = CLIP_MARGIN_PX * pixel
+        clip_box = (box[0] - margin, box[1] - margin, box[2] + margin, box[3] + margin)
+        origin = np.array(clip_box[:2])
+        straight, straight_kind = decimate(*clip_pieces(straight, straight_kind, clip_box), pixel, origin)
+        curved, curved_kind = decimate(*clip_pieces(curved, curved_kind, clip_box), pixel, origin)
+        fig = Figure(figsize=(TILE_PX / 100, TILE_PX / 100), dpi=100)
+        canvas = FigureCanvasAgg(fig)
+        ax = fig.add_axes((0, 0, 1, 1))
+        ax.set_axis_off()
+        ax.set_xlim(box[0], box[2])
+        ax.set_ylim(box[1], box[3])
+        draw_pieces(ax, np.concatenate((straight, curved)), np.concatenate((straight_kind, curved_kind)))
+        canvas.draw()
+        image[:] = np.asarray(canvas.buffer_rgba())[:, :, :3]
+        return image
+
+    def view(self, zoom, center, width_px=VIEW_WIDTH_PX, height_px=VIEW_HEIGHT_PX):
+        # Image (H, W, 3) de la vue centrée sur `center` : seules les tuiles visibles sont lues/rendues
+        pixel = self.pixel(zoom)
+        left = (center[0] - self.origin[0]) / pixel - width_px / 2.0
+        bottom = (center[1] - self.origin[1]) / pixel - height_px / 2.0
+        tx0, ty0 = int(math.floor(left / TILE_PX)), int(math.floor(bottom / TILE_PX))
+        tx1 = int(math.floor((left + width_px - 1) / TILE_PX))
+        ty1 = int(math.floor((bottom + height_px - 1) / TILE_PX))
+        mosaic = np.empty(((ty1 - ty0 + 1) * TILE_PX, (tx1 - tx0 + 1) * TILE_PX, 3), dtype=np.uint8)
+        for ty in range(ty0, ty1 + 1):
+            # Lignes d'image de haut en bas : les tuiles du haut (ty grand) en premier
+            row = (ty1 - ty) * TILE_PX
+            for tx in range(tx0, tx1 + 1):
+                col = (tx - tx0) * TILE_PX
+                mosaic[row:row + TILE_PX, col:col + TILE_PX] = self.tile(zoom, tx, ty)
+        x = int(math.floor(left - tx0 * TILE_PX))
+        y = mosaic.shape[0] - int(math.floor(bottom - ty0 * TILE_PX)) - height_px
+        return mosaic[y:y + height_px, x:x + width_px]
+
+    def center(self):
+        return self.middle
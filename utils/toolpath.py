@@ -0,0 +1,279 @@
+import time
+
+import numpy as np
+
+from utils.geometry import flatten_segments
+from utils.topology import orient_segments
+
+# Nombre total de points d'amorçage candidats, répartis entre les contours
+MAX_ENTRY_CANDIDATES = 200_000
+MAX_ENTRIES_PER_LOOP = 16
+ENTRY_TOLERANCE = 0.5
+RAPID_SPEED = 300.0  # mm/s, déplacements tête levée
+# Anneaux de cellules parcourus autour de la position avant une recherche sur tous les points
+_MAX_RINGS = 8
+
+
+class Toolpath:
+    # Ordre de découpe des contours, point d'amorçage de chacun et temps estimés
+
+    def __init__(self, order, entries, origin, cut_length):
+        self.order = order          # indices de boucles (Topology) dans l'ordre de découpe
+        self.entries = entries      # (L, 2) point d'amorçage de chaque boucle de `order`
+        self.origin = np.asarray(origin, dtype=np.float64)
+        self.cut_length = cut_length
+        self.improvements = 0
+        self.solve_time = 0.0
+
+    @property
+    def rapid_distance(self):
+        if len(self.order) == 0:
+            return 0.0
+        points = np.vstack((self.origin, self.entries))
+        return float(np.hypot(*np.diff(points, axis=0).T).sum())
+
+    def cycle_time(self, cut_speed, rapid_speed=RAPID_SPEED):
+        return self.cut_length / cut_speed + self.rapid_distance / rapid_speed
+
+
+def _entry_candidates(topology, per_loop, tolerance):
+    # Points d'amorçage possibles : sommets régulièrement répartis le long de chaque boucle
+    segments = np.asarray(topology.geometry.segments, dtype=np.float64)
+    oriented = orient_segments(segments[topology.order], topology.reverse)
+    pieces, seg = flatten_segments(oriented, tolerance)
+    points = pieces[:, 0]
+    owner = np.searchsorted(topology.loop_offsets, seg, side="right") - 1
+
+    # Cercles : per_loop points sur la circonférence
+    circle_loops = np.nonzero(topology.loop_circle >= 0)[0]
+    circles = np.asarray(topology.geometry.circles)[topology.loop_circle[circle_loops]]
+    angles = np.linspace(0.0, 2.0 * np.pi, per_loop, endpoint=False)
+    circle_points = np.stack((circles[:, 0:1] + circles[:, 2:3] * np.cos(angles),
+                              circles[:, 1:2] + circles[:, 2:3] * np.sin(angles)), axis=-1).reshape(-1, 2)
+    points = np.concatenate((points, circle_points))
+    owner = np.concatenate((owner, np.repeat(circle_loops, per_loop)))
+
+    # Sous-échantillonnage régulier : au plus per_loop points par boucle
+    count = np.bincount(owner, minlength=topology.n_loops)
+    first = np.cumsum(count) - count
+    sort = np.argsort(owner, kind="stable")
+    points, owner = points[sort], owner[sort]
+    rank = np.arange(len(owner)) - first[owner]
+    step = np.maximum(1, count // per_loop)[owner]
+    keep = (rank % step == 0) & (rank // step < per_loop)
+    return points[keep], owner[keep]
+
+
+def _nearest_neighbour(candidates, owner, parent, n_loops, origin, deadline):
+    # Plus proche voisin en respectant "enfants avant parent" (trous avant contour extérieur).
+    # Les candidats sont rangés dans une grille de hachage : la recherche parcourt des anneaux de
+    # cellules autour de la position courante et s'arrête dès qu'aucun anneau plus lointain ne peut
+    # faire mieux. Renvoie les contours ordonnés avant `deadline`, éventuellement une partie seulement.
+    pending = np.bincount(parent[parent >= 0], minlength=n_loops)
+    alive = np.ones(len(candidates), dtype=bool)
+    lo = candidates.min(axis=0)
+    width, height = np.ptp(candidates, axis=0)
+    # Quelques points par cellule ; pas de cellule dégénérée si les points sont alignés
+    cell = max(2.0 * np.sqrt(width * height / len(candidates)), max(width, height) / len(candidates), 1e-6)
+    nx, ny = int(width // cell) + 1, int(height // cell) + 1
+    ij = ((candidates - lo) // cell).astype(np.int64)
+    keys = (ij[:, 0] * ny + ij[:, 1]).tolist()
+    cells = [[] for _ in range(nx * ny)]
+    for k, key in enumerate(keys):
+        cells[key].append(k)
+    xs, ys = candidates[:, 0].tolist(), candidates[:, 1].tolist()
+    owners, waiting, parents = owner.tolist(), pending.tolist(), parent.tolist()
+    by_loop = np.argsort(owner, kind="stable")
+    loop_start = np.searchsorted(owner[by_loop], np.arange(n_loops + 1)).tolist()
+    by_loop = by_loop.tolist()
+    x0, y0 = float(lo[0]), float(lo[1])
+
+    def nearest(px, py):
+        ci, cj = int((px - x0) // cell), int((py - y0) // cell)
+        first = max(ci - nx + 1, -ci, cj - ny + 1, -cj, 0)
+        best, best_d = -1, np.inf
+        for r in range(first, first + _MAX_RINGS):
+            for i in range(max(ci - r, 0), min(ci + r, nx - 1) + 1):
+                for j in (range(cj - r, cj + r + 1) if abs(i - ci) == r else (cj - r, cj + r)):
+                    if 0 <= j < ny:
+                        for k in cells[i * ny + j]:
+                            d = (xs[k] - px) ** 2 + (ys[k] - py) ** 2
+                            if d < best_d and waiting[owners[k]] == 0:
+                                best, best_d = k, d
+            # Distance de la position au bord du carré déjà parcouru : rien de plus proche au-delà
+            margin = min(px - x0 - (ci - r) * cell, (ci + r + 1) * cell - px + x0,
+                         py - y0 - (cj - r) * cell, (cj + r + 1) * cell - py + y0)
+            if best >= 0 and best_d <= margin * margin:
+                return best
+        # Voisinage vide (fin de parcours, zones déjà découpées) : recherche sur tous les points
+        idx = np.nonzero(alive & (pending[owner] == 0))[0]
+        return int(idx[np.argmin(np.hypot(candidates[idx, 0] - px, candidates[idx, 1] - py))])
+
+    order, chosen = [], []
+    px, py = float(origin[0]), float(origin[1])
+    while len(order) < n_loops and time.time() < deadline:
+        best = nearest(px, py)
+        loop = owners[best]
+        order.append(loop)
+        chosen.append(best)
+        px, py = xs[best], ys[best]
+        points = by_loop[loop_start[loop]:loop_start[loop + 1]]
+        alive[points] = False
+        for k in points:
+            cells[keys[k]].remove(k)
+        if parents[loop] >= 0:
+            pending[parents[loop]] -= 1
+            waiting[parents[loop]] -= 1
+    return np.asarray(order, dtype=np.int64), candidates[np.asarray(chosen, dtype=np.int64)]
+
+
+def _row_order(loops, bbox, depth):
+    # Ordre de repli, sans recherche : trous les plus profonds d'abord (les enfants restent avant
+    # leur parent), puis par rangées et par x, une rangée sur deux parcourue en sens inverse.
+    # Rangées d'environ un contour de haut, plus hautes si les contours sont clairsemés
+    x, y = bbox[loops, 0], bbox[loops, 1]
+    spread = np.sqrt(np.ptp(x) * np.ptp(y) / len(loops))
+    row_height = max(float(np.median(bbox[loops, 3] - y)), spread, 1e-6)
+    rows = np.floor((y - y.min()) / row_height)
+    return loops[np.lexsort((np.where(rows % 2 == 0, x, -x), rows, -depth[loops]))]
+
+
+def _dist(a, b):
+    return np.hypot(a[..., 0] - b[..., 0], a[..., 1] - b[..., 1])
+
+
+def _positions(order, parent):
+    pos = np.empty(len(order), dtype=np.int64)
+    pos[order] = np.arange(len(order))
+    has_parent = parent[order] >= 0
+    # Pour chaque rang : rang du parent de la boucle (ou n si aucun)
+    parent_pos = np.full(len(order), len(order), dtype=np.int64)
+    parent_pos[has_parent] = pos[parent[order][has_parent]]
+    return pos, parent_pos
+
+
+def _two_opt_pass(order, entries, parent, origin, deadline):
+    # Inversion de tronçons [i..j] : évaluée pour tous les j d'un coup
+    n = len(order)
+    improved = 0
+    for i in range(n - 1):
+        if time.time() >= deadline:
+            break
+        _, parent_pos = _positions(order, parent)
+        # Le tronçon ne doit contenir aucun couple enfant/parent : le plus petit rang de
+        # parent rencontré depuis i doit rester au-delà de j
+        blocked = np.minimum.accumulate(parent_pos[i:])
+        j = np.arange(i + 1, n)
+        valid = blocked[1:] > j
+        if not valid.any():
+            continue
+        before = origin if i == 0 else entries[i - 1]
+        a = entries[i]
+        b = entries[j]
+        after = np.vstack((entries[1:], [np.nan, np.nan]))[j]
+        # La fin de parcours n'a pas de successeur (distance NaN ramenée à 0)
+        old = _dist(before, a) + np.nan_to_num(_dist(b, after))
+        new = _dist(before, b) + np.nan_to_num(_dist(a, after))
+        delta = np.where(valid, new - old, 0.0)
+        k = int(np.argmin(delta))
+        if delta[k] < -1e-9:
+            jj = j[k]
+            order[i: jj + 1] = order[i: jj + 1][::-1]
+            entries[i: jj + 1] = entries[i: jj + 1][::-1]
+            improved += 1
+    return improved
+
+
+def _or_opt_pass(order, entries, parent, origin, deadline):
+    # Déplacement d'un contour vers la meilleure position autorisée
+    n = len(order)
+    improved = 0
+    children_of = [[] for _ in range(n)]
+    for loop, p in enumerate(parent):
+        if p >= 0:
+            children_of[p].append(loop)
+    for k in range(n):
+        if time.time() >= deadline:
+            break
+        pos, _ = _positions(order, parent)
+        loop = order[k]
+        # Bornes de m (nombre de contours placés avant lui) : après ses enfants, avant son parent
+        low = max((pos[c] for c in children_of[loop]), default=-1) + 1
+        high = pos[parent[loop]] - 1 if parent[loop] >= 0 else n - 1
+        path = np.vstack((origin, entries))
+        p = entries[k]
+        prev, nxt = path[k], (path[k + 2] if k + 1 < n else None)
+        removal = _dist(prev, p) + (_dist(p, nxt) - _dist(prev, nxt) if nxt is not None else 0.0)
+        # Insertion entre path[m] et path[m + 1] (rangs m dans la séquence sans le contour)
+        rest = np.delete(path, k + 1, axis=0)
+        m = np.arange(len(rest))
+        left = rest[m]
+        right = np.vstack((rest[1:], [np.nan, np.nan]))
+        insertion = _dist(left, p) + np.nan_to_num(_dist(p, right) - _dist(left, right))
+        allowed = (m >= low) & (m <= high)
+        gain = removal - np.where(allowed, insertion, np.inf)
+        best = int(np.argmax(gain))
+        if gain[best] > 1e-9:
+            new_order = np.insert(np.delete(order, k), best, loop)
+            new_entries = np.insert(np.delete(entries, k, axis=0), best, p, axis=0)
+            order[:] = new_order
+            entries[:] = new_entries
+            improved += 1
+    return improved
+
+
+def _refine_entries(order, entries, candidates, owner, origin):
+    # Meilleur point d'amorçage de chaque contour compte tenu de ses voisins
+    n = len(order)
+    rank = np.empty(owner.max() + 1 if len(owner) else 0, dtype=np.int64)
+    rank[order] = np.arange(n)
+    r = rank[owner]
+    for parity in (0, 1):
+        path = np.vstack((origin, entries, [np.nan, np.nan]))
+        prev = path[r]
+        nxt = path[r + 2]
+        cost = _dist(prev, candidates) + np.nan_to_num(_dist(candidates, nxt))
+        cost[r % 2 != parity] = np.inf
+        best = np.full(n, np.inf)
+        np.minimum.at(best, r, cost)
+        winner = (cost == best[r]) & np.isfinite(cost)
+        entries[r[winner]] = candidates[winner]
+
+
+def plan_toolpath(topology, origin=(0.0, 0.0), time_limit=1.0):
+    start = time.time()
+    deadline = start + time_limit
+    geometry = topology.geometry
+    open_length = float(geometry.segment_lengths()[topology.open_segments].sum())
+    cut_length = float(topology.loop_perimeter.sum()) + open_length
+    origin = np.asarray(origin, dtype=np.float64)
+    n = topology.n_loops
+    if n == 0:
+        return Toolpath(np.zeros(0, dtype=np.int64), np.zeros((0, 2)), origin, cut_length)
+
+    per_loop = int(np.clip(MAX_ENTRY_CANDIDATES // n, 1, MAX_ENTRIES_PER_LOOP))
+    candidates, owner = _entry_candidates(topology, per_loop, ENTRY_TOLERANCE)
+    parent = np.asarray(topology.loop_parent, dtype=np.int64)
+
+    # 1. Construction gloutonne bornée par la limite de temps ; les contours non atteints sont
+    #    pris par rangées. 2. Amélioration 2-opt / Or-opt jusqu'à la limite de temps
+    order, entries = _nearest_neighbour(candidates, owner, parent, n, origin, deadline)
+    if len(order) < n:
+        done = np.zeros(n, dtype=bool)
+        done[order] = True
+        rest = _row_order(np.nonzero(~done)[0], topology.loop_bbox, topology.loop_depth)
+        first = np.full(n, -1, dtype=np.int64)
+        first[owner[::-1]] = np.arange(len(owner))[::-1]
+        order = np.concatenate((order, rest))
+        entries = np.concatenate((entries, candidates[first[rest]]))
+        _refine_entries(order, entries, candidates, owner, origin)
+    toolpath = Toolpath(order, entries, origin, cut_length)
+    while time.time() < deadline:
+        improved = _two_opt_pass(order, entries, parent, origin, deadline)
+        improved += _or_opt_pass(order, entries, parent, origin, deadline)
+        _refine_entries(order, entries, candidates, owner, origin)
+        toolpath.improvements += improved
+        if not improved:
+            break
+    toolpath.solve_time = time.time() - start
+    return toolpath
@@ -0,0 +1,382 @@
+import numpy as np
+
+from utils.geometry import flatten_segments, segment_extents, signed_areas
+
+# Distance (mm) en dessous de laquelle deux extrémités sont considérées confondues
+SNAP_TOLERANCE = 0.01
+# Précision de discrétisation des arcs pour les tests d'inclusion
+CONTAINMENT_TOLERANCE = 0.05
+
+# Au-delà de ce nombre de cellules, une boucle (contour d'une tôle entière…) n'est pas inscrite dans
+# la grille d'inclusion mais testée directement contre toutes les boucles
+MAX_CELL_SPAN = 64
+
+REPORT_LABELS = {
+    "ramifications": "Contours ramifiés écartés des trous et de l'aire (jonction en T, bord commun)",
+}
+
+# Voisins à tester dans la grille (les 4 autres se déduisent par symétrie)
+_NEIGHBOURS = ((1, 0), (0, 1), (1, 1), (1, -1))
+
+
+def _propagate_labels(labels, a, b):
+    # Composantes connexes par propagation du plus petit label + saut de pointeurs
+    while True:
+        low = np.minimum(labels[a], labels[b])
+        before = labels.copy()
+        np.minimum.at(labels, a, low)
+        np.minimum.at(labels, b, low)
+        labels = labels[labels]
+        if np.array_equal(labels, before):
+            return labels
+
+
+def snap_points(points, tolerance=SNAP_TOLERANCE):
+    # Regroupe les points distants de moins de `tolerance` via une grille de hachage :
+    # les points d'une même cellule sont confondus, puis tous les points de deux cellules voisines
+    # sont comparés entre eux (deux points proches de part et d'autre d'une frontière se rejoignent)
+    if len(points) == 0:
+        return np.zeros(0, dtype=np.int64)
+    cells = np.floor(points / tolerance).astype(np.int64)
+    cells -= cells.min(axis=0) - 1
+    height = int(cells[:, 1].max()) + 2
+    keys = cells[:, 0] * height + cells[:, 1]
+    by_cell = np.argsort(keys, kind="stable")
+    unique_keys, first, inverse = np.unique(keys[by_cell], return_index=True, return_inverse=True)
+    size = np.diff(np.append(first, len(keys)))
+    cell = np.empty(len(keys), dtype=np.int64)
+    cell[by_cell] = inverse.ravel()
+
+    a_list, b_list = [], []
+    for dx, dy in _NEIGHBOURS:
+        neighbour = unique_keys + dx * height + dy
+        idx = np.clip(np.searchsorted(unique_keys, neighbour), 0, len(unique_keys) - 1)
+        found = np.nonzero(unique_keys[idx] == neighbour)[0]
+        # Toutes les paires (point de la cellule, point de la cellule voisine)
+        pairs = size[found] * size[idx[found]]
+        rank = np.arange(pairs.sum()) - np.repeat(np.cumsum(pairs) - pairs, pairs)
+        width = np.repeat(size[idx[found]], pairs)
+        a = by_cell[np.repeat(first[found], pairs) + rank // width]
+        b = by_cell[np.repeat(first[idx[found]], pairs) + rank % width]
+        close = np.hypot(*(points[a] - points[b]).T) <= tolerance
+        a_list.append(cell[a[close]])
+        b_list.append(cell[b[close]])
+    labels = np.arange(len(unique_keys))
+    a = np.concatenate(a_list)
+    if len(a):
+        labels = _propagate_labels(labels, a, np.concatenate(b_list))
+    # Renumérotation compacte 0..n-1
+    _, nodes = np.unique(labels[cell], return_inverse=True)
+    return nodes.ravel()
+
+
+class Topology:
+    # Boucles fermées d'un dessin, au format "CSR" :
+    #   loop_offsets (L+1)     : bornes des segments de chaque boucle dans `order`
+    #   order / reverse        : indices des segments parcourus et sens de parcours
+    #   loop_circle (L,)       : indice du cercle pour les boucles-cercles, -1 sinon
+    #   loop_perimeter, loop_area (valeur absolue), loop_bbox (xmin, ymin, xmax, ymax)
+    #   loop_depth             : nombre de boucles englobantes (pair = contour extérieur, impair = trou)
+    #   loop_parent            : plus petite boucle englobante, -1 si aucune
+    #   open_segments          : segments n'appartenant à aucune boucle fermée
+    #   branched_segments      : parmi eux, ceux des composantes fermées mais ramifiées (nœud de degré
+    #                            3 ou plus), écartées du calcul ; branched_components : leur nombre
+
+    def __init__(self, geometry, order, reverse, loop_offsets, loop_circle, open_segments):
+        self.geometry = geometry
+        self.order = order
+        self.reverse = reverse
+        self.loop_offsets = loop_offsets
+        self.loop_circle = loop_circle
+        self.open_segments = open_segments
+        self.branched_segments = np.zeros(0, dtype=np.int64)
+        self.branched_components = 0
+        n = len(loop_circle)
+        self.loop_perimeter = np.zeros(n)
+        self.loop_area = np.zeros(n)
+        self.loop_signed_area = np.zeros(n)
+        self.loop_bbox = np.zeros((n, 4))
+        self.loop_depth = np.zeros(n, dtype=np.int64)
+        self.loop_parent = np.full(n, -1, dtype=np.int64)
+
+    @property
+    def n_loops(self):
+        return len(self.loop_circle)
+
+    @property
+    def is_outer(self):
+        return self.loop_depth % 2 == 0
+
+    @property
+    def num_holes(self):
+        return int((~self.is_outer).sum())
+
+    @property
+    def net_area(self):
+        # Aire nette (mm²) : contours extérieurs moins trous, îlots à l'intérieur des trous compris
+        return float(np.where(self.is_outer, self.loop_area, -self.loop_area).sum())
+
+    @property
+    def outer_loops(self):
+        return np.nonzero(self.is_outer)[0]
+
+    @property
+    def inner_loops(self):
+        return np.nonzero(~self.is_outer)[0]
+
+    def loop_segments(self, i):
+        # Segments orientés (x1, y1, x2, y2, bulge) de la boucle i, dans l'ordre de parcours
+        if self.loop_circle[i] >= 0:
+            cx, cy, r = self.geometry.circles[self.loop_circle[i]]
+            return np.array([[cx + r, cy, cx - r, cy, 1.0], [cx - r, cy, cx + r, cy, 1.0]])
+        span = slice(self.loop_offsets[i], self.loop_offsets[i + 1])
+        return orient_segments(np.asarray(self.geometry.segments)[self.order[span]], self.reverse[span])
+
+    def loop_polygon(self, i, tolerance=CONTAINMENT_TOLERANCE):
+        pieces, _ = flatten_segments(self.loop_segments(i), tolerance)
+        return pieces[:, 0]
+
+    def loops(self):
+        return [{
+            "type": "extérieur" if self.is_outer[i] else "intérieur",
+            "perimetre": float(self.loop_perimeter[i]),
+            "aire": float(self.loop_area[i]),
+            "bbox": tuple(float(v) for v in self.loop_bbox[i]),
+        } for i in range(self.n_loops)]
+
+    def report(self):
+        # Ce que la topologie a dû écarter, pour l'affichage à côté du rapport de nettoyage
+        lengths = self.geometry.segment_lengths()[self.branched_segments]
+        return {"ramifications": self.branched_components, "longueur_ramifiee": round(float(lengths.sum()), 2)}
+
+
+def orient_segments(segments, reverse):
+    # Inverse les segments parcourus à rebours (extrémités échangées, bulge opposé)
+    oriented = np.array(segments, dtype=np.float64)
+    oriented[reverse] = oriented[reverse][:, [2, 3, 0, 1, 4]]
+    oriented[reverse, 4] *= -1.0
+    return oriented
+
+
+def _walk_loops(u, v, edges, n_nodes):
+    # Ordonne les segments des composantes dont tous les nœuds sont de degré 2.
+    # Arêtes orientées : 2e = parcours u→v, 2e+1 = parcours v→u ; chaque composante donne
+    # deux cycles d'arêtes orientées, classés par sauts de pointeurs sans boucle Python.
+    if len(edges) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=bool), np.zeros(1, dtype=np.int64)
+    incidence = np.full((n_nodes, 2), -1, dtype=np.int64)
+    ends = np.concatenate((u[edges], v[edges]))
+    owners = np.concatenate((edges, edges))
+    sort = np.argsort(ends, kind="stable")
+    ends, owners = ends[sort], owners[sort]
+    slot = np.arange(len(ends)) - np.searchsorted(ends, ends)
+    incidence[ends, slot] = owners
+
+    # Successeur de chaque arête orientée : l'autre segment au nœud d'arrivée
+    directed = np.concatenate((2 * edges, 2 * edges + 1))
+    e, backwards = directed // 2, directed % 2 == 1
+    arrival = np.where(backwards, u[e], v[e])
+    a, b = incidence[arrival, 0], incidence[arrival, 1]
+    nxt = np.where(a == e, b, a)
+    nxt_backwards = u[nxt] != arrival
+    position = np.full(2 * (int(edges.max()) + 1), -1, dtype=np.int64)
+    position[directed] = np.arange(len(directed))
+    succ = position[2 * nxt + nxt_backwards]
+
+    # Représentant de chaque cycle : plus petit identifiant orienté qu'il contient
+    rep = directed.copy()
+    jump = succ.copy()
+    for _ in range(int(np.ceil(np.log2(len(directed)))) + 1):
+        rep = np.minimum(rep, rep[jump])
+        jump = jump[jump]
+    # On garde le cycle qui parcourt le plus petit segment dans le sens u→v
+    keep = rep % 2 == 0
+
+    # Rang de chaque arête depuis le représentant (liste coupée juste avant lui)
+    is_rep = directed == rep
+    succ_cut = np.where(is_rep[succ], np.arange(len(succ)), succ)
+    remaining = np.where(is_rep[succ], 0, 1)
+    jump = succ_cut.copy()
+    for _ in range(int(np.ceil(np.log2(len(directed)))) + 1):
+        remaining = remaining + remaining[jump]
+        jump = jump[jump]
+
+    idx = np.nonzero(keep)[0]
+    sort = np.lexsort((-remaining[idx], rep[idx]))
+    idx = idx[sort]
+    order = e[idx]
+    reverse = backwards[idx]
+    loop_rep = rep[idx]
+    starts = np.nonzero(np.r_[True, loop_rep[1:] != loop_rep[:-1]])[0]
+    return order, reverse, np.append(starts, len(order)).astype(np.int64)
+
+
+def _prune_spurs(u, v, edges, n_nodes):
+    # Retire les chaînes pendantes (trait de construction accroché à un contour, polyligne ouverte) :
+    # à chaque passe, les chaînes de nœuds de degré 2 qui aboutissent à un nœud de degré 1 sont
+    # supprimées d'un bloc ; autant de passes que de niveaux de ramification, pas que de segments
+    while len(edges):
+        degree = np.bincount(u[edges], minlength=n_nodes) + np.bincount(v[edges], minlength=n_nodes)
+        if not (degree == 1).any():
+            break
+        ends = np.concatenate((u[edges], v[edges]))
+        owners = np.tile(np.arange(len(edges)), 2)
+        sort = np.argsort(ends, kind="stable")
+        ends, owners = ends[sort], owners[sort]
+        # Les deux segments d'un nœud de degré 2 se suivent après le tri
+        joined = (ends[1:] == ends[:-1]) & (degree[ends[1:]] == 2)
+        labels = np.arange(len(edges))
+        if joined.any():
+            labels = _propagate_labels(labels, owners[:-1][joined], owners[1:][joined])
+        dangling = np.zeros(len(edges), dtype=bool)
+        dangling[labels[owners[degree[ends] == 1]]] = True
+        edges = edges[~dangling[labels]]
+    return edges
+
+
+def points_in_polygon(points, polygon, max_cells=2_000_000):
+    # Règle pair-impair, vectorisée sur les points et les arêtes (par paquets bornés en mémoire)
+    x1, y1 = polygon[:, 0], polygon[:, 1]
+    x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+    chunk = max(1, max_cells // max(len(polygon), 1))
+    result = np.zeros(len(points), dtype=bool)
+    for k in range(0, len(points), chunk):
+        x, y = points[k:k + chunk, 0:1], points[k:k + chunk, 1:2]
+        crosses = (y1 > y) != (y2 > y)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            xi = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+        result[k:k + chunk] = (crosses & (x < xi)).sum(axis=1) % 2 == 1
+    return result
+
+
+def _candidate_pairs(points, bbox, area):
+    # Couples (boucle i, boucle englobante candidate j) via une grille sur les boîtes. Les boucles
+    # qui couvriraient plus de MAX_CELL_SPAN cellules sont testées à part contre toutes les boîtes :
+    # la mémoire reste proportionnelle au nombre de boucles
+    n = len(bbox)
+    size = np.maximum(bbox[:, 2] - bbox[:, 0], bbox[:, 3] - bbox[:, 1])
+    cell = max(float(np.median(size)), 1e-9)
+    lo = np.floor(bbox[:, :2] / cell).astype(np.int64)
+    hi = np.floor(bbox[:, 2:] / cell).astype(np.int64)
+    origin = lo.min(axis=0)
+    lo -= origin
+    hi -= origin
+    height = int(hi[:, 1].max()) + 1
+    nx = hi[:, 0] - lo[:, 0] + 1
+    ny = hi[:, 1] - lo[:, 1] + 1
+    count = nx * ny
+    large = np.nonzero(count > MAX_CELL_SPAN)[0]
+    count[large] = 0
+    owner = np.repeat(np.arange(n), count)
+    k = np.arange(len(owner)) - np.repeat(np.cumsum(count) - count, count)
+    cx = lo[owner, 0] + k // ny[owner]
+    cy = lo[owner, 1] + k % ny[owner]
+    keys = cx * height + cy
+    sort = np.argsort(keys, kind="stable")
+    keys, owner = keys[sort], owner[sort]
+
+    p = np.floor(points / cell).astype(np.int64) - origin
+    pkeys = p[:, 0] * height + p[:, 1]
+    start = np.searchsorted(keys, pkeys, side="left")
+    stop = np.searchsorted(keys, pkeys, side="right")
+    hits = stop - start
+    i = np.repeat(np.arange(n), hits)
+    j = owner[np.repeat(start, hits) + np.arange(hits.sum()) - np.repeat(np.cumsum(hits) - hits, hits)]
+    # Grandes boucles : toutes les boucles dont la boîte tient dans la leur
+    for big in large:
+        inner = np.nonzero((bbox[:, 0] >= bbox[big, 0]) & (bbox[:, 1] >= bbox[big, 1])
+                           & (bbox[:, 2] <= bbox[big, 2]) & (bbox[:, 3] <= bbox[big, 3]))[0]
+        i = np.concatenate((i, inner))
+        j = np.concatenate((j, np.full(len(inner), big)))
+
+    keep = ((i != j) & (area[j] > area[i])
+            & (bbox[j, 0] <= bbox[i, 0]) & (bbox[j, 1] <= bbox[i, 1])
+            & (bbox[j, 2] >= bbox[i, 2]) & (bbox[j, 3] >= bbox[i, 3]))
+    return i[keep], j[keep]
+
+
+def build_topology(geometry, tolerance=SNAP_TOLERANCE):
+    segments = np.asarray(geometry.segments, dtype=np.float64)
+    lengths = geometry.segment_lengths()
+    n = len(segments)
+
+    # 1. Accrochage des extrémités et graphe segments / nœuds
+    nodes = snap_points(np.concatenate((segments[:, 0:2], segments[:, 2:4])), tolerance)
+    u, v = nodes[:n], nodes[n:]
+    usable = (u != v) & (lengths > tolerance)
+    edges = np.nonzero(usable)[0]
+    n_nodes = int(nodes.max()) + 1 if n else 0
+
+    # 2. Composantes connexes : fermées si chaque nœud a exactement deux segments, une fois
+    #    retirées les chaînes pendantes (qui restent des segments ouverts)
+    edges = _prune_spurs(u, v, edges, n_nodes)
+    degree = np.bincount(u[edges], minlength=n_nodes) + np.bincount(v[edges], minlength=n_nodes)
+    labels = np.arange(n_nodes)
+    if len(edges):
+        labels = _propagate_labels(labels, u[edges], v[edges])
+    bad = np.zeros(n_nodes, dtype=bool)
+    np.logical_or.at(bad, labels, degree != 2)
+    closed = edges[~bad[labels[u[edges]]]]
+    # Composantes ramifiées (jonction en T, bord commun à deux contours) : ni boucle ni trou,
+    # comptées pour le rapport plutôt qu'écartées sans trace
+    branched = edges[bad[labels[u[edges]]]]
+    order, reverse, offsets = _walk_loops(u, v, closed, n_nodes)
+    in_loop = np.zeros(n, dtype=bool)
+    in_loop[closed] = True
+
+    circles = np.asarray(geometry.circles, dtype=np.float64)
+    n_seg_loops = len(offsets) - 1
+    topology = Topology(geometry, order, reverse, offsets,
+                        np.concatenate((np.full(n_seg_loops, -1, dtype=np.int64), np.arange(len(circles)))),
+                        np.nonzero(~in_loop)[0])
+    topology.branched_segments = branched
+    topology.branched_components = len(np.unique(labels[u[branched]]))
+
+    # 3. Périmètre, aire signée et boîte englobante, boucle par boucle sans boucle Python
+    if n_seg_loops:
+        oriented = orient_segments(segments[order], reverse)
+        starts = offsets[:-1]
+        topology.loop_perimeter[:n_seg_loops] = np.add.reduceat(lengths[order], starts)
+        topology.loop_signed_area[:n_seg_loops] = np.add.reduceat(signed_areas(oriented), starts)
+        extents = segment_extents(oriented)
+        topology.loop_bbox[:n_seg_loops] = np.column_stack((
+            np.minimum.reduceat(extents[:, 0], starts), np.minimum.reduceat(extents[:, 1], starts),
+            np.maximum.reduceat(extents[:, 2], starts), np.maximum.reduceat(extents[:, 3], starts)))
+    if len(circles):
+        cx, cy, r = circles.T
+        topology.loop_perimeter[n_seg_loops:] = 2.0 * np.pi * r
+        topology.loop_signed_area[n_seg_loops:] = np.pi * r * r
+        topology.loop_bbox[n_seg_loops:] = np.column_stack((cx - r, cy - r, cx + r, cy + r))
+    topology.loop_area = np.abs(topology.loop_signed_area)
+
+    # 4. Inclusion : un point de chaque boucle testé contre ses englobantes candidates
+    if topology.n_loops > 1:
+        points = np.empty((topology.n_loops, 2))
+        if n_seg_loops:
+            points[:n_seg_loops] = segments[order[offsets[:-1]]][:, 0:2]
+            first_reversed = reverse[offsets[:-1]]
+            points[:n_seg_loops][first_reversed] = segments[order[offsets[:-1]]][first_reversed][:, 2:4]
+        if len(circles):
+            points[n_seg_loops:] = circles[:, 0:2] + np.column_stack((circles[:, 2], np.zeros(len(circles))))
+        i, j = _candidate_pairs(points, topology.loop_bbox, topology.loop_area)
+        inside = np.zeros(len(i), dtype=bool)
+        for container in np.unique(j):
+            mask = j == container
+            inside[mask] = points_in_polygon(points[i[mask]], topology.loop_polygon(container))
+        i, j = i[inside], j[inside]
+        topology.loop_depth = np.bincount(i, minlength=topology.n_loops)
+        # Parent direct : l'englobante de plus petite aire
+        if len(i):
+            sort = np.lexsort((topology.loop_area[j], i))
+            i, j = i[sort], j[sort]
+            first = np.r_[True, i[1:] != i[:-1]]
+            topology.loop_parent[i[first]] = j[first]
+    return topology
+
+
+def report_lines(report):
+    # Lignes lisibles du rapport, seulement si des contours ont été écartés
+    lines = [f"{label} : {report[key]}" for key, label in REPORT_LABELS.items() if report.get(key)]
+    if lines and report.get("longueur_ramifiee"):
+        lines.append(f"Longueur de découpe concernée : {report['longueur_ramifiee']:.2f} mm")
+    return lines
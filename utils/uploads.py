@@ -0,0 +1,133 @@
+import contextlib
+import hashlib
+import json
+import mmap
+import os
+import re
+import tempfile
+import threading
+import time
+
+UPLOAD_DIR = os.environ.get("PARTLAB_UPLOAD_DIR", os.path.join(os.path.expanduser("~"), ".cache", "partlab-uploads"))
+UPLOAD_QUOTA_BYTES = int(os.environ.get("PARTLAB_UPLOAD_QUOTA_BYTES", 256 * 1024 * 1024))  # par utilisateur
+UPLOAD_MAX_AGE_DAYS = float(os.environ.get("PARTLAB_UPLOAD_MAX_AGE_DAYS", 30))
+CHUNK_SIZE = 1024 * 1024
+
+
+@contextlib.contextmanager
+def mapped_file(path):
+    # Lecture en mémoire mappée : les pages sont partagées entre processus via le cache système
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            # mmap refuse les fichiers vides
+            yield b""
+            return
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield buffer
+        finally:
+            buffer.close()
+
+
+class UploadStore:
+    # Dépôt adressé par contenu :
+    #   objects/<sha256>.dxf   contenu, partagé entre utilisateurs (un seul exemplaire par contenu)
+    #   users/<utilisateur>.json  envois de chaque utilisateur (empreinte, nom, taille, date)
+    # Un contenu n'est supprimé que lorsqu'aucun utilisateur ne le référence plus.
+
+    def __init__(self, root=UPLOAD_DIR, quota_bytes=UPLOAD_QUOTA_BYTES, max_age_days=UPLOAD_MAX_AGE_DAYS):
+        self.root = root
+        self.quota_bytes = quota_bytes
+        self.max_age = max_age_days * 86400
+        self.lock = threading.Lock()
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        os.makedirs(os.path.join(root, "users"), exist_ok=True)
+
+    def path(self, digest):
+        return os.path.join(self.root, "objects", f"{digest}.dxf")
+
+    def _user_file(self, user):
+        return os.path.join(self.root, "users", re.sub(r"[^\w.-]", "_", user or "anonyme") + ".json")
+
+    def uploads(self, user):
+        try:
+            with open(self._user_file(user), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def _save_uploads(self, user, records):
+        path = self._user_file(user)
+        fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=os.path.dirname(path))
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(records, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def put(self, stream, user, name):
+        # Copie par blocs avec calcul de l'empreinte au fil de l'eau
+        h = hashlib.sha256()
+        size = 0
+        fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=os.path.join(self.root, "objects"))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+                    h.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.unlink(tmp)
+            raise
+
+        digest = h.hexdigest()
+        record = {"digest": digest, "name": name, "size": size, "uploaded": time.time()}
+        # Sous verrou : evict() ne doit pas voir le contenu avant que l'envoi soit enregistré
+        with self.lock:
+            if os.path.exists(self.path(digest)):
+                os.unlink(tmp)
+                os.utime(self.path(digest))
+            else:
+                os.replace(tmp, self.path(digest))
+            records = [r for r in self.uploads(user) if r["digest"] != digest]
+            records.insert(0, record)
+            # Quota : les envois les plus anciens sortent en premier (le nouveau est toujours gardé)
+            total = 0
+            kept = []
+            for r in records:
+                if kept and total + r["size"] > self.quota_bytes:
+                    continue
+                kept.append(r)
+                total += r["size"]
+            self._save_uploads(user, kept)
+        self.evict()
+        return record
+
+    def remove(self, user, digest):
+        with self.lock:
+            self._save_uploads(user, [r for r in self.uploads(user) if r["digest"] != digest])
+        self.evict()
+
+    def mapped(self, digest):
+        return mapped_file(self.path(digest))
+
+    def evict(self):
+        # Envois plus vieux que max_age retirés, puis contenus orphelins supprimés
+        limit = time.time() - self.max_age
+        referenced = set()
+        with self.lock:
+            users = os.path.join(self.root, "users")
+            for name in os.listdir(users):
+                if name.startswith(".") or not name.endswith(".json"):
+                    continue
+                user = name[:-5]
+                records = self.uploads(user)
+                kept = [r for r in records if r["uploaded"] >= limit]
+                if len(kept) != len(records):
+                    self._save_uploads(user, kept)
+                referenced.update(r["digest"] for r in kept)
+            objects = os.path.join(self.root, "objects")
+            for name in os.listdir(objects):
+                if name.startswith(".") or name[:-4] in referenced:
+                    continue
+                with contextlib.suppress(OSError):
+                    os.unlink(os.path.join(objects, name))